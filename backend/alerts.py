@@ -0,0 +1,279 @@
+import asyncio
+import bisect
+import logging
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional, Protocol, Tuple
+
+import httpx
+
+from .config import settings
+from .models import PRIMARY_LOCATION_ID, AlertRule, WeatherAlert, WeatherObservation
+from .services import FarmSettingsService, create_http_client
+
+logger = logging.getLogger(__name__)
+
+# --- Extreme-Weather Alerts ---
+# Every stored observation is evaluated against the rule set as it is ingested. Rules are compiled once into
+# parallel NumPy arrays and a batch of observations (one polling round across all locations) is checked against
+# all rules with a few array operations, so the cost grows with the array sizes rather than with Python-level
+# loops over locations x rules. Alerts are only raised while the farm's extreme_weather_alerts setting is on: with
+# it off, observations still feed the rate-of-change history, but no rule fires or clears, so turning alerts on
+# later starts from a clean state and the first event sinks see for a condition is always "fired".
+
+ALERT_METRICS = ("temperature", "feels_like", "humidity", "pressure", "wind_speed", "wind_gust", "visibility")
+
+# Built-in rules (metric units); ALERT_RULES replaces them entirely
+DEFAULT_ALERT_RULES = [
+    AlertRule(
+        name="frost", metric="temperature", direction="below", threshold=0.0, clear_margin=1.0,
+        severity="critical", message="Frost risk: protect sensitive crops and exposed irrigation lines."
+    ),
+    AlertRule(
+        name="heat", metric="temperature", direction="above", threshold=35.0, clear_margin=1.0, debounce=2,
+        severity="warning", message="Extreme heat: increase irrigation and provide shade for livestock."
+    ),
+    AlertRule(
+        name="high_wind", metric="wind_gust", direction="above", threshold=17.0, clear_margin=2.0,
+        severity="warning", message="Strong gusts: secure equipment and postpone spraying."
+    ),
+    AlertRule(
+        name="pressure_drop", metric="pressure", kind="rate", direction="below", threshold=-3.0, window_minutes=180,
+        clear_margin=1.0, severity="warning", message="Rapid pressure drop: a storm may be approaching."
+    ),
+    AlertRule(
+        name="temperature_drop", metric="temperature", kind="rate", direction="below", threshold=-5.0, window_minutes=60,
+        clear_margin=1.0, severity="info", message="Temperature is falling quickly."
+    ),
+]
+
+def load_alert_rules() -> List[AlertRule]:
+    if settings.ALERT_RULES:
+        return [AlertRule.model_validate(rule) for rule in settings.ALERT_RULES]
+    return list(DEFAULT_ALERT_RULES)
+
+class CompiledRules:
+    # The rule set as parallel arrays (one entry per rule), built once when the engine is created, so an invalid
+    # ALERT_RULES configuration fails at startup.
+    def __init__(self, rules: List[AlertRule]):
+        import numpy as np
+
+        names = [rule.name for rule in rules]
+        if len(set(names)) != len(names):
+            raise ValueError("Alert rule names must be unique.")
+        unknown = [rule.metric for rule in rules if rule.metric not in ALERT_METRICS]
+        if unknown:
+            raise ValueError(f"Unknown alert metric(s): {', '.join(unknown)}")
+
+        self.rules = rules
+        self.metric_index = np.array([ALERT_METRICS.index(rule.metric) for rule in rules], dtype=np.intp)
+        self.sign = np.array([1.0 if rule.direction == "above" else -1.0 for rule in rules])
+        self.threshold = np.array([rule.threshold for rule in rules], dtype=np.float64)
+        self.clear_margin = np.array([rule.clear_margin for rule in rules], dtype=np.float64)
+        self.debounce = np.array([rule.debounce for rule in rules], dtype=np.int64)
+        self.is_rate = np.array([rule.kind == "rate" for rule in rules], dtype=bool)
+        # Distinct rate windows (seconds): one baseline lookup per window, shared by all rules using it
+        self.windows = sorted({rule.window_minutes * 60 for rule in rules if rule.kind == "rate"}) or [0]
+        self.window_index = np.array(
+            [self.windows.index(rule.window_minutes * 60) if rule.kind == "rate" else 0 for rule in rules], dtype=np.intp
+        )
+        self.max_window = max(self.windows)
+
+class SampleHistory:
+    # Metric values of one location within the longest rate window, in dt order. Baselines are found by bisection,
+    # so a lookup costs O(log samples) per window.
+    def __init__(self):
+        self.dts: List[int] = []
+        self.values: List[Any] = []
+        self.head = 0  # Samples before `head` have left the window
+
+    def baseline(self, since: int) -> Optional[Any]:
+        # Oldest sample at or after `since`
+        i = bisect.bisect_left(self.dts, since, self.head)
+        return self.values[i] if i < len(self.dts) else None
+
+    def add(self, dt: int, values: Any, max_window: int) -> None:
+        i = bisect.bisect_right(self.dts, dt, self.head)
+        self.dts.insert(i, dt)
+        self.values.insert(i, values)
+        self.head = bisect.bisect_left(self.dts, self.dts[-1] - max_window, self.head)
+        if self.head > 64 and self.head * 2 > len(self.dts):
+            # Drop expired samples once they are the majority, so trimming stays amortized O(1)
+            del self.dts[:self.head], self.values[:self.head]
+            self.head = 0
+
+# --- Alert Sinks ---
+class AlertSink(Protocol):
+    async def send(self, alerts: List[WeatherAlert]) -> None: ...
+
+class MemoryAlertSink:
+    # Keeps the latest alert events in memory, newest first (served by /api/weather/alerts and used as the
+    # local stand-in for a webhook receiver)
+    def __init__(self, size: Optional[int] = None):
+        self.events: Deque[WeatherAlert] = deque(maxlen=size or settings.ALERT_HISTORY_SIZE)
+
+    async def send(self, alerts: List[WeatherAlert]) -> None:
+        for alert in alerts:
+            self.events.appendleft(alert)
+
+class WebhookAlertSink:
+    # POSTs each batch of alert events as a JSON list
+    def __init__(self, url: str, http_client: Optional[httpx.AsyncClient] = None):
+        self.url = url
+        self.http_client = http_client
+
+    async def send(self, alerts: List[WeatherAlert]) -> None:
+        payload = [alert.model_dump(mode="json") for alert in alerts]
+        if self.http_client is None:
+            async with create_http_client() as client:
+                response = await client.post(self.url, json=payload)
+        else:
+            response = await self.http_client.post(self.url, json=payload)
+        response.raise_for_status()
+
+# --- Alert Engine ---
+class AlertEngine:
+    def __init__(self, settings_service: FarmSettingsService, sinks: Optional[List[AlertSink]] = None, rules: Optional[List[AlertRule]] = None):
+        self.settings_service = settings_service
+        self.history = MemoryAlertSink()
+        self.sinks: List[AlertSink] = [self.history, *(sinks or [])]
+        self.rules = rules if rules is not None else load_alert_rules()
+        self.batch_window = settings.ALERT_BATCH_WINDOW_SECONDS
+        self.compiled = CompiledRules(self.rules)
+        # Per-location state: one row per location in the (locations x rules) matrices
+        self._rows: Dict[str, int] = {}
+        self._active: Any = None  # bool matrix: rule currently firing
+        self._streak: Any = None  # int matrix: consecutive matching observations
+        self._samples: Dict[str, SampleHistory] = {}  # Metric values within the longest rate window, per location
+        self._active_alerts: Dict[Tuple[str, str], WeatherAlert] = {}
+        self._pending: List[WeatherObservation] = []
+
+    def active_alerts(self) -> List[WeatherAlert]:
+        return sorted(self._active_alerts.values(), key=lambda alert: alert.observed_at, reverse=True)
+
+    def _ensure_rows(self, location_ids: List[str]) -> None:
+        import numpy as np
+
+        new = [location_id for location_id in dict.fromkeys(location_ids) if location_id not in self._rows]
+        rule_count = len(self.rules)
+        if self._active is None:
+            self._active = np.zeros((0, rule_count), dtype=bool)
+            self._streak = np.zeros((0, rule_count), dtype=np.int64)
+        if not new:
+            return
+        for location_id in new:
+            self._rows[location_id] = len(self._rows)
+        self._active = np.vstack([self._active, np.zeros((len(new), rule_count), dtype=bool)])
+        self._streak = np.vstack([self._streak, np.zeros((len(new), rule_count), dtype=np.int64)])
+
+    def evaluate(self, observations: List[WeatherObservation], enabled: bool = True) -> List[WeatherAlert]:
+        # Updates the rule state with a batch of observations and returns the fired/cleared events.
+        # Repeated observations of one location are applied in order, one round per observation.
+        # The n-th observation of a location (in dt order) goes to round n.
+        # With `enabled` off only the rate history is updated: no rule fires or clears.
+        rounds: List[List[WeatherObservation]] = []
+        seen: Dict[str, int] = {}
+        for observation in sorted(observations, key=lambda item: item.dt):
+            location_id = observation.location_id or PRIMARY_LOCATION_ID
+            round_number = seen.get(location_id, 0)
+            seen[location_id] = round_number + 1
+            if round_number == len(rounds):
+                rounds.append([])
+            rounds[round_number].append(observation)
+        alerts: List[WeatherAlert] = []
+        for batch in rounds:
+            alerts.extend(self._evaluate_round(batch, enabled))
+        return alerts
+
+    def _evaluate_round(self, observations: List[WeatherObservation], enabled: bool = True) -> List[WeatherAlert]:
+        import numpy as np
+
+        if not self.rules or not observations:
+            return []
+        rules = self.compiled
+        location_ids = [observation.location_id or PRIMARY_LOCATION_ID for observation in observations]
+        self._ensure_rows(location_ids)
+        rows = np.array([self._rows[location_id] for location_id in location_ids], dtype=np.intp)
+
+        values = np.array(
+            [[np.nan if getattr(observation, metric) is None else getattr(observation, metric) for metric in ALERT_METRICS]
+             for observation in observations],
+            dtype=np.float64
+        )
+        # Baseline per observation and rate window: the oldest sample still inside the window
+        baselines = np.full((len(observations), len(rules.windows), len(ALERT_METRICS)), np.nan)
+        for i, (location_id, observation) in enumerate(zip(location_ids, observations)):
+            samples = self._samples.get(location_id)
+            if samples is None:
+                samples = self._samples[location_id] = SampleHistory()
+            if enabled:
+                for w, window in enumerate(rules.windows):
+                    baseline = samples.baseline(observation.dt - window)
+                    if baseline is not None:
+                        baselines[i, w] = baseline
+            samples.add(observation.dt, values[i], rules.max_window)
+        if not enabled:
+            return []
+
+        measured = values[:, rules.metric_index]  # (observations x rules)
+        if rules.is_rate.any():
+            change = measured - baselines[:, rules.window_index, rules.metric_index]
+            measured = np.where(rules.is_rate, change, measured)
+        distance = rules.sign * (measured - rules.threshold)  # >= 0 on the alerting side; NaN never matches
+        hit = distance >= 0
+        clear = distance < -rules.clear_margin
+
+        active = self._active[rows]
+        streak = np.where(hit, self._streak[rows] + 1, 0)
+        fire = ~active & (streak >= rules.debounce)
+        cleared = active & clear
+        self._active[rows] = (active | fire) & ~cleared
+        self._streak[rows] = streak
+
+        alerts: List[WeatherAlert] = []
+        for i, r in zip(*np.nonzero(fire | cleared)):
+            rule = rules.rules[r]
+            alert = WeatherAlert(
+                rule=rule.name,
+                state="fired" if fire[i, r] else "cleared",
+                location_id=location_ids[i],
+                metric=rule.metric,
+                value=float(measured[i, r]),
+                threshold=rule.threshold,
+                severity=rule.severity,
+                message=rule.message,
+                observed_at=datetime.fromtimestamp(observations[i].dt, tz=timezone.utc)
+            )
+            if alert.state == "fired":
+                self._active_alerts[(alert.location_id, rule.name)] = alert
+            else:
+                self._active_alerts.pop((alert.location_id, rule.name), None)
+            alerts.append(alert)
+        return alerts
+
+    async def add_observation(self, observation: WeatherObservation) -> None:
+        # Observation listener: observations stored within the batch window (e.g. one polling round)
+        # are evaluated together; the first one of a batch waits for the window and processes it.
+        self._pending.append(observation)
+        if len(self._pending) > 1:
+            return
+        await asyncio.sleep(self.batch_window)
+        batch, self._pending = self._pending, []
+        await self.process(batch)
+
+    async def process(self, observations: List[WeatherObservation]) -> List[WeatherAlert]:
+        # The rate history is always kept current; rules fire and clear only while alerts are enabled
+        current_settings = await self.settings_service.get_settings()
+        alerts = self.evaluate(observations, enabled=current_settings.extreme_weather_alerts)
+        if not alerts:
+            return []
+        for alert in alerts:
+            logger.info(f"Alert {alert.state}: {alert.rule} at {alert.location_id} ({alert.metric}={alert.value:g}).")
+        await asyncio.gather(*(self._send(sink, alerts) for sink in self.sinks))
+        return alerts
+
+    async def _send(self, sink: AlertSink, alerts: List[WeatherAlert]) -> None:
+        try:
+            await sink.send(alerts)
+        except Exception as e:
+            logger.error(f"Error delivering alerts to {type(sink).__name__}: {e}")
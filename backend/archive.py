@@ -0,0 +1,639 @@
+import argparse
+import asyncio
+import csv
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from .config import settings
+from .models import PRIMARY_LOCATION_ID, AggregateBucket, MetricSummary, WeatherObservation
+from .rollups import ROLLUP_BUCKETS, ROLLUP_METRICS, WEEK_OFFSET
+
+logger = logging.getLogger(__name__)
+
+# --- Local Observation Archive ---
+# A columnar copy of the observation history on local disk, for range scans and aggregations that would otherwise
+# page through Appwrite and validate every document. Layout under ARCHIVE_PATH:
+#   <location>/index.json                     partitions with row count, version and per-column min/max
+#   <location>/<YYYY-MM-DD>/<column>.<version>.npy   one NumPy array per column and UTC day (by OWM `dt`)
+#   <location>/staging/<YYYY-MM-DD>.bin         live observations not yet compacted (fixed-size records)
+# Readers memory-map only the columns they need, in the partitions whose day and min/max can match the query.
+# Backfills rebuild the partitions they touch under a new version, then swap the index (atomic rename), so a reader
+# never sees a half-written day. Rows are unique per (location, dt): re-importing the same history is a no-op.
+# Live observations are appended to the day's staging file instead, so one observation costs one small write rather
+# than a rewrite of the whole day. Staged days are compacted into their partitions once a later day starts and by the
+# periodic compact() job; scans merge staged rows in (a staged row replaces a stored one with the same dt).
+# Metric columns are float32 (NaN = missing): half the size of float64, exact enough for weather readings.
+# NumPy is imported on first use, not at startup.
+
+ARCHIVE_COLUMNS = (
+    "temperature", "feels_like", "humidity", "pressure", "wind_speed", "wind_gust", "wind_direction", "visibility"
+)
+DAY_SECONDS = 86400
+OUTPUT_DECIMALS = 4  # float32 values are rounded when returned, so 13.08 is not reported as 13.079999923706055
+SAFE_LOCATION_ID = re.compile(r"[A-Za-z0-9_-][A-Za-z0-9_.-]*")
+STAGING_FIELDS = [("dt", "<i8")] + [(column, "<f4") for column in ARCHIVE_COLUMNS]  # Record layout of staging files
+
+def partition_day(dt: int) -> str:
+    return datetime.fromtimestamp(dt // DAY_SECONDS * DAY_SECONDS, tz=timezone.utc).strftime("%Y-%m-%d")
+
+def _epoch(moment: Optional[datetime]) -> Optional[int]:
+    if moment is None:
+        return None
+    return int((moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)).timestamp())
+
+def _latest_rows(dts: Any) -> Any:
+    # Indices that sort `dts` and keep only the last row for each dt (later rows replace earlier ones)
+    import numpy as np
+
+    order = np.argsort(dts, kind="stable")
+    sorted_dts = dts[order]
+    return order[np.r_[sorted_dts[1:] != sorted_dts[:-1], True]]
+
+def output_value(value: float) -> Optional[float]:
+    # JSON-friendly column value: NaN becomes None
+    return None if value != value else round(float(value), OUTPUT_DECIMALS)
+
+def observation_columns(observations: Sequence[WeatherObservation]) -> Tuple[List[str], Dict[str, List[float]]]:
+    # (location ids, column values) for a batch of observations; missing values become NaN
+    location_ids = [observation.location_id or PRIMARY_LOCATION_ID for observation in observations]
+    columns: Dict[str, List[float]] = {"dt": [observation.dt for observation in observations]}
+    for column in ARCHIVE_COLUMNS:
+        columns[column] = [
+            float("nan") if getattr(observation, column) is None else getattr(observation, column) for observation in observations
+        ]
+    return location_ids, columns
+
+class ObservationArchive:
+    def __init__(self, path: Optional[str] = None):
+        self.root = path if path is not None else settings.ARCHIVE_PATH
+        self._thread_lock = threading.Lock()
+        self._indexes: Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]] = {}  # location dir -> (index file identity, index)
+        # Open memory maps, reused across queries: a column file is never modified once written (new data gets a new
+        # version), so a map stays valid until the partition moves to another version. Each map holds a file
+        # descriptor, so only the ARCHIVE_OPEN_FILES most recently used are kept.
+        self._maps: "OrderedDict[Tuple[str, str, str], Tuple[int, Any]]" = OrderedDict()  # (location dir, day, column) -> (version, array)
+        self.open_files = settings.ARCHIVE_OPEN_FILES
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.root)
+
+    # --- Layout ---
+    def _location_dir(self, location_id: str) -> str:
+        # Appwrite ids are safe directory names; anything else is hashed (the id is kept in index.json)
+        name = location_id if SAFE_LOCATION_ID.fullmatch(location_id) else hashlib.sha1(location_id.encode()).hexdigest()
+        return os.path.join(self.root, name)
+
+    @staticmethod
+    def _column_path(location_dir: str, day: str, column: str, version: int) -> str:
+        return os.path.join(location_dir, day, f"{column}.{version}.npy")
+
+    @staticmethod
+    def _staging_path(location_dir: str, day: str) -> str:
+        return os.path.join(location_dir, "staging", f"{day}.bin")
+
+    def _load_index(self, location_dir: str) -> Dict[str, Any]:
+        # Cached per location until index.json is replaced by a writer (in this or another process)
+        path = os.path.join(location_dir, "index.json")
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return {"partitions": {}}
+        identity = (stat.st_ino, stat.st_mtime_ns)  # Every save renames a new file into place
+        cached = self._indexes.get(location_dir)
+        if cached is not None and cached[0] == identity:
+            return cached[1]
+        with open(path) as f:
+            index = json.load(f)
+        self._indexes[location_dir] = (identity, index)
+        return index
+
+    def _save_index(self, location_dir: str, index: Dict[str, Any]) -> None:
+        path = os.path.join(location_dir, "index.json")
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w") as f:
+            json.dump(index, f, sort_keys=True)
+        os.replace(temporary, path)
+
+    def locations(self) -> List[str]:
+        if not self.enabled or not os.path.isdir(self.root):
+            return []
+        found = []
+        for name in sorted(os.listdir(self.root)):
+            location_dir = os.path.join(self.root, name)
+            if os.path.isfile(os.path.join(location_dir, "index.json")):  # Written by the first append, staged or not
+                found.append(self._load_index(location_dir).get("location_id", name))
+        return found
+
+    def _column(self, location_dir: str, day: str, column: str, version: int) -> Any:
+        import numpy as np
+
+        key = (location_dir, day, column)
+        cached = self._maps.get(key)
+        if cached is not None and cached[0] == version:
+            self._maps.move_to_end(key)
+            return cached[1]
+        mapped = np.load(self._column_path(location_dir, day, column, version), mmap_mode="r")
+        self._maps[key] = (version, mapped)
+        self._maps.move_to_end(key)
+        while len(self._maps) > self.open_files:
+            self._maps.popitem(last=False)
+        return mapped
+
+    def partitions(self, location_id: str = PRIMARY_LOCATION_ID) -> Dict[str, Dict[str, Any]]:
+        return self._load_index(self._location_dir(location_id))["partitions"]
+
+    # --- Writing ---
+    @contextmanager
+    def _writing(self) -> Iterator[None]:
+        # One writer at a time: threads of this process, then other processes (live listener vs. a CLI backfill)
+        import fcntl
+
+        os.makedirs(self.root, exist_ok=True)
+        with self._thread_lock:
+            fd = os.open(os.path.join(self.root, ".lock"), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+
+    def append(self, observations: Sequence[WeatherObservation]) -> int:
+        location_ids, columns = observation_columns(observations)
+        return self.append_columns(location_ids, columns)
+
+    def append_columns(self, location_ids: Sequence[str], columns: Dict[str, Sequence[float]]) -> int:
+        # Merges rows into their (location, day) partitions; a row with the same dt as a stored one replaces it.
+        # Returns the number of rows written.
+        import numpy as np
+
+        if not len(location_ids):
+            return 0
+        locations = np.asarray(location_ids)
+        dts = np.asarray(columns["dt"], dtype=np.int64)
+        values = {column: np.asarray(columns.get(column, np.full(len(dts), np.nan)), dtype=np.float32) for column in ARCHIVE_COLUMNS}
+        written = 0
+        with self._writing():
+            for location_id in np.unique(locations):
+                in_location = locations == location_id
+                location_dir = self._location_dir(str(location_id))
+                index = json.loads(json.dumps(self._load_index(location_dir)))  # Private copy; readers keep the old one
+                index["location_id"] = str(location_id)
+                location_dts = dts[in_location]
+                days = location_dts // DAY_SECONDS
+                replaced: List[Tuple[str, int]] = []
+                for day_number in np.unique(days):
+                    in_day = days == day_number
+                    day = partition_day(int(day_number) * DAY_SECONDS)
+                    batch = {"dt": location_dts[in_day], **{column: values[column][in_location][in_day] for column in ARCHIVE_COLUMNS}}
+                    previous = index["partitions"].get(day)
+                    index["partitions"][day] = self._write_partition(location_dir, day, previous, batch)
+                    written += int(in_day.sum())
+                    if previous is not None:
+                        replaced.append((day, previous["version"]))
+                self._save_index(location_dir, index)
+                self._remove_versions(location_dir, replaced)
+        return written
+
+    def _remove_versions(self, location_dir: str, replaced: Sequence[Tuple[str, int]]) -> None:
+        # Old versions are unlinked only after the index swap; readers that already mapped them keep their pages
+        for day, version in replaced:
+            for column in ("dt",) + ARCHIVE_COLUMNS:
+                try:
+                    os.remove(self._column_path(location_dir, day, column, version))
+                except FileNotFoundError:
+                    pass
+
+    def _write_partition(self, location_dir: str, day: str, previous: Optional[Dict[str, Any]], batch: Dict[str, Any]) -> Dict[str, Any]:
+        import numpy as np
+
+        if previous is not None:
+            stored = {
+                column: np.load(self._column_path(location_dir, day, column, previous["version"]))
+                for column in ("dt",) + ARCHIVE_COLUMNS
+            }
+            merged = {column: np.concatenate([stored[column], batch[column]]) for column in stored}
+        else:
+            merged = batch
+        keep = _latest_rows(merged["dt"])  # The batch comes after the stored rows, so its rows win
+
+        version = (previous["version"] + 1) if previous is not None else 1
+        os.makedirs(os.path.join(location_dir, day), exist_ok=True)
+        entry: Dict[str, Any] = {"version": version, "rows": int(len(keep)), "min": {}, "max": {}}
+        for column in ("dt",) + ARCHIVE_COLUMNS:
+            data = np.ascontiguousarray(merged[column][keep])
+            np.save(self._column_path(location_dir, day, column, version), data)
+            valid = data if column == "dt" else data[~np.isnan(data)]
+            entry["min"][column] = valid.min().item() if len(valid) else None
+            entry["max"][column] = valid.max().item() if len(valid) else None
+        return entry
+
+    # --- Live appends ---
+    def append_live(self, observations: Sequence[WeatherObservation]) -> int:
+        # Appends rows to the staging files of their days, then compacts the days that closed. Returns rows staged.
+        import numpy as np
+
+        location_ids, columns = observation_columns(observations)
+        if not location_ids:
+            return 0
+        records = np.zeros(len(location_ids), dtype=np.dtype(STAGING_FIELDS))
+        for column in ("dt",) + ARCHIVE_COLUMNS:
+            records[column] = columns[column]
+        locations = np.asarray(location_ids)
+        with self._writing():
+            for location_id in np.unique(locations):
+                location_dir = self._location_dir(str(location_id))
+                os.makedirs(os.path.join(location_dir, "staging"), exist_ok=True)
+                if not os.path.isfile(os.path.join(location_dir, "index.json")):
+                    self._save_index(location_dir, {"location_id": str(location_id), "partitions": {}})
+                rows = records[locations == location_id]
+                days = rows["dt"] // DAY_SECONDS
+                for day_number in np.unique(days):
+                    path = self._staging_path(location_dir, partition_day(int(day_number) * DAY_SECONDS))
+                    with open(path, "ab") as f:
+                        # A record torn by a crash would misalign every later one: drop it first
+                        size = os.fstat(f.fileno()).st_size
+                        if size % records.itemsize:
+                            f.truncate(size - size % records.itemsize)
+                        f.write(rows[days == day_number].tobytes())
+                self._compact_location(location_dir, str(location_id), before=partition_day(int(days.max()) * DAY_SECONDS))
+        return len(location_ids)
+
+    def _read_staging(self, path: str) -> Any:
+        import numpy as np
+
+        dtype = np.dtype(STAGING_FIELDS)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:  # Compacted meanwhile
+            return np.zeros(0, dtype=dtype)
+        return np.frombuffer(data, dtype=dtype, count=len(data) // dtype.itemsize)  # Ignores a partly written record
+
+    def _staged_rows(self, location_dir: str) -> Dict[str, Any]:
+        # Staged records per day (usually only today, plus yesterday until the first observation of the new day)
+        try:
+            names = os.listdir(os.path.join(location_dir, "staging"))
+        except FileNotFoundError:
+            return {}
+        staged = {}
+        for name in sorted(names):
+            if name.endswith(".bin"):
+                records = self._read_staging(os.path.join(location_dir, "staging", name))
+                if len(records):
+                    staged[name[:-len(".bin")]] = records
+        return staged
+
+    def _compact_location(self, location_dir: str, location_id: str, before: Optional[str] = None) -> int:
+        # Folds staged days (those before `before`, or all) into their partitions. The caller holds the writer lock.
+        # The index is swapped before the staging files are removed, so a reader that lists the staging files first
+        # and loads the index second always sees every row (duplicates are resolved by dt).
+        staged = {day: records for day, records in self._staged_rows(location_dir).items() if before is None or day < before}
+        if not staged:
+            return 0
+        index = json.loads(json.dumps(self._load_index(location_dir)))
+        index["location_id"] = location_id
+        replaced: List[Tuple[str, int]] = []
+        for day, records in staged.items():
+            previous = index["partitions"].get(day)
+            batch = {column: records[column] for column in ("dt",) + ARCHIVE_COLUMNS}
+            index["partitions"][day] = self._write_partition(location_dir, day, previous, batch)
+            if previous is not None:
+                replaced.append((day, previous["version"]))
+        self._save_index(location_dir, index)
+        for day in staged:
+            os.remove(self._staging_path(location_dir, day))
+        self._remove_versions(location_dir, replaced)
+        return sum(len(records) for records in staged.values())
+
+    def compact(self) -> int:
+        # Periodic job: folds every staged day, including today's, into its partition. Returns rows compacted.
+        compacted = 0
+        for location_id in self.locations():
+            with self._writing():
+                compacted += self._compact_location(self._location_dir(location_id), location_id)
+        return compacted
+
+    async def add_observation(self, observation: WeatherObservation) -> None:
+        # Observation listener: stages every persisted observation in the archive (file I/O off the event loop)
+        await run_in_threadpool(self.append_live, [observation])
+
+    # --- Reading ---
+    def _matching_partitions(
+        self, index: Dict[str, Any], start: Optional[int], end: Optional[int], filters: Dict[str, Tuple[Optional[float], Optional[float]]]
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        # Partition pruning: day first, then the min/max of every filtered column
+        matching = []
+        for day, entry in sorted(index["partitions"].items()):
+            if (start is not None and entry["max"]["dt"] < start) or (end is not None and entry["min"]["dt"] > end):
+                continue
+            pruned = False
+            for column, (low, high) in filters.items():
+                column_min, column_max = entry["min"][column], entry["max"][column]
+                if column_min is None or (low is not None and column_max < low) or (high is not None and column_min > high):
+                    pruned = True
+                    break
+            if not pruned:
+                matching.append((day, entry))
+        return matching
+
+    def scan(
+        self,
+        location_id: str = PRIMARY_LOCATION_ID,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        columns: Optional[Sequence[str]] = None,
+        filters: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None,
+    ) -> Dict[str, Any]:
+        # Rows in [start, end] (inclusive) matching every `filters` range, as one NumPy array per column, ordered by dt.
+        # Only `dt`, the requested columns and the filtered columns are read.
+        import numpy as np
+
+        columns = list(columns or ARCHIVE_COLUMNS)
+        filters = filters or {}
+        for column in list(columns) + list(filters):
+            if column not in ARCHIVE_COLUMNS:
+                raise ValueError(f"Unknown archive column: {column}")
+        start_dt, end_dt = _epoch(start), _epoch(end)
+        location_dir = self._location_dir(location_id)
+        needed = ["dt"] + list(dict.fromkeys(columns + list(filters)))
+
+        for attempt in range(2):
+            staged = self._staged_rows(location_dir)  # Before the index: see _compact_location
+            index = self._load_index(location_dir)
+            parts: Dict[str, List[Any]] = {column: [] for column in needed}
+            try:
+                days: Dict[str, Optional[Dict[str, Any]]] = dict(self._matching_partitions(index, start_dt, end_dt, filters))
+                first_day, last_day = partition_day(start_dt or 0), partition_day(end_dt) if end_dt is not None else None
+                for day in staged:
+                    if first_day <= day and (last_day is None or day <= last_day):
+                        days[day] = index["partitions"].get(day)  # Staged rows are not covered by the min/max index
+                for day, entry in sorted(days.items()):
+                    mapped = {column: self._column(location_dir, day, column, entry["version"]) for column in needed} if entry else None
+                    if day in staged:
+                        records = staged[day]
+                        merged = {
+                            column: records[column] if mapped is None else np.concatenate([mapped[column], records[column]])
+                            for column in needed
+                        }
+                        keep = _latest_rows(merged["dt"])
+                        mapped = {column: merged[column][keep] for column in needed}
+                    mask = None
+                    if start_dt is not None and mapped["dt"][0] < start_dt:  # dt is sorted within a day
+                        mask = mapped["dt"] >= start_dt
+                    if end_dt is not None and mapped["dt"][-1] > end_dt:
+                        mask = (mapped["dt"] <= end_dt) if mask is None else mask & (mapped["dt"] <= end_dt)
+                    for column, (low, high) in filters.items():
+                        if low is not None:
+                            mask = (mapped[column] >= low) if mask is None else mask & (mapped[column] >= low)
+                        if high is not None:
+                            mask = (mapped[column] <= high) if mask is None else mask & (mapped[column] <= high)
+                    for column in needed:
+                        parts[column].append(np.array(mapped[column] if mask is None else mapped[column][mask]))
+                break
+            except FileNotFoundError:
+                # A writer replaced a partition between reading the index and opening its files: read the new index
+                if attempt:
+                    raise
+        result = {"dt": np.concatenate(parts["dt"]) if parts["dt"] else np.zeros(0, dtype=np.int64)}
+        for column in columns:
+            result[column] = np.concatenate(parts[column]) if parts[column] else np.zeros(0, dtype=np.float32)
+        return result
+
+    def aggregate(
+        self,
+        bucket: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        location_id: str = PRIMARY_LOCATION_ID,
+        metrics: Sequence[str] = ROLLUP_METRICS,
+    ) -> List[AggregateBucket]:
+        # min/max/mean/last per metric and hour/day/week bucket, the same shape as the Appwrite rollups
+        import numpy as np
+
+        data = self.scan(location_id, start, end, metrics)
+        dts = data["dt"]
+        if not len(dts):
+            return []
+        size = ROLLUP_BUCKETS[bucket]
+        offset = WEEK_OFFSET if bucket == "week" else 0
+        starts = (dts - offset) // size * size + offset  # dts are sorted, so buckets are contiguous
+        group_starts = np.flatnonzero(np.r_[True, starts[1:] != starts[:-1]])
+        group_ends = np.r_[group_starts[1:], len(dts)] - 1
+        counts = np.diff(np.r_[group_starts, len(dts)])
+
+        summaries: Dict[str, Tuple[Any, ...]] = {}
+        for metric in metrics:
+            values = data[metric].astype(np.float64)
+            valid = ~np.isnan(values)
+            metric_counts = np.add.reduceat(valid.astype(np.int64), group_starts)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                mins = np.fmin.reduceat(values, group_starts)
+                maxs = np.fmax.reduceat(values, group_starts)
+                means = np.add.reduceat(np.where(valid, values, 0.0), group_starts) / metric_counts
+            summaries[metric] = (mins, maxs, means, metric_counts, values[group_ends])
+
+        buckets = []
+        for i, group_start in enumerate(starts[group_starts]):
+            buckets.append(AggregateBucket(
+                start=datetime.fromtimestamp(int(group_start), tz=timezone.utc),
+                count=int(counts[i]),
+                metrics={
+                    metric: MetricSummary(
+                        min=output_value(mins[i]) if metric_counts[i] else None,
+                        max=output_value(maxs[i]) if metric_counts[i] else None,
+                        mean=output_value(means[i]) if metric_counts[i] else None,
+                        last=output_value(lasts[i])
+                    )
+                    for metric, (mins, maxs, means, metric_counts, lasts) in summaries.items()
+                }
+            ))
+        return buckets
+
+# --- Backfill ---
+# Existing history is imported in parallel batches. Appwrite: the range is split into time slices paged
+# concurrently (cursor paging within a slice is sequential). CSV: files are parsed in a process pool.
+# Slices overlap by their inclusive bounds and files may repeat rows; both are absorbed by the (location, dt) merge.
+
+BACKFILL_BATCH_SIZE = 5000  # Rows appended per write
+
+async def backfill_from_appwrite(
+    archive: ObservationArchive,
+    weather_service: Any,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    concurrency: Optional[int] = None,
+) -> int:
+    # Returns the number of rows written
+    concurrency = concurrency or settings.ARCHIVE_BACKFILL_CONCURRENCY
+    if start is None:
+        async for doc in weather_service.iter_weather_history(page_size=1):
+            start = datetime.fromtimestamp(weather_service.decode_observation(doc).dt, tz=timezone.utc)  # Oldest stored
+            break
+        if start is None:
+            return 0
+    start = start if start.tzinfo else start.replace(tzinfo=timezone.utc)
+    end = end if end is not None else datetime.now(timezone.utc)
+    end = end if end.tzinfo else end.replace(tzinfo=timezone.utc)
+    slice_count = max(1, concurrency * 4)
+    step = (end - start) / slice_count
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def import_slice(slice_start: datetime, slice_end: datetime) -> int:
+        written = 0
+        batch: List[WeatherObservation] = []
+        async with semaphore:
+            async for doc in weather_service.iter_weather_history(start=slice_start, end=slice_end):
+                try:
+                    batch.append(weather_service.decode_observation(doc))
+                except (ValueError, TypeError) as e:
+                    logger.warning(f"Archive backfill: skipping document {doc.get('$id')}: {e}")
+                if len(batch) >= BACKFILL_BATCH_SIZE:
+                    written += await run_in_threadpool(archive.append, batch)
+                    batch = []
+            if batch:
+                written += await run_in_threadpool(archive.append, batch)
+        logger.info(f"Archive backfill: {slice_start.isoformat()} - {slice_end.isoformat()}: {written} row(s).")
+        return written
+
+    results = await asyncio.gather(*(import_slice(start + step * i, start + step * (i + 1)) for i in range(slice_count)))
+    return sum(results)
+
+def _csv_number(value: Optional[str]) -> float:
+    return float(value) if value not in (None, "") else float("nan")
+
+def read_csv_columns(path: str, default_location_id: str = PRIMARY_LOCATION_ID) -> Tuple[List[str], Dict[str, List[float]]]:
+    # Parses one CSV dump into (location ids, columns). Files with a `dt` column use the flat v2 attribute names;
+    # anything else is read as the v1 export of /api/weather/history/export (string fields, JSON location and sun).
+    location_ids: List[str] = []
+    columns: Dict[str, List[float]] = {column: [] for column in ("dt",) + ARCHIVE_COLUMNS}
+    with open(path, newline="") as f:
+        reader = csv.DictReader(f)
+        flat = "dt" in (reader.fieldnames or [])
+        for line, row in enumerate(reader, start=2):
+            try:
+                if flat:
+                    dt = int(float(row["dt"]))
+                    values = {column: _csv_number(row.get(column)) for column in ARCHIVE_COLUMNS}
+                else:
+                    observation = WeatherObservation.from_legacy_document({key: value for key, value in row.items() if value != ""})
+                    dt = observation.dt
+                    values = {
+                        column: float("nan") if getattr(observation, column) is None else getattr(observation, column) for column in ARCHIVE_COLUMNS
+                    }
+            except (ValueError, TypeError, KeyError) as e:
+                logger.warning(f"Archive backfill: {path}:{line}: skipping row: {e}")
+                continue
+            location_ids.append(row.get("location_id") or default_location_id)
+            columns["dt"].append(dt)
+            for column, value in values.items():
+                columns[column].append(value)
+    return location_ids, columns
+
+def backfill_from_csv(
+    archive: ObservationArchive,
+    paths: Sequence[str],
+    default_location_id: str = PRIMARY_LOCATION_ID,
+    concurrency: Optional[int] = None,
+) -> int:
+    # Parses the files in parallel worker processes and appends each one as it completes. Returns rows written.
+    concurrency = concurrency or settings.ARCHIVE_BACKFILL_CONCURRENCY
+    written = 0
+    with ProcessPoolExecutor(max_workers=min(concurrency, len(paths)) or 1) as pool:
+        for path, (location_ids, columns) in zip(paths, pool.map(read_csv_columns, paths, [default_location_id] * len(paths))):
+            for offset in range(0, len(location_ids), BACKFILL_BATCH_SIZE):
+                batch = slice(offset, offset + BACKFILL_BATCH_SIZE)
+                written += archive.append_columns(location_ids[batch], {column: values[batch] for column, values in columns.items()})
+            logger.info(f"Archive backfill: {path}: {len(location_ids)} row(s).")
+    return written
+
+# --- CLI ---
+# python -m backend.archive import-appwrite [--from ISO] [--to ISO] [--concurrency N]
+# python -m backend.archive import-csv dump1.csv [dump2.csv ...] [--location-id ID]
+# python -m backend.archive query --from ISO --to ISO [--columns temperature,humidity] [--where temperature:-5:0]
+# python -m backend.archive aggregate --bucket day --from ISO --to ISO
+# python -m backend.archive info
+
+def _parse_where(expressions: Sequence[str]) -> Dict[str, Tuple[Optional[float], Optional[float]]]:
+    # "column:min:max", either bound may be empty
+    filters = {}
+    for expression in expressions:
+        column, _, bounds = expression.partition(":")
+        low, _, high = bounds.partition(":")
+        filters[column] = (float(low) if low else None, float(high) if high else None)
+    return filters
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local columnar archive of the observation history.")
+    parser.add_argument("--path", default=None, help="Archive directory (default: ARCHIVE_PATH)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_appwrite = commands.add_parser("import-appwrite", help="Backfill from the stored Appwrite history")
+    import_csv = commands.add_parser("import-csv", help="Backfill from CSV dumps")
+    import_csv.add_argument("files", nargs="+")
+    import_csv.add_argument("--location-id", default=PRIMARY_LOCATION_ID, help="Location of rows without a location_id column")
+    for command in (import_appwrite, import_csv):
+        command.add_argument("--concurrency", type=int, default=None, help="Parallel slices/files (default: ARCHIVE_BACKFILL_CONCURRENCY)")
+
+    query = commands.add_parser("query", help="Print the matching rows as CSV")
+    aggregate = commands.add_parser("aggregate", help="Print hour/day/week min/max/mean/last as JSON")
+    aggregate.add_argument("--bucket", choices=sorted(ROLLUP_BUCKETS), default="day")
+    query.add_argument("--columns", default=",".join(ARCHIVE_COLUMNS), help="Comma-separated columns")
+    query.add_argument("--where", action="append", default=[], metavar="COLUMN:MIN:MAX", help="Range filter (repeatable)")
+    for command in (import_appwrite, query, aggregate):
+        command.add_argument("--from", dest="start", type=datetime.fromisoformat, default=None, help="ISO start of the range")
+        command.add_argument("--to", dest="end", type=datetime.fromisoformat, default=None, help="ISO end of the range")
+    for command in (query, aggregate):
+        command.add_argument("--location-id", default=PRIMARY_LOCATION_ID)
+    commands.add_parser("info", help="List locations and partitions")
+    args = parser.parse_args()
+
+    archive = ObservationArchive(args.path)
+    if not archive.enabled:
+        raise SystemExit("No archive directory: set ARCHIVE_PATH or pass --path.")
+
+    if args.command == "import-appwrite":
+        from .services import FarmSettingsService, OpenWeatherMapService, WeatherService, create_appwrite_service, create_http_client
+
+        async def run() -> int:
+            async with create_http_client() as http_client:
+                appwrite_service = create_appwrite_service(http_client)
+                weather_service = WeatherService(appwrite_service, OpenWeatherMapService(http_client), FarmSettingsService(appwrite_service))
+                return await backfill_from_appwrite(archive, weather_service, args.start, args.end, args.concurrency)
+
+        print(f"Archived {asyncio.run(run())} row(s).")
+    elif args.command == "import-csv":
+        print(f"Archived {backfill_from_csv(archive, args.files, args.location_id, args.concurrency)} row(s).")
+    elif args.command == "query":
+        columns = [column for column in args.columns.split(",") if column]
+        data = archive.scan(args.location_id, args.start, args.end, columns, _parse_where(args.where))
+        writer = csv.writer(sys.stdout)
+        writer.writerow(["dt"] + columns)
+        for i in range(len(data["dt"])):
+            writer.writerow([int(data["dt"][i])] + [output_value(data[column][i]) for column in columns])
+    elif args.command == "aggregate":
+        buckets = archive.aggregate(args.bucket, args.start, args.end, args.location_id)
+        print(json.dumps([bucket.model_dump(mode="json") for bucket in buckets], indent=2))
+    else:
+        for location_id in archive.locations():
+            partitions = archive.partitions(location_id)
+            rows = sum(entry["rows"] for entry in partitions.values())
+            staged = sum(len(records) for records in archive._staged_rows(archive._location_dir(location_id)).values())
+            days = sorted(partitions)
+            print(f"{location_id}: {len(partitions)} partition(s), {rows} row(s), {days[0] if days else '-'} .. {days[-1] if days else '-'}, {staged} staged row(s)")
+
+if __name__ == "__main__":
+    main()
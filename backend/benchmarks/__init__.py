@@ -0,0 +1,32 @@
+import os
+from typing import Dict
+
+# --- Benchmarks ---
+# Reproducible performance measurements without OpenWeatherMap or Appwrite accounts: fakes.py serves local
+# stand-ins for both, load.py drives the API at a fixed concurrency and micro.py times hot functions.
+# Run everything with: python -m backend.benchmarks --output baseline.json [--compare previous.json]
+
+# Settings every benchmark run uses. They point the backend at the stand-ins and are set before backend.config is
+# imported, so values from backend/.env (real endpoints and keys) are never picked up.
+BENCHMARK_ENV: Dict[str, str] = {
+    "OPENWEATHERMAP_API_KEY": "benchmark",
+    "APPWRITE_ENDPOINT": "http://127.0.0.1:9/v1",  # Replaced with the stand-in's address by the load runner
+    "APPWRITE_PROJECT_ID": "benchmark",
+    "APPWRITE_DATABASE_ID": "benchmark",
+    "APPWRITE_API_KEY": "benchmark",
+    "APPWRITE_CLIENT": "http",  # Storage calls go over HTTP to the Appwrite stand-in
+    "APPWRITE_COLLECTION_ID": "weather_data",
+    "APPWRITE_COLLECTION_SETTINGS_ID": "farm_settings",
+    "APPWRITE_SETTINGS_DOCUMENT_ID": "settings",
+    "OPENWEATHERMAP_CALLS_PER_MINUTE": "100000",  # The stand-in has no quota; keep the client limiter out of the numbers
+    "OPENWEATHERMAP_RATE_LIMIT_BURST": "1000",
+    "SNAPSHOT_PATH": "",
+    "WRITE_BUFFER_PATH": "",
+    "LOG_LEVEL": "WARNING",
+}
+
+def configure_environment(**overrides: str) -> Dict[str, str]:
+    # Applies BENCHMARK_ENV (plus overrides) to this process and returns it for child processes
+    env = {**BENCHMARK_ENV, **overrides}
+    os.environ.update(env)
+    return env
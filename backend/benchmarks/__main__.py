@@ -0,0 +1,64 @@
+import argparse
+import json
+import sys
+from typing import Any, Dict
+
+from . import configure_environment
+from .baseline import build_baseline, compare, format_comparison, load_baseline, save_baseline
+from .load import SCENARIOS, run_load
+from .micro import run_micro
+
+def parse_env(pairs: list) -> Dict[str, str]:
+    env: Dict[str, str] = {}
+    for pair in pairs:
+        key, separator, value = pair.partition("=")
+        if not separator:
+            raise SystemExit(f"--env expects KEY=VALUE, got {pair!r}")
+        env[key] = value
+    return env
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the API against local OpenWeatherMap and Appwrite stand-ins.")
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=sorted(SCENARIOS), help="Load scenarios to run")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 16, 64], help="Concurrent clients (one run per level)")
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds per scenario and level")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Unmeasured seconds before each measurement")
+    parser.add_argument("--history-size", type=int, default=500, help="Stored observations seeded into the Appwrite stand-in")
+    parser.add_argument("--owm-latency-ms", type=float, default=50.0, help="Fixed OpenWeatherMap stand-in latency")
+    parser.add_argument("--owm-jitter-ms", type=float, default=20.0, help="Extra uniform random OpenWeatherMap latency")
+    parser.add_argument("--owm-error-rate", type=float, default=0.0, help="Fraction of OpenWeatherMap calls answered with 503")
+    parser.add_argument("--appwrite-latency-ms", type=float, default=5.0, help="Appwrite stand-in latency per call")
+    parser.add_argument("--number", type=int, default=2000, help="Calls per micro-benchmark round")
+    parser.add_argument("--repeat", type=int, default=7, help="Micro-benchmark rounds")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for generated weather data and stand-in behaviour")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="Backend setting for this run (repeatable)")
+    parser.add_argument("--skip-load", action="store_true", help="Run the micro-benchmarks only")
+    parser.add_argument("--skip-micro", action="store_true", help="Run the load scenarios only")
+    parser.add_argument("--output", help="Save the results as a JSON baseline")
+    parser.add_argument("--compare", help="Baseline to compare against; exits with status 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative slowdown before a regression is reported")
+    args = parser.parse_args()
+
+    env_overrides = parse_env(args.env)
+    configure_environment(**env_overrides)  # Before anything imports backend.config
+    parameters: Dict[str, Any] = {key: value for key, value in vars(args).items() if key not in ("output", "compare", "tolerance")}
+
+    micro = {} if args.skip_micro else run_micro(args.number, args.repeat, args.seed)
+    load = {} if args.skip_load else run_load(
+        args.scenarios, args.concurrency, args.duration, args.warmup, args.history_size, args.owm_latency_ms,
+        args.owm_jitter_ms, args.owm_error_rate, args.appwrite_latency_ms, args.seed, env_overrides
+    )
+    baseline = build_baseline(parameters, load, micro)
+    print(json.dumps({"load": load, "micro": micro}, indent=2))
+
+    if args.output:
+        save_baseline(args.output, baseline)
+        print(f"Saved baseline to {args.output}.")
+    if args.compare:
+        rows = compare(load_baseline(args.compare), baseline, args.tolerance)
+        print(format_comparison(rows))
+        if any(row["regression"] for row in rows):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# --- Baselines ---
+# A run is saved as one JSON document (environment, parameters, load and micro results). Comparing two runs
+# flags every figure that got worse by more than the tolerance: higher latency / per-call time, lower throughput.
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def build_baseline(parameters: Dict[str, Any], load: Dict[str, Any], micro: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "parameters": parameters,
+        "load": load,
+        "micro": micro,
+    }
+
+def save_baseline(path: str, baseline: Dict[str, Any]) -> None:
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    Path(path).write_text(json.dumps(baseline, indent=2) + "\n")
+
+def load_baseline(path: str) -> Dict[str, Any]:
+    return json.loads(Path(path).read_text())
+
+def _change(previous: float, current: float) -> float:
+    return (current - previous) / previous if previous else 0.0
+
+def compare(previous: Dict[str, Any], current: Dict[str, Any], tolerance: float) -> List[Dict[str, Any]]:
+    # One row per figure present in both runs; `regression` is set when it is worse by more than `tolerance`
+    rows: List[Dict[str, Any]] = []
+
+    def add(name: str, metric: str, before: float, after: float, higher_is_worse: bool) -> None:
+        change = _change(before, after)
+        worse = change if higher_is_worse else -change
+        rows.append({
+            "name": name, "metric": metric, "previous": before, "current": after,
+            "change": round(change, 4), "regression": worse > tolerance,
+        })
+
+    for name, result in current.get("load", {}).items():
+        before = previous.get("load", {}).get(name)
+        if before is None:
+            continue
+        add(name, "throughput_rps", before["throughput_rps"], result["throughput_rps"], higher_is_worse=False)
+        for percentile in ("p50", "p95", "p99"):
+            add(name, percentile, before["latency_ms"][percentile], result["latency_ms"][percentile], higher_is_worse=True)
+    for name, result in current.get("micro", {}).items():
+        before = previous.get("micro", {}).get(name)
+        if before is not None:
+            add(name, "per_call_us", before["per_call_us"], result["per_call_us"], higher_is_worse=True)
+    return rows
+
+def format_comparison(rows: List[Dict[str, Any]]) -> str:
+    lines = [f"{'benchmark':<28} {'metric':<15} {'previous':>12} {'current':>12} {'change':>8}"]
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        lines.append(
+            f"{row['name']:<28} {row['metric']:<15} {row['previous']:>12.3f} {row['current']:>12.3f} {row['change']:>+8.1%}{flag}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,207 @@
+import asyncio
+import json
+import random
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+# --- Local Stand-ins ---
+# Minimal OpenWeatherMap and Appwrite servers with deterministic (seeded) data, configurable latency and
+# error rate. Each runs on its own uvicorn server and event loop in a background thread of the benchmark process.
+
+def owm_payload(lat: float, lon: float, dt: int, rng: random.Random) -> Dict[str, Any]:
+    # A current-weather response shaped like OWM's /weather (metric units)
+    temperature = round(rng.uniform(-5.0, 38.0), 2)
+    return {
+        "coord": {"lat": lat, "lon": lon},
+        "weather": [{"id": 800, "main": "Clear", "description": "clear sky", "icon": "01d"}],
+        "main": {
+            "temp": temperature,
+            "feels_like": round(temperature - rng.uniform(0.0, 3.0), 2),
+            "humidity": rng.randint(20, 100),
+            "pressure": rng.randint(990, 1035),
+        },
+        "visibility": 10000,
+        "wind": {"speed": round(rng.uniform(0.0, 15.0), 2), "deg": rng.randint(0, 359), "gust": round(rng.uniform(0.0, 25.0), 2)},
+        "dt": dt,
+        "sys": {"sunrise": dt - 6 * 3600, "sunset": dt + 6 * 3600},
+        "name": "Benchmark Farm",
+    }
+
+def create_owm_app(latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0, seed: int = 0) -> FastAPI:
+    # GET /weather with a fixed delay (plus uniform jitter) per call; `error_rate` of the calls answer 503
+    app = FastAPI()
+    rng = random.Random(seed)
+    app.state.calls = 0
+    app.state.errors = 0
+
+    @app.get("/weather")
+    async def current_weather(lat: float, lon: float, appid: str = "", units: str = "metric"):
+        app.state.calls += 1
+        delay = latency_ms + rng.uniform(0.0, jitter_ms)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        if rng.random() < error_rate:
+            app.state.errors += 1
+            raise HTTPException(status_code=503, detail="Service Unavailable")
+        return owm_payload(lat, lon, int(time.time()), rng)
+
+    return app
+
+class DocumentStore:
+    # In-memory Appwrite collections implementing the query methods the backend uses
+    def __init__(self):
+        self.collections: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._last_ms = 0
+        self._sequence = 0
+
+    def _timestamp(self) -> str:
+        # Wall-clock $createdAt/$updatedAt, strictly increasing so ordering by them is stable
+        self._last_ms = max(self._last_ms + 1, int(time.time() * 1000))
+        return datetime.fromtimestamp(self._last_ms / 1000, tz=timezone.utc).isoformat(timespec="milliseconds")
+
+    def create(self, collection_id: str, document_id: Optional[str], data: Dict[str, Any]) -> Dict[str, Any]:
+        if not document_id or document_id == "unique()":
+            document_id = uuid.uuid4().hex[:20]
+        documents = self.collections.setdefault(collection_id, {})
+        if document_id in documents:
+            raise HTTPException(status_code=409, detail="Document with the requested ID already exists.")
+        now = self._timestamp()
+        self._sequence += 1
+        documents[document_id] = {
+            **data, "$id": document_id, "$sequence": str(self._sequence), "$collectionId": collection_id, "$databaseId": "benchmark",
+            "$createdAt": now, "$updatedAt": now, "$permissions": []
+        }
+        return documents[document_id]
+
+    def get(self, collection_id: str, document_id: str) -> Dict[str, Any]:
+        document = self.collections.get(collection_id, {}).get(document_id)
+        if document is None:
+            raise HTTPException(status_code=404, detail="Document with the requested ID could not be found.")
+        return document
+
+    def update(self, collection_id: str, document_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        document = self.get(collection_id, document_id)
+        document.update(data)
+        document["$updatedAt"] = self._timestamp()
+        return document
+
+    def list(self, collection_id: str, queries: List[str]) -> Dict[str, Any]:
+        documents = list(self.collections.get(collection_id, {}).values())
+        limit, offset, cursor = 25, 0, None
+        for raw_query in queries:
+            query = json.loads(raw_query)
+            method, attribute, values = query["method"], query.get("attribute"), query.get("values") or []
+            if method == "equal":
+                documents = [doc for doc in documents if doc.get(attribute) in values]
+            elif method == "isNull":
+                documents = [doc for doc in documents if doc.get(attribute) is None]
+            elif method in ("greaterThan", "greaterThanEqual", "lessThan", "lessThanEqual"):
+                compare = {
+                    "greaterThan": lambda a, b: a > b, "greaterThanEqual": lambda a, b: a >= b,
+                    "lessThan": lambda a, b: a < b, "lessThanEqual": lambda a, b: a <= b,
+                }[method]
+                documents = [doc for doc in documents if doc.get(attribute) is not None and compare(doc[attribute], values[0])]
+            elif method in ("orderAsc", "orderDesc"):
+                # Documents without the attribute sort first, as in Appwrite
+                documents.sort(
+                    key=lambda doc: (doc.get(attribute) is not None, doc.get(attribute), doc["$id"]), reverse=method == "orderDesc"
+                )
+            elif method == "limit":
+                limit = values[0]
+            elif method == "offset":
+                offset = values[0]
+            elif method == "cursorAfter":
+                cursor = values[0]
+        total = len(documents)
+        if cursor is not None:
+            ids = [doc["$id"] for doc in documents]
+            if cursor not in ids:
+                raise HTTPException(status_code=400, detail=f"Document '{cursor}' for the 'cursor' value not found.")
+            documents = documents[ids.index(cursor) + 1:]
+        return {"total": total, "documents": documents[offset:offset + limit]}
+
+def create_appwrite_app(store: DocumentStore, latency_ms: float = 0.0) -> FastAPI:
+    # The Appwrite documents REST API (the subset used by AsyncAppwriteService), mounted under /v1
+    app = FastAPI()
+    app.state.store = store
+    app.state.calls = 0
+    prefix = "/v1/databases/{database_id}/collections/{collection_id}/documents"
+
+    async def delay() -> None:
+        app.state.calls += 1
+        if latency_ms > 0:
+            await asyncio.sleep(latency_ms / 1000)
+
+    @app.get(prefix)
+    async def list_documents(database_id: str, collection_id: str, request: Request):
+        # Queries arrive as queries[]=... (REST client) or queries[0]=..., queries[1]=... (Appwrite SDK)
+        await delay()
+        indexed = sorted(
+            (int(key[len("queries["):-1]), value) for key, value in request.query_params.multi_items()
+            if key.startswith("queries[") and key[len("queries["):-1].isdigit()
+        )
+        queries = request.query_params.getlist("queries[]") + [value for _, value in indexed]
+        return store.list(collection_id, queries)
+
+    @app.post(prefix, status_code=201)
+    async def create_document(database_id: str, collection_id: str, request: Request):
+        await delay()
+        body = await request.json()
+        return store.create(collection_id, body.get("documentId"), body.get("data") or {})
+
+    @app.get(prefix + "/{document_id}")
+    async def get_document(database_id: str, collection_id: str, document_id: str):
+        await delay()
+        return store.get(collection_id, document_id)
+
+    @app.patch(prefix + "/{document_id}")
+    async def update_document(database_id: str, collection_id: str, document_id: str, request: Request):
+        await delay()
+        body = await request.json()
+        return store.update(collection_id, document_id, body.get("data") or {})
+
+    @app.exception_handler(HTTPException)
+    async def appwrite_error(request: Request, exc: HTTPException):
+        return JSONResponse({"message": exc.detail, "code": exc.status_code}, status_code=exc.status_code)
+
+    return app
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+class BackgroundServer:
+    # Serves an ASGI app on 127.0.0.1 from a daemon thread (its own event loop) until stop()
+    def __init__(self, app: Any, port: Optional[int] = None):
+        self.app = app
+        self.port = port or free_port()
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning", access_log=False))
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self, timeout: float = 10.0) -> "BackgroundServer":
+        self._thread = threading.Thread(target=self.server.run, daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError(f"Benchmark server on port {self.port} did not start.")
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        if self._thread is not None:
+            self._thread.join(timeout=10.0)
@@ -0,0 +1,178 @@
+import asyncio
+import math
+import os
+import random
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import httpx
+
+from . import configure_environment
+from .fakes import BackgroundServer, DocumentStore, create_appwrite_app, create_owm_app, free_port, owm_payload
+
+# --- Load Scenarios ---
+# The API runs in a uvicorn subprocess (as in production) against the stand-ins in fakes.py; this process serves
+# the stand-ins and drives a closed-loop load: `concurrency` workers each send the next request as soon as the
+# previous one returns. Latency is measured client-side, so it includes the HTTP round trip.
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    path: str
+    method: str = "GET"
+
+SCENARIOS = {
+    "current": Scenario("current", "/api/weather/current"),
+    "history": Scenario("history", "/api/weather/history?limit=50"),
+    "settings": Scenario("settings", "/api/settings"),
+}
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    # Nearest-rank percentile of an already sorted sequence
+    if not sorted_values:
+        return 0.0
+    rank = min(len(sorted_values), max(1, math.ceil(fraction * len(sorted_values))))
+    return sorted_values[rank - 1]
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    ordered = sorted(latencies)
+    to_ms = lambda seconds: round(seconds * 1000, 3)
+    return {
+        "requests": len(ordered) + errors,
+        "errors": errors,
+        "throughput_rps": round(len(ordered) / elapsed, 2) if elapsed > 0 else 0.0,
+        "latency_ms": {
+            "p50": to_ms(percentile(ordered, 0.50)),
+            "p95": to_ms(percentile(ordered, 0.95)),
+            "p99": to_ms(percentile(ordered, 0.99)),
+            "mean": to_ms(sum(ordered) / len(ordered)) if ordered else 0.0,
+            "max": to_ms(ordered[-1]) if ordered else 0.0,
+        },
+    }
+
+def seed_store(store: DocumentStore, history_size: int, seed: int) -> None:
+    # Settings document plus `history_size` stored observations in the configured schema, encoded by the
+    # backend itself so the documents match what production writes
+    from ..config import settings
+    from ..models import FarmSettingsData
+    from ..services import WeatherService
+
+    store.create(settings.APPWRITE_COLLECTION_SETTINGS_ID, settings.APPWRITE_SETTINGS_DOCUMENT_ID, FarmSettingsData().model_dump())
+    encoder = WeatherService(None, None, None)
+    rng = random.Random(seed)
+    lat, lon = settings.DEFAULT_FARM_LATITUDE, settings.DEFAULT_FARM_LONGITUDE
+    started = int(time.time()) - history_size * 1800
+    for i in range(history_size):
+        raw = owm_payload(lat, lon, started + i * 1800, rng)
+        document = encoder._encode_for_storage(encoder._build_observation(raw, lat, lon), raw)
+        store.create(encoder.weather_collection_id, None, document)
+
+@contextmanager
+def backend_process(env: Dict[str, str], startup_timeout: float = 30.0, ready_path: str = "/health/ready") -> Iterator[str]:
+    # Runs the API in a uvicorn subprocess and yields its base URL once `ready_path` answers 200
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=REPO_ROOT, env={**os.environ, **env}
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + startup_timeout
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"Backend exited during startup (code {process.returncode}).")
+            try:
+                if httpx.get(f"{url}{ready_path}", timeout=1.0).status_code == 200:
+                    break
+            except httpx.TransportError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError("Backend did not become ready in time.")
+            time.sleep(0.1)
+        yield url
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+async def drive(base_url: str, scenario: Scenario, concurrency: int, duration: float, warmup: float) -> Dict[str, Any]:
+    # Closed-loop load for `warmup` + `duration` seconds; only requests started after the warm-up are recorded
+    latencies: List[float] = []
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        started = time.perf_counter()
+        measure_from = started + warmup
+        stop_at = measure_from + duration
+
+        async def worker() -> None:
+            nonlocal errors
+            while True:
+                sent = time.perf_counter()
+                if sent >= stop_at:
+                    return
+                try:
+                    response = await client.request(scenario.method, scenario.path)
+                    ok = response.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                if sent >= measure_from:
+                    if ok:
+                        latencies.append(time.perf_counter() - sent)
+                    else:
+                        errors += 1
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, duration)
+
+def run_load(
+    scenarios: Sequence[str],
+    concurrency_levels: Sequence[int],
+    duration: float = 10.0,
+    warmup: float = 2.0,
+    history_size: int = 500,
+    owm_latency_ms: float = 50.0,
+    owm_jitter_ms: float = 20.0,
+    owm_error_rate: float = 0.0,
+    appwrite_latency_ms: float = 5.0,
+    seed: int = 42,
+    env_overrides: Optional[Dict[str, str]] = None,
+) -> Dict[str, Any]:
+    # Runs every scenario at every concurrency level against one backend process; results keyed "scenario@concurrency"
+    env = configure_environment(**(env_overrides or {}))
+    store = DocumentStore()
+    seed_store(store, history_size, seed)
+    owm_app = create_owm_app(owm_latency_ms, owm_jitter_ms, owm_error_rate, seed)
+    appwrite_app = create_appwrite_app(store, appwrite_latency_ms)
+    owm_server = BackgroundServer(owm_app).start()
+    appwrite_server = BackgroundServer(appwrite_app).start()
+    env = {**env, "OPENWEATHERMAP_BASE_URL": owm_server.url, "APPWRITE_ENDPOINT": f"{appwrite_server.url}/v1"}
+
+    results: Dict[str, Any] = {}
+    try:
+        with backend_process(env) as base_url:
+            for name in scenarios:
+                for concurrency in concurrency_levels:
+                    owm_calls, appwrite_calls = owm_app.state.calls, appwrite_app.state.calls
+                    result = asyncio.run(drive(base_url, SCENARIOS[name], concurrency, duration, warmup))
+                    result["concurrency"] = concurrency
+                    # Upstream calls made while serving the scenario (warm-up included): what caching saves
+                    result["upstream_calls"] = {
+                        "openweathermap": owm_app.state.calls - owm_calls,
+                        "appwrite": appwrite_app.state.calls - appwrite_calls,
+                    }
+                    results[f"{name}@{concurrency}"] = result
+    finally:
+        owm_server.stop()
+        appwrite_server.stop()
+    return results
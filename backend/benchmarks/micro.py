@@ -0,0 +1,89 @@
+import random
+import statistics
+import tempfile
+import timeit
+from typing import Any, Callable, Dict, List
+
+from . import configure_environment
+from .fakes import DocumentStore, owm_payload
+
+# --- Micro-benchmarks ---
+# Per-call cost of the CPU-bound steps behind every update and history page, timed in-process with timeit.
+# Each benchmark runs `repeat` rounds of `number` calls; the median round is the reported figure, the best
+# round shows the noise floor.
+
+HISTORY_PAGE_SIZE = 100  # Documents validated per call, the largest page Appwrite returns
+ARCHIVE_DAYS = 180  # A season of half-hourly observations in the local archive
+ARCHIVE_SCAN_DAYS = 90  # Range scanned / aggregated per call
+
+def time_call(func: Callable[[], Any], number: int, repeat: int, items: int = 1) -> Dict[str, Any]:
+    rounds = timeit.Timer(func).repeat(repeat=repeat, number=number)
+    per_call = [elapsed / number for elapsed in rounds]
+    return {
+        "per_call_us": round(statistics.median(per_call) * 1e6, 3),
+        "best_us": round(min(per_call) * 1e6, 3),
+        "per_item_us": round(statistics.median(per_call) * 1e6 / items, 3),
+        "items": items,
+        "number": number,
+        "repeat": repeat,
+    }
+
+def run_micro(number: int = 2000, repeat: int = 7, seed: int = 42) -> Dict[str, Any]:
+    configure_environment()
+    from ..config import settings
+    from ..models import WeatherHistoryRecord
+    from ..services import WeatherService
+
+    rng = random.Random(seed)
+    lat, lon = settings.DEFAULT_FARM_LATITUDE, settings.DEFAULT_FARM_LONGITUDE
+    raw = owm_payload(lat, lon, 1_700_000_000, rng)
+    service = WeatherService(None, None, None)
+
+    # One page of stored documents (with Appwrite metadata) per schema, encoded by the backend itself
+    store = DocumentStore()
+    v1_page: List[Dict[str, Any]] = []
+    v2_page: List[Dict[str, Any]] = []
+    for i in range(HISTORY_PAGE_SIZE):
+        page_raw = owm_payload(lat, lon, 1_700_000_000 + i * 1800, rng)
+        legacy = service._transform_weather_data(page_raw, lat, lon).model_dump(mode="json", exclude_none=True)
+        v1_page.append(store.create("v1", None, legacy))
+        v2_page.append(store.create("v2", None, service._build_observation(page_raw, lat, lon).to_storage()))
+    v2_service = WeatherService(None, None, None)
+    v2_service.schema_version = 2
+
+    page_number = max(1, number // HISTORY_PAGE_SIZE)
+    results = {
+        "transform_weather_data": time_call(lambda: service._transform_weather_data(raw, lat, lon), number, repeat),
+        "build_observation": time_call(lambda: service._build_observation(raw, lat, lon), number, repeat),
+        "history_model_validate_v1": time_call(
+            lambda: [WeatherHistoryRecord.model_validate(doc) for doc in v1_page], page_number, repeat, HISTORY_PAGE_SIZE
+        ),
+        "history_decode_v2": time_call(
+            lambda: [v2_service.decode_document(doc, WeatherHistoryRecord) for doc in v2_page], page_number, repeat, HISTORY_PAGE_SIZE
+        ),
+    }
+    results.update(run_archive_micro(service, page_number, repeat, rng))
+    return results
+
+def run_archive_micro(service: Any, number: int, repeat: int, rng: random.Random) -> Dict[str, Any]:
+    # Range scan and daily aggregation over the local archive (archive.py), the path that replaces paging history
+    from datetime import datetime, timedelta, timezone
+
+    from ..archive import ObservationArchive
+    from ..config import settings
+
+    lat, lon = settings.DEFAULT_FARM_LATITUDE, settings.DEFAULT_FARM_LONGITUDE
+    started = 1_700_000_000
+    observations = [
+        service._build_observation(owm_payload(lat, lon, started + i * 1800, rng), lat, lon) for i in range(ARCHIVE_DAYS * 48)
+    ]
+    start = datetime.fromtimestamp(started, tz=timezone.utc) + timedelta(days=(ARCHIVE_DAYS - ARCHIVE_SCAN_DAYS) // 2)
+    end = start + timedelta(days=ARCHIVE_SCAN_DAYS)
+    with tempfile.TemporaryDirectory() as directory:
+        archive = ObservationArchive(directory)
+        archive.append(observations)
+        rows = len(archive.scan(start=start, end=end, columns=["temperature"])["dt"])
+        return {
+            "archive_scan_90d": time_call(lambda: archive.scan(start=start, end=end, columns=["temperature", "humidity"]), number, repeat, rows),
+            "archive_aggregate_90d_day": time_call(lambda: archive.aggregate("day", start, end), number, repeat, rows),
+        }
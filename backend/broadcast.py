@@ -0,0 +1,87 @@
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+from .config import settings
+
+# --- Observation Broadcaster ---
+# Fans each newly stored WeatherResponse out to every connected stream client. The payload is serialized once
+# by the publisher and the same bytes are handed to all subscribers. Each subscriber has a bounded queue; one that
+# falls behind is disconnected rather than slowing down everyone else. A short per-channel history lets clients
+# resume after a reconnect with Last-Event-ID.
+# Event ids are the observation time in epoch milliseconds, so they stay valid across restarts and are the same on
+# every worker. A Last-Event-ID that is not in the history (older than it, from another deployment, or in the future)
+# starts a fresh subscription that begins with the current state.
+
+Event = Tuple[int, bytes]  # (event id, JSON payload)
+
+def event_id_for(observed_at: float) -> int:
+    # Event id of an observation recorded at `observed_at` (epoch seconds)
+    return int(observed_at * 1000)
+
+class Subscription:
+    def __init__(self, channel: str, queue_size: int):
+        self.channel = channel
+        self.queue: "asyncio.Queue[Optional[Event]]" = asyncio.Queue(maxsize=queue_size)
+        self.dropped = False  # Set when the subscriber was too slow and has been disconnected
+        self.resumed = False  # Set when Last-Event-ID was found and the missed events are queued
+
+    async def next_event(self, timeout: float) -> Optional[Event]:
+        # Returns the next event, or None on timeout (time for a heartbeat) or after being dropped
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+class Broadcaster:
+    def __init__(self):
+        self.queue_size = settings.STREAM_QUEUE_SIZE
+        self.history_size = settings.STREAM_HISTORY_SIZE
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._history: Dict[str, Deque[Event]] = {}
+
+    @property
+    def subscriber_count(self) -> int:
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def latest(self, channel: str) -> Optional[Event]:
+        history = self._history.get(channel)
+        return history[-1] if history else None
+
+    def publish(self, channel: str, payload: bytes, observed_at: Optional[float] = None) -> int:
+        history = self._history.setdefault(channel, deque(maxlen=self.history_size))
+        event_id = event_id_for(observed_at if observed_at is not None else time.time())
+        if history and event_id <= history[-1][0]:
+            event_id = history[-1][0] + 1  # Ids stay increasing within a channel even if observation times do not
+        event = (event_id, payload)
+        history.append(event)
+        for subscription in list(self._subscribers.get(channel, ())):
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self._drop(subscription)
+        return event_id
+
+    def _drop(self, subscription: Subscription) -> None:
+        # Slow consumer: disconnect it and make room for the end-of-stream marker
+        self.unsubscribe(subscription)
+        subscription.dropped = True
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        subscription.queue.put_nowait(None)
+
+    def subscribe(self, channel: str, last_event_id: Optional[int] = None) -> Subscription:
+        subscription = Subscription(channel, self.queue_size)
+        history = self._history.get(channel, ())
+        if last_event_id is not None and any(event[0] == last_event_id for event in history):
+            # Replay what the client missed
+            missed: List[Event] = [event for event in history if event[0] > last_event_id]
+            for event in missed[-self.queue_size:]:
+                subscription.queue.put_nowait(event)
+            subscription.resumed = True
+        self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscribers.get(subscription.channel, set()).discard(subscription)
@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
 from pathlib import Path
+from typing import Any, Dict, List
 
 # Load the .env file located in the same directory as this config.py file
 env_path = Path(__file__).resolve().parent / ".env"
@@ -13,12 +14,20 @@ class Settings(BaseSettings):
     APPWRITE_PROJECT_ID: str
     APPWRITE_DATABASE_ID: str
     APPWRITE_API_KEY: str
+    APPWRITE_CLIENT: str = "sdk"  # "sdk" (Appwrite SDK in a thread pool) or "http" (native async REST client on the pooled HTTP client)
 
     # Appwrite collection and document identifiers (must match keys in the .env file)
-    APPWRITE_COLLECTION_ID: str  # Collection for weather data
+    APPWRITE_COLLECTION_ID: str  # Collection for weather data (v1 string schema)
+    APPWRITE_OBSERVATIONS_COLLECTION_ID: str = "weather_observations"  # Collection for typed v2 observations
+    WEATHER_SCHEMA_VERSION: int = 1  # 1 = legacy string documents, 2 = typed numeric observations (see migrate_observations.py)
     APPWRITE_COLLECTION_SETTINGS_ID: str  # Collection for application settings
     APPWRITE_SETTINGS_DOCUMENT_ID: str  # Document ID for default settings
     APPWRITE_RECOMMENDATIONS_COLLECTION_ID: str = "weather_recommendations"  # Collection for recommendations
+    APPWRITE_ROLLUPS_COLLECTION_ID: str = ""  # Optional collection of hour/day/week rollups for /api/weather/aggregate (empty = disabled)
+    APPWRITE_LOCATIONS_COLLECTION_ID: str = ""  # Optional collection of additional farm locations (empty = primary farm only)
+    APPWRITE_REPORTS_COLLECTION_ID: str = ""  # Optional collection persisting daily reports (empty = kept in memory only)
+    RECOMMENDATIONS_REFRESH_MINUTES: int = 60  # How often the in-memory recommendation index is reloaded from Appwrite
+    RECOMMENDATIONS_PER_CONDITION: int = 5  # Maximum number of recommendations returned per weather condition
 
     # Default fallback values if no user-defined settings are found
     DEFAULT_FARM_LATITUDE: float = 41.1579
@@ -28,10 +37,99 @@ class Settings(BaseSettings):
     DEFAULT_EXTREME_WEATHER_ALERTS: bool = False  # Enable or disable extreme weather notifications
     DEFAULT_DAILY_REPORT: bool = False  # Enable or disable daily weather reports
 
+    # In-memory cache for the farm settings document (refilled on every update through the API)
+    SETTINGS_CACHE_TTL_SECONDS: float = 300.0  # How long cached settings are served without asking Appwrite (0 disables)
+    SETTINGS_CACHE_VERSION_CHECK: bool = False  # On expiry, compare $updatedAt and keep the cached copy if unchanged
+
     # Server and external API settings
     PORT: int = 8000
+    LOG_LEVEL: str = "INFO"  # Level of the application loggers
+    LOG_FORMAT: str = "json"  # "json" (one object per line, with request ids) or "text"
     OPENWEATHERMAP_BASE_URL: str = "https://api.openweathermap.org/data/2.5"
 
+    # Shared HTTP client settings (one pooled client lives for the whole application)
+    HTTP_MAX_CONNECTIONS: int = 20  # Upper bound on open connections in the pool
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 10  # Idle connections kept around for reuse
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0  # Seconds an idle connection stays in the pool
+    HTTP2_ENABLED: bool = False  # Negotiate HTTP/2 when available (requires the 'h2' package)
+    HTTP_TIMEOUT: float = 10.0  # Default per-request timeout in seconds (read/write/pool)
+    HTTP_CONNECT_TIMEOUT: float = 5.0  # Timeout in seconds for establishing a connection
+    OPENWEATHERMAP_MAX_RETRIES: int = 3  # Retries on 429/5xx and transport errors
+    OPENWEATHERMAP_RETRY_BACKOFF_BASE: float = 0.5  # Base delay (seconds) for exponential backoff
+    OPENWEATHERMAP_RETRY_BACKOFF_MAX: float = 8.0  # Maximum delay (seconds) between retries
+    OPENWEATHERMAP_CALLS_PER_MINUTE: int = 60  # OWM plan quota; every call (including retries) takes a token (0 = unlimited)
+    OPENWEATHERMAP_RATE_LIMIT_BURST: int = 10  # Calls allowed back-to-back before the rate limit applies
+
+    # Circuit breakers around OpenWeatherMap and Appwrite
+    BREAKER_FAILURE_THRESHOLD: int = 5  # Consecutive failures that open a breaker
+    BREAKER_RESET_TIMEOUT_SECONDS: float = 30.0  # How long an open breaker fails fast before a trial call
+    BREAKER_HALF_OPEN_MAX_CALLS: int = 1  # Trial calls let through while half-open
+    STALE_AFTER_INTERVALS: float = 1.5  # /current is marked stale (and refreshed in the background) once older than this many update intervals
+
+    # Multi-location polling
+    POLL_MAX_CONCURRENCY: int = 10  # Maximum number of locations fetched at the same time
+    POLL_SPREAD_FRACTION: float = 0.8  # Fraction of the update interval over which location polls are spread
+
+    # Geohash cell sharing: locations in the same cell share one OWM call and cached response
+    GEO_CELL_PRECISION: int = 0  # Geohash length used as the cache key (5 = ~4.9 km cells, 6 = ~1.2 x 0.6 km; 0 disables)
+    GEO_CACHE_TTL_SECONDS: float = 300.0  # How long a cell's OWM response is reused
+    GEO_NEAREST_MAX_KM: float = 0.0  # Reuse a fresh neighbouring cell's response within this distance (0 = own cell only)
+
+    # Adaptive polling: per-location intervals driven by how fast conditions change
+    ADAPTIVE_POLLING: bool = False  # Poll volatile locations more often and stable ones less often
+    ADAPTIVE_TICK_MINUTES: int = 1  # How often the scheduler checks which locations are due
+    ADAPTIVE_MIN_INTERVAL_MINUTES: int = 10  # Shortest interval used while conditions change quickly
+    ADAPTIVE_MAX_INTERVAL_MINUTES: int = 120  # Longest interval used while conditions are stable
+    ADAPTIVE_TEMPERATURE_RATE: float = 2.0  # Degrees per hour considered a fast temperature swing
+    ADAPTIVE_PRESSURE_RATE: float = 1.0  # hPa per hour considered a fast pressure change
+    ADAPTIVE_GUST_THRESHOLD: float = 10.0  # Gust speed considered significant
+    POLL_BUDGET_FRACTION: float = 0.8  # Share of OPENWEATHERMAP_CALLS_PER_MINUTE that scheduled polling may use
+
+    # Duplicate observation detection
+    DEDUPE_OBSERVATIONS: bool = False  # Skip storing observations whose OWM dt (or values) did not change; requires a `last_seen` datetime attribute
+    DEDUPE_TOLERANCES: Dict[str, float] = {}  # Optional per-field tolerances, e.g. {"temperature": 0.2, "pressure": 1}
+
+    # Push streams (/api/weather/stream and /api/weather/ws)
+    STREAM_QUEUE_SIZE: int = 16  # Events buffered per client before a slow client is disconnected
+    STREAM_HISTORY_SIZE: int = 50  # Events kept per channel for Last-Event-ID resume
+    STREAM_HEARTBEAT_SECONDS: float = 15.0  # Idle time before a heartbeat is sent
+
+    # Extreme-weather alerts (evaluated on every stored observation while the farm's extreme_weather_alerts is on)
+    ALERT_RULES: List[Dict[str, Any]] = []  # Custom rule set (AlertRule fields) replacing the built-in rules in alerts.py
+    ALERT_WEBHOOK_URL: str = ""  # POST fired/cleared alerts here as a JSON list (empty = only kept for /api/weather/alerts)
+    ALERT_BATCH_WINDOW_SECONDS: float = 0.5  # Observations arriving within this window are evaluated as one batch
+    ALERT_HISTORY_SIZE: int = 100  # Recent alert events kept in memory
+
+    # Daily reports (built incrementally while the farm's daily_report setting is on)
+    REPORTS_MAX_GAP_MINUTES: float = 120.0  # Longest gap between observations credited to condition hours and rainfall
+    REPORTS_CHECKPOINT_MINUTES: int = 15  # How often the reports of the current day are saved
+
+    # Startup and readiness
+    SNAPSHOT_PATH: str = ""  # Local file holding the last /api/weather/current response, served right after a restart (empty = disabled)
+    STARTUP_TARGET_SECONDS: float = 2.0  # Cold-start budget (import + startup); a warning is logged when it is exceeded
+
+    # Multi-worker coordination (uvicorn/gunicorn with several workers)
+    WORKER_COORDINATION: bool = False  # Only the worker holding the leader lease polls; all workers share the snapshot and settings
+    LEADER_LOCK_PATH: str = "data/leader.lock"  # Lock file of the leader lease (local filesystem shared by the workers)
+    SHARED_STATE_PATH: str = "data/shared_state.bin"  # Memory-mapped file shared by the workers (a path under /dev/shm keeps it in RAM)
+    SHARED_STATE_SLOT_BYTES: int = 262144  # Capacity of each shared record (snapshot, settings)
+    COORDINATION_INTERVAL_SECONDS: float = 1.0  # How often followers retry the lease and pick up a newer shared snapshot
+    FOLLOWER_SNAPSHOT_WAIT_SECONDS: float = 2.0  # How long a follower waits for the leader's snapshot before /current answers 503
+
+    # Local columnar archive of the observation history (archive.py)
+    ARCHIVE_PATH: str = ""  # Directory of the day-partitioned archive, appended to as observations are stored (empty = disabled)
+    ARCHIVE_OPEN_FILES: int = 1024  # Column files kept memory-mapped between queries (one file descriptor each)
+    ARCHIVE_COMPACT_MINUTES: int = 60  # Interval of folding staged live observations into the day partitions
+    ARCHIVE_BACKFILL_CONCURRENCY: int = 4  # Appwrite time slices or CSV files imported in parallel by `python -m backend.archive`
+
+    # Durable write-behind buffer for observations (SQLite in WAL mode)
+    WRITE_BUFFER_PATH: str = ""  # Path of the local buffer database (empty = write to Appwrite synchronously)
+    WRITE_BUFFER_BATCH_SIZE: int = 50  # Pending writes flushed concurrently per batch
+    WRITE_BUFFER_FLUSH_INTERVAL_SECONDS: float = 5.0  # Idle time between flush attempts
+    WRITE_BUFFER_RETRY_BACKOFF_BASE: float = 2.0  # Base delay (seconds) before retrying a failed write
+    WRITE_BUFFER_RETRY_BACKOFF_MAX: float = 300.0  # Maximum delay (seconds) between retries of a write
+    WRITE_BUFFER_MAX_ATTEMPTS: int = 50  # Failed attempts after which a write moves to the dead_writes table (0 = retry forever)
+
     class Config:
         # Ignore unknown fields in the .env or environment variables
         extra = 'ignore'
@@ -0,0 +1,197 @@
+import json
+import logging
+import mmap
+import os
+import struct
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator, Optional, Tuple
+
+from .config import settings
+from .models import FarmSettingsData
+from .services import WeatherSnapshot
+
+logger = logging.getLogger(__name__)
+
+# --- Worker Coordination ---
+# With several uvicorn/gunicorn workers every worker runs the lifespan. In coordination mode (WORKER_COORDINATION)
+# exactly one of them holds the leader lease and polls OpenWeatherMap, checkpoints reports and flushes the write
+# buffer; the others only serve requests. The lease is an exclusive flock on LEADER_LOCK_PATH: the kernel releases it
+# when the holder exits or crashes, and a follower takes over on its next attempt.
+# The current snapshot and the farm settings are shared through a memory-mapped file. Each record is guarded by a
+# sequence counter (odd while being written), so readers never lock: a request checks one 8-byte counter and only
+# decodes the record again when another worker has published a new version.
+
+class LeaderLease:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.LEADER_LOCK_PATH
+        self._fd: Optional[int] = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def try_acquire(self) -> bool:
+        # Non-blocking; returns whether this process holds the lease
+        import fcntl  # POSIX only; imported here so the module loads everywhere with coordination off
+
+        if self._fd is not None:
+            return True
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        # Record the holder for operators; the lock itself is what matters
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{os.getpid()}\n".encode())
+        self._fd = fd
+        return True
+
+    def release(self) -> None:
+        import fcntl
+
+        if self._fd is None:
+            return
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+
+@dataclass(frozen=True)
+class SharedSettings:
+    generation: int
+    settings: FarmSettingsData
+    version: Optional[str]  # $updatedAt of the settings document
+
+class SharedState:
+    MAGIC = b"FWSTATE1"
+    HEADER = struct.Struct("<8sI")  # magic, slot size
+    SLOT_HEADER = struct.Struct("<QI")  # sequence, payload length
+    SNAPSHOT_SLOT, SETTINGS_SLOT = 0, 1
+    READ_ATTEMPTS = 100  # Retries while a writer holds a record (a write takes microseconds)
+
+    def __init__(self, path: Optional[str] = None, slot_bytes: Optional[int] = None):
+        self.path = path or settings.SHARED_STATE_PATH
+        self.slot_bytes = slot_bytes or settings.SHARED_STATE_SLOT_BYTES
+        self.size = self.HEADER.size + 2 * (self.SLOT_HEADER.size + self.slot_bytes)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        with self._locked():
+            if os.fstat(self._fd).st_size < self.size:
+                os.ftruncate(self._fd, self.size)
+            self._map = mmap.mmap(self._fd, self.size)
+            if self.HEADER.unpack_from(self._map, 0) != (self.MAGIC, self.slot_bytes):
+                # New file, or one left by a run with another layout: start empty
+                self._map[:self.size] = bytes(self.size)
+                self.HEADER.pack_into(self._map, 0, self.MAGIC, self.slot_bytes)
+        # Decoded records, reused until their sequence number changes
+        self._snapshot: Tuple[int, Optional[WeatherSnapshot]] = (0, None)
+        self._settings: Tuple[int, Optional[SharedSettings]] = (0, None)
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        # Writers serialize on an exclusive flock of the state file; readers never take it
+        import fcntl
+
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _offset(self, slot: int) -> int:
+        return self.HEADER.size + slot * (self.SLOT_HEADER.size + self.slot_bytes)
+
+    def generation(self, slot: int) -> int:
+        return self.SLOT_HEADER.unpack_from(self._map, self._offset(slot))[0]
+
+    def _read(self, slot: int) -> Tuple[int, Optional[bytes]]:
+        offset = self._offset(slot)
+        for _ in range(self.READ_ATTEMPTS):
+            sequence, length = self.SLOT_HEADER.unpack_from(self._map, offset)
+            if sequence % 2:
+                continue  # Being written
+            start = offset + self.SLOT_HEADER.size
+            payload = self._map[start:start + length]
+            if self.SLOT_HEADER.unpack_from(self._map, offset)[0] == sequence:
+                return sequence, payload if sequence else None
+        return 0, None
+
+    def _write(self, slot: int, payload: bytes) -> int:
+        # Caller holds the lock; returns the new sequence number
+        if len(payload) > self.slot_bytes:
+            raise ValueError(f"Shared record of {len(payload)} bytes exceeds SHARED_STATE_SLOT_BYTES ({self.slot_bytes}).")
+        offset = self._offset(slot)
+        sequence = self.generation(slot)
+        start = offset + self.SLOT_HEADER.size
+        self.SLOT_HEADER.pack_into(self._map, offset, sequence + 1, 0)
+        self._map[start:start + len(payload)] = payload
+        self.SLOT_HEADER.pack_into(self._map, offset, sequence + 2, len(payload))
+        return sequence + 2
+
+    # --- Snapshot record ---
+    @staticmethod
+    def _encode_snapshot(snapshot: WeatherSnapshot) -> bytes:
+        meta = {"etag": snapshot.etag, "lat": snapshot.lat, "lon": snapshot.lon, "observed_at": snapshot.observed_at}
+        return json.dumps(meta).encode() + b"\n" + snapshot.body
+
+    @staticmethod
+    def _decode_snapshot(payload: bytes) -> WeatherSnapshot:
+        meta, body = payload.split(b"\n", 1)
+        return WeatherSnapshot(body=body, **json.loads(meta))
+
+    def read_snapshot(self) -> Optional[WeatherSnapshot]:
+        cached_generation, cached = self._snapshot
+        if self.generation(self.SNAPSHOT_SLOT) == cached_generation:
+            return cached
+        generation, payload = self._read(self.SNAPSHOT_SLOT)
+        if payload is not None:
+            self._snapshot = (generation, self._decode_snapshot(payload))
+        return self._snapshot[1]
+
+    def publish_snapshot(self, snapshot: WeatherSnapshot) -> bool:
+        # Newest observation wins, whichever worker fetched it
+        try:
+            with self._locked():
+                _, payload = self._read(self.SNAPSHOT_SLOT)
+                if payload is not None and self._decode_snapshot(payload).observed_at > snapshot.observed_at:
+                    return False
+                self._snapshot = (self._write(self.SNAPSHOT_SLOT, self._encode_snapshot(snapshot)), snapshot)
+            return True
+        except (OSError, ValueError) as e:
+            logger.error(f"Error sharing weather snapshot: {e}")
+            return False
+
+    # --- Settings record ---
+    def read_settings(self) -> Optional[SharedSettings]:
+        cached_generation, cached = self._settings
+        if self.generation(self.SETTINGS_SLOT) == cached_generation:
+            return cached
+        generation, payload = self._read(self.SETTINGS_SLOT)
+        if payload is not None:
+            record = json.loads(payload)
+            self._settings = (generation, SharedSettings(generation, FarmSettingsData(**record["settings"]), record["version"]))
+        return self._settings[1]
+
+    def publish_settings(self, settings_data: FarmSettingsData, version: Optional[str]) -> int:
+        # Returns the new generation (0 if not published). A document version older than the shared one is ignored,
+        # so a worker that read the settings just before another one updated them cannot roll them back.
+        try:
+            with self._locked():
+                _, payload = self._read(self.SETTINGS_SLOT)
+                current_version = json.loads(payload)["version"] if payload is not None else None
+                if version and current_version and version < current_version:
+                    return 0
+                record = json.dumps({"settings": settings_data.model_dump(), "version": version}).encode()
+                generation = self._write(self.SETTINGS_SLOT, record)
+                self._settings = (generation, SharedSettings(generation, settings_data, version))
+            return generation
+        except (OSError, ValueError) as e:
+            logger.error(f"Error sharing settings: {e}")
+            return 0
+
+    def close(self) -> None:
+        self._map.close()
+        os.close(self._fd)
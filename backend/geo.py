@@ -0,0 +1,130 @@
+import math
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import settings
+from .instrumentation import CACHE_REQUESTS
+
+# --- Geohash Cells ---
+# OWM current weather is effectively grid-resolution, so locations a few hundred metres apart get the same answer.
+# Coordinates are mapped to geohash cells; all locations in one cell share a single OWM call and cached response
+# (fetched for the cell centre, so the result does not depend on which location asked first).
+# Precision 5 is about 4.9 x 4.9 km, 6 about 1.2 x 0.6 km.
+
+GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+EARTH_RADIUS_KM = 6371.0
+
+def geohash_encode(lat: float, lon: float, precision: int) -> str:
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars: List[str] = []
+    bits, value, even = 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, lon) if even else (lat_range, lat)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+def geohash_bounds(cell: str) -> Tuple[float, float, float, float]:
+    # (lat_min, lat_max, lon_min, lon_max)
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in cell:
+        value = GEOHASH_BASE32.index(char)
+        for shift in range(4, -1, -1):
+            interval = lon_range if even else lat_range
+            middle = (interval[0] + interval[1]) / 2
+            if value >> shift & 1:
+                interval[0] = middle
+            else:
+                interval[1] = middle
+            even = not even
+    return lat_range[0], lat_range[1], lon_range[0], lon_range[1]
+
+def cell_center(cell: str) -> Tuple[float, float]:
+    lat_min, lat_max, lon_min, lon_max = geohash_bounds(cell)
+    return (lat_min + lat_max) / 2, (lon_min + lon_max) / 2
+
+def cell_neighbors(cell: str) -> List[str]:
+    # The cell itself followed by its (up to) 8 neighbours
+    lat_min, lat_max, lon_min, lon_max = geohash_bounds(cell)
+    lat, lon = (lat_min + lat_max) / 2, (lon_min + lon_max) / 2
+    height, width = lat_max - lat_min, lon_max - lon_min
+    cells = [cell]
+    for dlat in (-1, 0, 1):
+        for dlon in (-1, 0, 1):
+            neighbor_lat = lat + dlat * height
+            if (dlat or dlon) and -90 <= neighbor_lat <= 90:
+                neighbor_lon = (lon + dlon * width + 180) % 360 - 180
+                neighbor = geohash_encode(neighbor_lat, neighbor_lon, len(cell))
+                if neighbor not in cells:
+                    cells.append(neighbor)
+    return cells
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi, dlambda = phi2 - phi1, math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+@dataclass(frozen=True)
+class CellEntry:
+    cell: str
+    units: str
+    lat: float  # Coordinates the response was fetched for (the cell centre)
+    lon: float
+    data: Dict[str, Any]  # Raw OWM response
+    fetched_at: float  # Monotonic time of the fetch
+
+class CellCache:
+    # Spatial index of recent OWM responses keyed by (geohash cell, units). A location is served from its own cell,
+    # or, within GEO_NEAREST_MAX_KM, from the nearest fresh neighbouring cell before anything is fetched.
+    MAX_ENTRIES = 4096
+
+    def __init__(self, precision: Optional[int] = None, ttl: Optional[float] = None, nearest_km: Optional[float] = None):
+        self.precision = precision if precision is not None else settings.GEO_CELL_PRECISION
+        self.ttl = ttl if ttl is not None else settings.GEO_CACHE_TTL_SECONDS
+        self.nearest_km = nearest_km if nearest_km is not None else settings.GEO_NEAREST_MAX_KM
+        self._entries: Dict[Tuple[str, str], CellEntry] = {}
+
+    def cell_for(self, lat: float, lon: float) -> str:
+        return geohash_encode(lat, lon, self.precision)
+
+    def same_cell(self, lat1: float, lon1: float, lat2: float, lon2: float) -> bool:
+        return self.cell_for(lat1, lon1) == self.cell_for(lat2, lon2)
+
+    def _fresh(self, cell: str, units: str, now: float) -> Optional[CellEntry]:
+        entry = self._entries.get((cell, units))
+        return entry if entry is not None and now - entry.fetched_at < self.ttl else None
+
+    def lookup(self, lat: float, lon: float, units: str) -> Optional[CellEntry]:
+        now = time.monotonic()
+        cell = self.cell_for(lat, lon)
+        entry = self._fresh(cell, units, now)
+        if entry is None and self.nearest_km > 0:
+            candidates = [
+                candidate for candidate in (self._fresh(neighbor, units, now) for neighbor in cell_neighbors(cell)[1:])
+                if candidate is not None and haversine_km(lat, lon, candidate.lat, candidate.lon) <= self.nearest_km
+            ]
+            entry = min(candidates, key=lambda candidate: haversine_km(lat, lon, candidate.lat, candidate.lon), default=None)
+        CACHE_REQUESTS.inc("geo_cell", "miss" if entry is None else "hit")
+        return entry
+
+    def put(self, cell: str, units: str, data: Dict[str, Any]) -> CellEntry:
+        lat, lon = cell_center(cell)
+        entry = CellEntry(cell=cell, units=units, lat=lat, lon=lon, data=data, fetched_at=time.monotonic())
+        self._entries[(cell, units)] = entry
+        if len(self._entries) > self.MAX_ENTRIES:
+            now = time.monotonic()
+            self._entries = {key: value for key, value in self._entries.items() if now - value.fetched_at < self.ttl}
+        return entry
@@ -0,0 +1,313 @@
+import asyncio
+import functools
+import inspect
+import json
+import logging
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# --- Instrumentation ---
+# A small, dependency-free metrics layer exposed in Prometheus text format at /metrics, plus structured (JSON)
+# logging that carries the id of the request being served. Recording a sample is a dict lookup, a bisect and a few
+# additions under a lock, so it stays on in production.
+
+LabelValues = Tuple[str, ...]
+
+# Latency buckets in seconds: sub-millisecond cache hits up to slow upstream calls with retries
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}" for labels, value in sorted(self._values.items())]
+
+class Gauge(Metric):
+    # A gauge is either set directly or read from `function` at scrape time (returning a value, or a dict of
+    # label tuples to values for labelled gauges)
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), function: Optional[Callable[[], Any]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self.function = function
+
+    def set(self, value: float, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def samples(self) -> List[str]:
+        values = dict(self._values)
+        if self.function is not None:
+            try:
+                current = self.function()
+            except Exception as e:
+                logger.warning("Metric %s could not be collected: %s", self.name, e)
+                current = {}
+            values.update(current if isinstance(current, dict) else {(): current})
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}" for labels, value in sorted(values.items())]
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelValues, List[float]] = {}  # Per-bucket counts (non-cumulative) + [sum, count]
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0.0] * (len(self.buckets) + 3)
+            series[index] += 1  # index == len(buckets) is the +Inf bucket
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return int(series[-1]) if series else 0
+
+    def samples(self) -> List[str]:
+        lines: List[str] = []
+        for labels, series in sorted(self._series.items()):
+            cumulative = 0.0
+            for bound, bucket_count in zip((*self.buckets, float("inf")), series):
+                cumulative += bucket_count
+                bucket_labels = _format_labels(self.labelnames, labels, 'le="' + _format_value(bound) + '"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {_format_value(cumulative)}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {_format_value(series[-1])}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+REGISTRY = Registry()
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = (), function: Optional[Callable[[], Any]] = None) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames, function))
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+# --- Application Metrics ---
+HTTP_REQUEST_DURATION = histogram("farm_weather_http_request_duration_seconds", "HTTP request latency by route.", ("method", "route", "status"))
+HTTP_REQUESTS_IN_FLIGHT = gauge("farm_weather_http_requests_in_flight", "HTTP requests being served.")
+UPSTREAM_DURATION = histogram("farm_weather_upstream_duration_seconds", "Latency of calls to OpenWeatherMap and Appwrite.", ("dependency", "operation", "outcome"))
+UPSTREAM_IN_FLIGHT = gauge("farm_weather_upstream_in_flight", "Calls to a dependency currently in progress.", ("dependency",))
+THREADPOOL_WAIT = histogram("farm_weather_threadpool_wait_seconds", "Time synchronous Appwrite SDK calls wait for a thread-pool worker.")
+OPERATION_DURATION = histogram("farm_weather_operation_duration_seconds", "Latency of service operations.", ("component", "operation"))
+OPERATION_ERRORS = counter("farm_weather_operation_errors_total", "Service operations that raised an exception.", ("component", "operation"))
+OPERATIONS_IN_FLIGHT = gauge("farm_weather_operations_in_flight", "Service operations currently running.", ("component", "operation"))
+CACHE_REQUESTS = counter("farm_weather_cache_requests_total", "Cache lookups by cache and result.", ("cache", "result"))
+WRITE_BUFFER_DEAD_LETTERS = counter("farm_weather_write_buffer_dead_letters_total", "Buffered writes given up on after WRITE_BUFFER_MAX_ATTEMPTS and moved to the dead_writes table.")
+LATEST_WEATHER_REFRESHES = counter("farm_weather_latest_forced_refresh_total", "Times get_latest_weather found a stale or unreadable location and forced a refresh.", ("reason",))
+SCHEDULER_LAG = histogram("farm_weather_scheduler_lag_seconds", "Delay between a job's scheduled and actual start.", ("job",), buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0))
+
+# --- Timing Helpers ---
+@contextmanager
+def timed(metric: Histogram, *labels: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metric.observe(time.perf_counter() - start, *labels)
+
+def instrumented(component: str, operation: Optional[str] = None) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    # Decorator for sync and async callables: latency histogram, in-flight gauge and error counter
+    def decorate(func: Callable[..., Any]) -> Callable[..., Any]:
+        labels = (component, operation or func.__name__)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                OPERATIONS_IN_FLIGHT.inc(*labels)
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                except asyncio.CancelledError:
+                    raise  # Client disconnects and shutdown cancel operations; they are not failures
+                except BaseException:
+                    OPERATION_ERRORS.inc(*labels)
+                    raise
+                finally:
+                    OPERATION_DURATION.observe(time.perf_counter() - start, *labels)
+                    OPERATIONS_IN_FLIGHT.dec(*labels)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            OPERATIONS_IN_FLIGHT.inc(*labels)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except BaseException:
+                OPERATION_ERRORS.inc(*labels)
+                raise
+            finally:
+                OPERATION_DURATION.observe(time.perf_counter() - start, *labels)
+                OPERATIONS_IN_FLIGHT.dec(*labels)
+        return wrapper
+    return decorate
+
+@contextmanager
+def upstream_call(dependency: str, operation: str) -> Iterator[Dict[str, str]]:
+    # Times one call to a dependency; the caller sets result["outcome"] (defaults to "error" if it raises)
+    result = {"outcome": "ok"}
+    UPSTREAM_IN_FLIGHT.inc(dependency)
+    start = time.perf_counter()
+    try:
+        yield result
+    except asyncio.CancelledError:
+        result["outcome"] = "cancelled"
+        raise
+    except BaseException:
+        result["outcome"] = "error"
+        raise
+    finally:
+        UPSTREAM_DURATION.observe(time.perf_counter() - start, dependency, operation, result["outcome"])
+        UPSTREAM_IN_FLIGHT.dec(dependency)
+
+# --- Structured Logging ---
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+class JsonFormatter(logging.Formatter):
+    # One JSON object per line: time, level, logger, message, request id and exception (if any)
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": request_id_var.get(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+def configure_logging() -> None:
+    handler = logging.StreamHandler()
+    handler.addFilter(RequestIdFilter())
+    if settings.LOG_FORMAT == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"))
+    backend_logger = logging.getLogger("backend")
+    backend_logger.handlers[:] = [handler]
+    backend_logger.setLevel(settings.LOG_LEVEL.upper())
+    backend_logger.propagate = False
+
+# --- ASGI Middleware ---
+class RequestInstrumentationMiddleware:
+    # Pure ASGI middleware (no per-request task or body buffering): assigns the request id (incoming X-Request-ID or
+    # a new one), returns it in the response headers and records latency per route template.
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable[..., Any], send: Callable[..., Any]) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = next((value.decode("latin-1") for name, value in scope.get("headers", []) if name == b"x-request-id"), None)
+        request_id = (request_id or uuid.uuid4().hex)[:64]
+        token = request_id_var.set(request_id)
+        status = {"code": 500}
+
+        async def send_with_request_id(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - start, scope["method"], getattr(route, "path", "unmatched"), str(status["code"])
+            )
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            request_id_var.reset(token)
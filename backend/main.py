@@ -1,68 +1,284 @@
-from fastapi import FastAPI, Depends
+import time
+IMPORT_STARTED = time.perf_counter()  # Taken before the heavy imports below, so cold start includes them
+
+from fastapi import FastAPI, Depends, Request
+from fastapi.responses import JSONResponse, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.events import EVENT_JOB_SUBMITTED, JobSubmissionEvent
 from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict
+import asyncio
+import logging
+import httpx
 
 from .config import settings
-from .routers import settings_router, weather_router
-from .services import WeatherService, AppwriteService, OpenWeatherMapService, FarmSettingsService  # For scheduler
+from .routers import settings_router, weather_router, reports_router
+from .services import WeatherService, AppwriteService, OpenWeatherMapService, FarmSettingsService, FarmLocationService, RecommendationIndex, create_appwrite_service, create_http_client  # For scheduler
+from .polling import AdaptiveIntervalPolicy, LocationPoller
+from .models import FarmSettingsData
+from .rollups import RollupService
+from .archive import ObservationArchive
+from .write_buffer import ObservationBuffer
+from .broadcast import Broadcaster
+from .alerts import AlertEngine, WebhookAlertSink
+from .reports import DailyReportService
+from .coordination import LeaderLease, SharedState
+from .instrumentation import REGISTRY, SCHEDULER_LAG, RequestInstrumentationMiddleware, configure_logging, gauge
+
+configure_logging()
+logger = logging.getLogger(__name__)
 
 # --- Scheduler and Application Lifespan Management ---
 scheduler = AsyncIOScheduler()
 
-async def scheduled_update_weather():
-    # This function runs the scheduled weather update task
-    print("Scheduler: Running scheduled_update_weather...")
-    
-    # Create instances of services needed for the task
-    # This is a simplified approach; for more complex Dependency Injection (DI), consider exploring alternatives
-    appwrite_service = AppwriteService()
-    owm_service = OpenWeatherMapService()
-    
-    # FarmSettingsService needs the AppwriteService for fetching farm settings
-    # We assume the FarmSettingsService is instantiated here, but in a larger application,
-    # DI handling could be more complex.
-    farm_settings_serv = FarmSettingsService(appwrite_service=appwrite_service)
+def on_job_submitted(event: JobSubmissionEvent) -> None:
+    # Scheduler lag: how late a job started compared to its scheduled run time (a busy event loop shows up here)
+    if event.scheduled_run_times:
+        lag = (datetime.now(timezone.utc) - event.scheduled_run_times[0]).total_seconds()
+        SCHEDULER_LAG.observe(max(0.0, lag), event.job_id)
+
+scheduler.add_listener(on_job_submitted, EVENT_JOB_SUBMITTED)
 
-    # Initialize WeatherService with the required dependencies
-    weather_service = WeatherService(
+SERVICE_NAMES = (
+    "appwrite_service", "shared_state", "owm_service", "settings_service", "location_service", "write_buffer", "broadcaster",
+    "recommendation_index", "weather_service", "location_poller", "rollup_service", "archive", "alert_engine",
+    "report_service"
+)
+
+def build_services(http_client: httpx.AsyncClient, **overrides: Any) -> Dict[str, Any]:
+    # Builds the service graph once; the result is stored on app.state and shared by routers and the scheduler.
+    # Any service passed in `overrides` (e.g. a fake in tests) is used as-is and wired into the services that depend on it.
+    appwrite_service = overrides.get("appwrite_service") or create_appwrite_service(http_client)
+    owm_service = overrides.get("owm_service") or OpenWeatherMapService(http_client=http_client)
+    shared_state = overrides.get("shared_state") or (SharedState() if settings.WORKER_COORDINATION else None)
+    settings_service = overrides.get("settings_service") or FarmSettingsService(appwrite_service=appwrite_service, shared_state=shared_state)
+    location_service = overrides.get("location_service") or FarmLocationService(appwrite_service, settings_service)
+    recommendation_index = overrides.get("recommendation_index") or RecommendationIndex(appwrite_service=appwrite_service)
+    write_buffer = overrides.get("write_buffer") or ObservationBuffer(appwrite_service)
+    broadcaster = overrides.get("broadcaster") or Broadcaster()
+    weather_service = overrides.get("weather_service") or WeatherService(
         appwrite_service=appwrite_service,
         owm_service=owm_service,
-        settings_service=farm_settings_serv  # Pass the instantiated FarmSettingsService
+        settings_service=settings_service,
+        recommendation_index=recommendation_index,
+        write_buffer=write_buffer,
+        broadcaster=broadcaster,
+        shared_state=shared_state
     )
+    policy = AdaptiveIntervalPolicy() if settings.ADAPTIVE_POLLING else None
+    location_poller = overrides.get("location_poller") or LocationPoller(weather_service, location_service, policy)
+    rollup_service = overrides.get("rollup_service") or RollupService(appwrite_service)
+    archive = overrides.get("archive") or ObservationArchive()
+    alert_sinks = [WebhookAlertSink(settings.ALERT_WEBHOOK_URL, http_client)] if settings.ALERT_WEBHOOK_URL else []
+    alert_engine = overrides.get("alert_engine") or AlertEngine(settings_service, alert_sinks)
+    report_service = overrides.get("report_service") or DailyReportService(appwrite_service, settings_service)
+
+    # Observation listeners: every persisted observation is folded into the hour/day/week rollups and the daily
+    # report, appended to the local archive, checked against the alert rules, and, in adaptive mode, feeds the
+    # per-location interval policy
+    if rollup_service.enabled:
+        weather_service.add_observation_listener(rollup_service.add_observation)
+    if archive.enabled:
+        weather_service.add_observation_listener(archive.add_observation)
+    weather_service.add_observation_listener(report_service.add_observation)
+    weather_service.add_observation_listener(alert_engine.add_observation)
+    if location_poller.policy is not None:
+        weather_service.add_observation_listener(location_poller.policy.record)
+    return {
+        "appwrite_service": appwrite_service,
+        "shared_state": shared_state,
+        "owm_service": owm_service,
+        "settings_service": settings_service,
+        "location_service": location_service,
+        "write_buffer": write_buffer,
+        "broadcaster": broadcaster,
+        "recommendation_index": recommendation_index,
+        "weather_service": weather_service,
+        "location_poller": location_poller,
+        "rollup_service": rollup_service,
+        "archive": archive,
+        "alert_engine": alert_engine,
+        "report_service": report_service,
+    }
+
+async def scheduled_update_weather(spread: bool = True):
+    # This function runs the scheduled weather update task for every monitored location
+    logger.info("Scheduler: Running scheduled_update_weather...")
+
+    # Reuse the poller built at startup instead of constructing a new service graph on every tick
+    location_poller: LocationPoller = app.state.location_poller
     
     try:
-        # Perform the weather update
-        result = await weather_service.update_weather_data()
-        if result:
-            print(f"Scheduler: Weather data updated successfully at {result['weather'].timestamp}")
+        # The stored update frequency drives both the staggering and, in adaptive mode, the base interval
+        current_settings = await app.state.settings_service.get_settings()
+        if location_poller.policy is not None and spread:
+            # Adaptive mode: only the locations whose own interval has elapsed are polled on this tick
+            results = await location_poller.poll_due(current_settings.update_frequency, settings.ADAPTIVE_TICK_MINUTES)
         else:
-            print("Scheduler: Failed to update weather data.")
+            # Perform the weather update, staggering the locations across the update interval
+            results = await location_poller.poll_all(current_settings.update_frequency, spread=spread)
+        succeeded = sum(1 for ok in results.values() if ok)
+        if results and succeeded == len(results):
+            logger.info(f"Scheduler: Weather data updated successfully for {succeeded} location(s).")
+        elif results:
+            logger.info(f"Scheduler: Weather data updated for {succeeded} of {len(results)} location(s).")
     except Exception as e:
         # Log errors in case of failure
-        print(f"Scheduler: Error during scheduled weather update: {e}")
+        logger.error(f"Scheduler: Error during scheduled weather update: {e}")
+
+def schedule_weather_updates(update_frequency: int) -> None:
+    # (Re)schedules the polling job; in adaptive mode it ticks often and each location keeps its own interval
+    interval_minutes = settings.ADAPTIVE_TICK_MINUTES if settings.ADAPTIVE_POLLING else update_frequency
+    if scheduler.get_job("update_weather_job"):
+        scheduler.reschedule_job("update_weather_job", trigger='interval', minutes=interval_minutes)
+    else:
+        scheduler.add_job(scheduled_update_weather, 'interval', minutes=interval_minutes, id="update_weather_job")
+    logger.info(f"Weather updates scheduled every {interval_minutes} minutes.")
+
+async def on_settings_changed(new_settings: FarmSettingsData):
+    # Settings listener: applies a new update frequency immediately instead of on the next restart
+    schedule_weather_updates(new_settings.update_frequency)
+
+async def scheduled_refresh_recommendations():
+    # Reloads the in-memory recommendation index; requests keep using the previous index until the swap
+    await app.state.recommendation_index.refresh()
+
+async def scheduled_checkpoint_reports():
+    # Saves the daily reports of the day in progress, so a restart resumes them instead of starting over
+    await app.state.report_service.checkpoint()
+
+async def scheduled_compact_archive():
+    # Folds the live observations staged in the archive into their day partitions (closed days are also compacted
+    # by the first observation of the next day)
+    try:
+        await run_in_threadpool(app.state.archive.compact)
+    except Exception as e:
+        logger.error(f"Scheduler: Error compacting the archive: {e}")
+
+async def warm_up(leader: bool = True):
+    # Everything at startup that talks to Appwrite or OpenWeatherMap runs here, in the background,
+    # so a slow or unreachable dependency delays fresh data instead of delaying (or failing) startup.
+    # Followers (coordination mode) only prepare to serve; polling is the leader's job.
+    try:
+        if leader:
+            # Schedule regular weather updates based on the stored update frequency, and follow later changes to it
+            current_settings = await app.state.settings_service.get_settings()
+            schedule_weather_updates(current_settings.update_frequency)
+            app.state.settings_service.add_change_listener(on_settings_changed)
+
+        # Preload the recommendation index so requests never query Appwrite for recommendations
+        await app.state.recommendation_index.refresh()
+
+        # Serve the last persisted (or shared) observation until the first live fetch completes
+        if app.state.weather_service.adopt_shared_snapshot() or await app.state.weather_service.warm_cache():
+            logger.info("Serving the last known weather until the first update completes.")
+
+        if leader:
+            # Fetch initial weather data
+            logger.info("Fetching initial weather data...")
+            await scheduled_update_weather(spread=False)  # Direct call to update weather initially, without staggering
+    except Exception as e:
+        logger.warning(f"Startup warm-up failed: {e}")
+        if leader and not scheduler.get_job("update_weather_job"):
+            schedule_weather_updates(settings.DEFAULT_UPDATE_FREQUENCY)
+    finally:
+        logger.info("Startup warm-up finished.")
+
+def start_leader_duties() -> None:
+    # Polling and the work derived from it (write buffer, report checkpoints); with coordination on, only the
+    # worker holding the leader lease runs these
+    app.state.weather_service.follower = False
+    # Start flushing buffered observations (replays anything left by a previous run)
+    app.state.write_buffer.start()
+    scheduler.add_job(
+        scheduled_checkpoint_reports, 'interval',
+        minutes=settings.REPORTS_CHECKPOINT_MINUTES, id="checkpoint_reports_job", replace_existing=True
+    )
+    if app.state.archive.enabled:
+        scheduler.add_job(
+            scheduled_compact_archive, 'interval',
+            minutes=settings.ARCHIVE_COMPACT_MINUTES, id="compact_archive_job", replace_existing=True
+        )
+    app.state.warm_up_task = asyncio.create_task(warm_up())
+
+async def coordinate(lease: LeaderLease):
+    # Coordination mode, in every worker: followers retry the lease (taking over when the leader exits) and pick up
+    # newer shared snapshots for their stream clients; the leader picks up settings changed through other workers.
+    while True:
+        try:
+            if lease.held:
+                await app.state.settings_service.get_settings()
+            elif lease.try_acquire():
+                logger.info(f"Acquired the leader lease ({settings.LEADER_LOCK_PATH}); this worker now polls.")
+                start_leader_duties()
+            else:
+                app.state.weather_service.adopt_shared_snapshot()
+        except Exception as e:
+            logger.error(f"Coordination: {e}")
+        await asyncio.sleep(settings.COORDINATION_INTERVAL_SECONDS)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Application startup procedure
-    print("Application startup...")
-    
-    # Fetch initial weather data
-    print("Fetching initial weather data...")
-    await scheduled_update_weather()  # Direct call to update weather initially
-
-    # Schedule regular weather updates based on the configured interval
-    # The update frequency is fetched from settings or defaults to the value in the config
-    update_interval_minutes = settings.DEFAULT_UPDATE_FREQUENCY
-    scheduler.add_job(scheduled_update_weather, 'interval', minutes=update_interval_minutes, id="update_weather_job")
+    # Application startup procedure. Only local work happens before serving starts; see warm_up().
+    logger.info("Application startup...")
+
+    # Create the pooled HTTP client shared by all outbound requests (closed on shutdown)
+    app.state.http_client = create_http_client()
+
+    # Build the service graph once. Services already present on app.state (e.g. fakes set by tests) are kept.
+    overrides = {name: getattr(app.state, name, None) for name in SERVICE_NAMES}
+    for name, service in build_services(app.state.http_client, **overrides).items():
+        setattr(app.state, name, service)
+
+    # Serve the snapshot written by the previous process, if any, from the first request on
+    if app.state.weather_service.restore_snapshot():
+        logger.info(f"Restored weather snapshot from {settings.SNAPSHOT_PATH}.")
+
+    scheduler.add_job(
+        scheduled_refresh_recommendations, 'interval',
+        minutes=settings.RECOMMENDATIONS_REFRESH_MINUTES, id="refresh_recommendations_job"
+    )
     scheduler.start()
-    print(f"Weather updates scheduled every {update_interval_minutes} minutes.")
+
+    # Several workers: only the one holding the leader lease polls; the others serve what it shares
+    app.state.leader_lease = LeaderLease() if settings.WORKER_COORDINATION else None
+    app.state.coordination_task = None
+    if app.state.leader_lease is None or app.state.leader_lease.try_acquire():
+        start_leader_duties()
+    else:
+        logger.info("Another worker holds the leader lease; serving shared weather data.")
+        app.state.weather_service.follower = True
+        app.state.warm_up_task = asyncio.create_task(warm_up(leader=False))
+    if app.state.leader_lease is not None:
+        app.state.coordination_task = asyncio.create_task(coordinate(app.state.leader_lease))
+
+    # Cold start: module import plus the startup above
+    app.state.startup_seconds = time.perf_counter() - IMPORT_STARTED
+    if app.state.startup_seconds > settings.STARTUP_TARGET_SECONDS:
+        logger.warning(f"Startup took {app.state.startup_seconds:.2f}s (target {settings.STARTUP_TARGET_SECONDS:.2f}s).")
+    else:
+        logger.info(f"Startup completed in {app.state.startup_seconds:.2f}s.")
     
     yield  # Application runtime
     
     # Application shutdown procedure
-    print("Application shutdown...")
+    logger.info("Application shutdown...")
+    app.state.warm_up_task.cancel()
+    if app.state.coordination_task is not None:
+        app.state.coordination_task.cancel()
     scheduler.shutdown()
+    await app.state.report_service.checkpoint()
+    if app.state.archive.enabled:
+        await scheduled_compact_archive()  # Staged rows would otherwise wait for the next start's first compaction
+    await app.state.write_buffer.stop()
+    await app.state.http_client.aclose()
+    if app.state.leader_lease is not None:
+        app.state.leader_lease.release()  # Lets a follower take over right away
+    if app.state.shared_state is not None:
+        app.state.shared_state.close()
 
 # --- FastAPI App Initialization ---
 app = FastAPI(
@@ -81,14 +297,69 @@ app.add_middleware(
     allow_headers=["*"],  # Allow all headers
 )
 
+# Request ids, structured request logging context and per-route latency (outermost, so it times everything)
+app.add_middleware(RequestInstrumentationMiddleware)
+
 # Include routers for settings and weather endpoints
 app.include_router(settings_router)
 app.include_router(weather_router)
+app.include_router(reports_router)
+
+# --- Metrics ---
+# Gauges read from the running services at scrape time
+BREAKER_STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+def _breaker_states() -> Dict[Any, float]:
+    weather_service = getattr(app.state, "weather_service", None)
+    if weather_service is None:
+        return {}
+    return {(name,): BREAKER_STATE_VALUES[breaker.state] for name, breaker in weather_service.breakers.items()}
+
+def _write_buffer_pending() -> Any:
+    write_buffer = getattr(app.state, "write_buffer", None)
+    return write_buffer.depth()["pending"] if write_buffer is not None and write_buffer.enabled else {}
+
+def _stream_subscribers() -> Any:
+    broadcaster = getattr(app.state, "broadcaster", None)
+    return broadcaster.subscriber_count if broadcaster is not None else {}
+
+gauge("farm_weather_circuit_state", "Circuit breaker state per dependency (0 closed, 1 half-open, 2 open).", ("dependency",), function=_breaker_states)
+gauge("farm_weather_write_buffer_pending", "Observations waiting in the local write buffer.", function=_write_buffer_pending)
+gauge("farm_weather_stream_subscribers", "Connected SSE/WebSocket clients.", function=_stream_subscribers)
+
+# Prometheus text exposition format
+@app.get("/metrics", tags=["Health"], include_in_schema=False)
+async def metrics():
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 # Root endpoint for basic app information
 @app.get("/", tags=["Root"])
 async def read_root():
     return {"message": "Welcome to the Farm Weather API!"}
 
+# Liveness: the process is up and the event loop responds (never touches dependencies)
+@app.get("/health/live", tags=["Health"])
+async def liveness():
+    return {"status": "alive"}
+
+# Readiness: current weather can be served from memory (a restored, persisted or freshly fetched snapshot)
+@app.get("/health/ready", tags=["Health"])
+async def readiness(request: Request):
+    state = request.app.state
+    warm_up_task = getattr(state, "warm_up_task", None)
+    ready = getattr(state, "weather_service", None) is not None and (
+        state.weather_service.adopt_shared_snapshot() or state.weather_service.snapshot is not None
+    )
+    body = {
+        "status": "ready" if ready else "starting",
+        "warm_up": "done" if warm_up_task is not None and warm_up_task.done() else "running",
+        "startup_seconds": round(getattr(state, "startup_seconds", 0.0), 3),
+        "role": "single" if getattr(state, "leader_lease", None) is None else "leader" if state.leader_lease.held else "follower",
+        # Open circuits do not make the app unready: the last known weather keeps being served
+        "dependencies": {name: breaker.state for name, breaker in state.weather_service.breakers.items()}
+        if getattr(state, "weather_service", None) is not None else {},
+    }
+    return JSONResponse(body, status_code=200 if ready else 503)
+
 # To run the app: uvicorn backend.main:app --reload --port 8000
 # (Assuming your files are in a directory named 'backend')
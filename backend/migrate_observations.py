@@ -0,0 +1,81 @@
+import argparse
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+
+from appwrite.query import Query as AppwriteQuery
+
+from .config import settings
+from .models import WeatherObservation
+from .services import call_appwrite, create_appwrite_service, create_http_client
+
+# --- v1 -> v2 Observation Migration ---
+# Rewrites the legacy weather documents (string fields, JSON-encoded location/sun) from APPWRITE_COLLECTION_ID
+# into typed documents in APPWRITE_OBSERVATIONS_COLLECTION_ID, keeping the original document ids.
+#
+# The v2 collection must exist with these attributes (create them in the Appwrite console first):
+#   float:   temperature, feels_like, humidity, pressure, wind_speed, wind_gust, wind_direction, visibility, lat, lon
+#   string:  description, icon, location_name, location_id
+#   integer: dt, sunrise, sunset
+#   datetime: timestamp, last_seen
+# plus a key index on `dt` (ordering and range queries) and one on `location_id`.
+#
+# Usage: python -m backend.migrate_observations [--batch-size 100] [--concurrency 8] [--after <document id>] [--dry-run]
+# The last migrated id is printed after every batch; pass it to --after to resume an interrupted run.
+# Once finished, set WEATHER_SCHEMA_VERSION=2.
+
+async def _migrate_document(appwrite_service: Any, doc: Dict[str, Any], dry_run: bool, semaphore: asyncio.Semaphore) -> bool:
+    try:
+        observation = WeatherObservation.from_legacy_document(doc)
+    except (ValueError, TypeError) as e:
+        print(f"Skipping document {doc.get('$id')}: {e}")
+        return False
+    if dry_run:
+        return True
+    async with semaphore:
+        created = await call_appwrite(
+            appwrite_service.create_document,
+            settings.APPWRITE_OBSERVATIONS_COLLECTION_ID,
+            doc['$id'],
+            observation.to_storage()
+        )
+    return bool(created)
+
+async def migrate(batch_size: int = 100, concurrency: int = 8, after: Optional[str] = None, dry_run: bool = False) -> Tuple[int, int]:
+    # Returns (migrated, failed) counts.
+    migrated = failed = 0
+    async with create_http_client() as http_client:
+        appwrite_service = create_appwrite_service(http_client)
+        semaphore = asyncio.Semaphore(concurrency)
+        cursor = after
+        while True:
+            queries: List[str] = [AppwriteQuery.order_asc("$createdAt"), AppwriteQuery.limit(batch_size)]
+            if cursor:
+                queries.append(AppwriteQuery.cursor_after(cursor))
+            page = await call_appwrite(appwrite_service.list_documents, settings.APPWRITE_COLLECTION_ID, queries)
+            documents = page.get('documents', []) if page else []
+            if not documents:
+                break
+
+            results = await asyncio.gather(*(_migrate_document(appwrite_service, doc, dry_run, semaphore) for doc in documents))
+            migrated += sum(results)
+            failed += len(results) - sum(results)
+            cursor = documents[-1]['$id']
+            print(f"Migrated {migrated} document(s), {failed} failed; last id: {cursor}")
+
+            if len(documents) < batch_size:
+                break
+    return migrated, failed
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Migrate v1 weather documents to the typed v2 observation schema.")
+    parser.add_argument("--batch-size", type=int, default=100, help="Documents read per page (max 100 in Appwrite)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent document writes")
+    parser.add_argument("--after", default=None, help="Resume after this legacy document id")
+    parser.add_argument("--dry-run", action="store_true", help="Parse and validate only, write nothing")
+    args = parser.parse_args()
+
+    migrated, failed = asyncio.run(migrate(args.batch_size, args.concurrency, args.after, args.dry_run))
+    print(f"Done: {migrated} migrated, {failed} failed.")
+
+if __name__ == "__main__":
+    main()
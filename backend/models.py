@@ -1,6 +1,7 @@
 from pydantic import BaseModel, Field, validator, HttpUrl
-from typing import Optional, List, Dict, Any
-from datetime import datetime
+from typing import Optional, List, Dict, Any, Literal
+from datetime import date, datetime, timezone
+import json
 
 from .config import settings  # Import the settings object for default configuration values
 
@@ -36,6 +37,32 @@ class FarmSettingsResponse(FarmSettingsData):
         populate_by_name = True  # Allow automatic population of fields using names like "$id"
         from_attributes = True  # Enable ORM mode for converting Appwrite dicts to Pydantic models
 
+# --- Location Models ---
+class FarmLocation(BaseModel):
+    # A monitored field/location; the primary farm location from settings uses the id PRIMARY_LOCATION_ID
+    id: str = Field(alias="$id")  # Appwrite document ID (used to tag stored observations)
+    name: str = "Unknown"  # Display name of the location
+    latitude: float  # Latitude of the location
+    longitude: float  # Longitude of the location
+    description: Optional[str] = None  # Optional free-text description
+
+    @validator('latitude')
+    def latitude_must_be_valid(cls, v):
+        if not -90 <= v <= 90:
+            raise ValueError('Latitude must be between -90 and 90')
+        return v
+
+    @validator('longitude')
+    def longitude_must_be_valid(cls, v):
+        if not -180 <= v <= 180:
+            raise ValueError('Longitude must be between -180 and 180')
+        return v
+
+    class Config:
+        populate_by_name = True  # Allow both "id" and "$id"
+
+PRIMARY_LOCATION_ID = "default"  # Location id of the farm location stored in the settings document
+
 # --- Weather Models ---
 class WeatherLocation(BaseModel):
     # Model for storing location information (latitude, longitude, and name)
@@ -62,7 +89,9 @@ class WeatherData(BaseModel):
     visibility: str  # Visibility in the area (e.g., in meters)
     location: str  # Location name as a string (could be a WeatherLocation object)
     sun: str  # Sun data (could be a SunData object)
+    location_id: Optional[str] = None  # Id of the FarmLocation this observation belongs to (None for the primary farm)
     timestamp: Optional[datetime] = None  # Timestamp of when the data was recorded (Appwrite will handle $createdAt and $updatedAt)
+    last_seen: Optional[datetime] = None  # Last time OWM returned this same observation (set when duplicates are skipped)
 
     # Optional fields for Appwrite-specific document mapping
     id: Optional[str] = Field(alias="$id", default=None)  # Appwrite document ID
@@ -76,6 +105,126 @@ class WeatherData(BaseModel):
         populate_by_name = True  # Enable automatic population of fields by name (e.g., $createdAt)
         from_attributes = True  # Enable ORM mode for converting Appwrite data to Pydantic models
 
+def format_legacy_number(value: Optional[float]) -> Optional[str]:
+    # Renders numbers the way the v1 string schema stored them ("50", "20.5")
+    if value is None:
+        return None
+    return str(int(value)) if float(value).is_integer() else str(value)
+
+class WeatherObservation(BaseModel):
+    # v2 storage schema: typed numeric fields, flat location attributes and the OWM observation time.
+    # Converted to the v1 WeatherData shape by to_legacy_fields() so API responses keep their format.
+    temperature: float  # Temperature at the location
+    feels_like: float  # Temperature as perceived by humans
+    humidity: float  # Humidity level as a percentage
+    pressure: float  # Atmospheric pressure (hPa)
+    wind_speed: float  # Wind speed
+    wind_gust: Optional[float] = None  # Gust speed, if available
+    wind_direction: Optional[float] = None  # Wind direction in degrees, if available
+    visibility: Optional[float] = None  # Visibility in meters
+    description: str  # Weather description (e.g., "Clear sky")
+    icon: str  # OWM icon code
+    lat: float  # Latitude the observation was fetched for
+    lon: float  # Longitude the observation was fetched for
+    location_name: str = "Unknown"  # Name of the location reported by OWM
+    location_id: Optional[str] = None  # Id of the FarmLocation (None for the primary farm)
+    dt: int  # OWM observation time (epoch seconds), indexed for ordering and range queries
+    sunrise: Optional[int] = None  # Sunrise (epoch seconds)
+    sunset: Optional[int] = None  # Sunset (epoch seconds)
+    timestamp: Optional[datetime] = None  # When the observation was fetched
+    last_seen: Optional[datetime] = None  # Last time OWM returned this same observation
+    rain_1h: Optional[float] = None  # Rain over the last hour (mm) when OWM reports it; not stored, used by daily reports
+
+    # Optional fields for Appwrite-specific document mapping
+    id: Optional[str] = Field(alias="$id", default=None)
+    collection_id: Optional[str] = Field(alias="$collectionId", default=None)
+    database_id: Optional[str] = Field(alias="$databaseId", default=None)
+    created_at: Optional[datetime] = Field(alias="$createdAt", default=None)
+    updated_at: Optional[datetime] = Field(alias="$updatedAt", default=None)
+    permissions: Optional[List[str]] = Field(alias="$permissions", default=None)
+
+    class Config:
+        populate_by_name = True
+        from_attributes = True
+
+    def to_storage(self) -> Dict[str, Any]:
+        # Attributes written to Appwrite (no system fields)
+        return self.model_dump(
+            mode='json', exclude_none=True,
+            exclude={'id', 'collection_id', 'database_id', 'created_at', 'updated_at', 'permissions', 'rain_1h'}
+        )
+
+    def to_legacy_fields(self) -> Dict[str, Any]:
+        # Compatibility layer: the v1 WeatherData shape (strings, JSON-encoded location and sun)
+        location = WeatherLocation(lat=str(self.lat), lon=str(self.lon), name=self.location_name)
+        sun = SunData(
+            sunrise=str(self.sunrise) if self.sunrise is not None else '',
+            sunset=str(self.sunset) if self.sunset is not None else ''
+        )
+        return {
+            'temperature': format_legacy_number(self.temperature),
+            'humidity': format_legacy_number(self.humidity),
+            'wind_speed': format_legacy_number(self.wind_speed),
+            'description': self.description,
+            'icon': self.icon,
+            'feels_like': format_legacy_number(self.feels_like),
+            'wind_gust': format_legacy_number(self.wind_gust),
+            'wind_direction': format_legacy_number(self.wind_direction),
+            'pressure': format_legacy_number(self.pressure),
+            'visibility': format_legacy_number(self.visibility) or '0',
+            'location': location.model_dump_json(),
+            'sun': sun.model_dump_json(),
+            'location_id': self.location_id,
+            'timestamp': self.timestamp,
+            'last_seen': self.last_seen,
+            '$id': self.id,
+            '$collectionId': self.collection_id,
+            '$databaseId': self.database_id,
+            '$createdAt': self.created_at,
+            '$updatedAt': self.updated_at,
+            '$permissions': self.permissions,
+        }
+
+    @classmethod
+    def from_legacy_document(cls, doc: Dict[str, Any]) -> "WeatherObservation":
+        # Parses a v1 document (string fields, JSON location/sun); used by the schema migration.
+        location = json.loads(doc.get('location') or '{}')
+        sun = json.loads(doc.get('sun') or '{}')
+        recorded = doc.get('timestamp') or doc.get('$createdAt')
+        recorded_at = datetime.fromisoformat(recorded.replace('Z', '+00:00')) if isinstance(recorded, str) else recorded
+        if recorded_at is not None and recorded_at.tzinfo is None:
+            recorded_at = recorded_at.replace(tzinfo=timezone.utc)
+
+        def number(key: str) -> Optional[float]:
+            value = doc.get(key)
+            return float(value) if value not in (None, '') else None
+
+        def epoch(value: Any) -> Optional[int]:
+            return int(value) if value not in (None, '') else None
+
+        return cls(
+            temperature=number('temperature') or 0.0,
+            feels_like=number('feels_like') or 0.0,
+            humidity=number('humidity') or 0.0,
+            pressure=number('pressure') or 0.0,
+            wind_speed=number('wind_speed') or 0.0,
+            wind_gust=number('wind_gust'),
+            wind_direction=number('wind_direction'),
+            visibility=number('visibility'),
+            description=doc.get('description', ''),
+            icon=doc.get('icon', ''),
+            lat=float(location.get('lat', 0.0)),
+            lon=float(location.get('lon', 0.0)),
+            location_name=location.get('name', 'Unknown'),
+            location_id=doc.get('location_id'),
+            # v1 documents did not keep the OWM observation time; the recording time is the closest value
+            dt=int(recorded_at.timestamp()) if recorded_at else 0,
+            sunrise=epoch(sun.get('sunrise')),
+            sunset=epoch(sun.get('sunset')),
+            timestamp=recorded_at,
+            last_seen=doc.get('last_seen')
+        )
+
 class WeatherResponse(BaseModel):
     # Response model containing weather data and recommendations
     weather: WeatherData  # Weather data
@@ -89,3 +238,81 @@ class WeatherHistoryResponse(BaseModel):
     # Response model for a collection of weather history records
     total: int  # Total number of records
     documents: List[WeatherHistoryRecord]  # List of weather history records
+    next_cursor: Optional[str] = None  # Opaque cursor for the next page (None on the last page)
+
+# --- Aggregation Models ---
+class MetricSummary(BaseModel):
+    # Summary of one metric over a time bucket
+    min: Optional[float] = None
+    max: Optional[float] = None
+    mean: Optional[float] = None
+    last: Optional[float] = None  # Value of the most recent observation in the bucket
+
+class AggregateBucket(BaseModel):
+    start: datetime  # Start of the bucket (UTC)
+    count: int  # Number of observations in the bucket
+    metrics: Dict[str, MetricSummary]  # Summary per metric (temperature, humidity, ...)
+
+class AggregateResponse(BaseModel):
+    bucket: str  # Bucket size: hour, day or week
+    location_id: str  # Location the rollups belong to
+    buckets: List[AggregateBucket]  # Buckets in chronological order
+
+class ArchiveScanResponse(BaseModel):
+    location_id: str  # Location the rows belong to
+    rows: int  # Number of rows returned
+    columns: Dict[str, List[Optional[float]]]  # Column name -> values in dt order ("dt" holds epoch seconds; null = missing)
+
+# --- Alert Models ---
+class AlertRule(BaseModel):
+    # One extreme-weather rule. A threshold rule compares the observed value, a rate rule compares its change over
+    # the window. The rule fires when the value is on the `direction` side of `threshold` for `debounce` observations
+    # in a row, and clears only once it is back by more than `clear_margin` (hysteresis).
+    name: str  # Unique rule name, e.g. "frost"
+    metric: str  # Observation field: temperature, feels_like, humidity, pressure, wind_speed, wind_gust or visibility
+    kind: Literal["threshold", "rate"] = "threshold"
+    direction: Literal["above", "below"] = "above"
+    threshold: float  # Value (threshold rules) or change over the window (rate rules), in the farm's units
+    window_minutes: int = Field(default=60, gt=0)  # Rate rules: the change is measured over this window
+    clear_margin: float = Field(default=0.0, ge=0)  # How far back past the threshold the value must go to clear
+    debounce: int = Field(default=1, ge=1)  # Consecutive matching observations needed to fire
+    severity: Literal["info", "warning", "critical"] = "warning"
+    message: str = ""  # Human-readable text sent with the alert
+
+class WeatherAlert(BaseModel):
+    rule: str  # Name of the rule
+    state: Literal["fired", "cleared"]
+    location_id: str  # Location the observation belongs to
+    metric: str
+    value: float  # Observed value (threshold rules) or change over the window (rate rules)
+    threshold: float
+    severity: str
+    message: str
+    observed_at: datetime  # OWM observation time (UTC)
+
+class AlertsResponse(BaseModel):
+    active: List[WeatherAlert]  # Alerts that fired and have not cleared yet
+    recent: List[WeatherAlert]  # Most recent fired/cleared events, newest first
+
+# --- Report Models ---
+class DailyReport(BaseModel):
+    # Summary of one UTC day at one location, built incrementally from the observations as they were stored
+    location_id: str
+    date: date
+    observations: int  # Number of observations included
+    temperature_min: Optional[float] = None
+    temperature_max: Optional[float] = None
+    temperature_mean: Optional[float] = None
+    temperature_stddev: Optional[float] = None
+    humidity_min: Optional[float] = None
+    humidity_max: Optional[float] = None
+    peak_gust: Optional[float] = None  # Highest gust (or wind speed when no gust was reported)
+    condition_hours: Dict[str, float]  # Hours spent in each condition category (cold, hot, dry, humid, windy, normal)
+    rainfall_mm: Optional[float] = None  # Estimated rainfall; None when OWM reported no rain data that day
+    first_observation: Optional[datetime] = None
+    last_observation: Optional[datetime] = None
+    complete: bool  # False while the day is still being recorded
+
+class DailyReportsResponse(BaseModel):
+    date: date
+    reports: List[DailyReport]
@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from .config import settings
+from .models import PRIMARY_LOCATION_ID, FarmLocation, WeatherObservation
+from .services import FarmLocationService, WeatherService
+
+logger = logging.getLogger(__name__)
+
+# --- Adaptive Intervals ---
+class AdaptiveIntervalPolicy:
+    # Chooses a polling interval per location from its recent observations: the minimum interval while temperature
+    # or pressure swing quickly (or gusts are strong), the maximum while conditions are stable, the configured update
+    # frequency otherwise. All intervals are stretched together when their total call rate would exceed the budget.
+    HISTORY_SIZE = 6
+
+    def __init__(self):
+        self.min_interval = settings.ADAPTIVE_MIN_INTERVAL_MINUTES
+        self.max_interval = settings.ADAPTIVE_MAX_INTERVAL_MINUTES
+        self.temperature_rate = settings.ADAPTIVE_TEMPERATURE_RATE
+        self.pressure_rate = settings.ADAPTIVE_PRESSURE_RATE
+        self.gust_threshold = settings.ADAPTIVE_GUST_THRESHOLD
+        self.calls_per_minute_budget = settings.OPENWEATHERMAP_CALLS_PER_MINUTE * settings.POLL_BUDGET_FRACTION
+        self._history: Dict[str, Deque[WeatherObservation]] = {}
+
+    async def record(self, observation: WeatherObservation) -> None:
+        # Observation listener: keeps the last few observations per location
+        location_id = observation.location_id or PRIMARY_LOCATION_ID
+        self._history.setdefault(location_id, deque(maxlen=self.HISTORY_SIZE)).append(observation)
+
+    def volatility(self, location_id: str) -> Optional[float]:
+        # >= 1 means fast change; None until two observations are known
+        history = self._history.get(location_id)
+        if not history or len(history) < 2:
+            return None
+        first, last = history[0], history[-1]
+        hours = max((last.dt - first.dt) / 3600, 1 / 60)
+        scores = [
+            abs(last.temperature - first.temperature) / hours / self.temperature_rate,
+            abs(last.pressure - first.pressure) / hours / self.pressure_rate,
+        ]
+        if last.wind_gust is not None:
+            scores.append(last.wind_gust / self.gust_threshold)
+        return max(scores)
+
+    def interval_for(self, location_id: str, base_minutes: float) -> float:
+        score = self.volatility(location_id)
+        if score is None:
+            interval = base_minutes
+        elif score >= 1:
+            interval = self.min_interval
+        elif score < 0.25:
+            interval = self.max_interval
+        else:
+            interval = base_minutes
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def intervals(self, locations: List[FarmLocation], base_minutes: float) -> Dict[str, float]:
+        intervals = {location.id: self.interval_for(location.id, base_minutes) for location in locations}
+        calls_per_minute = sum(1 / interval for interval in intervals.values())
+        if self.calls_per_minute_budget > 0 and calls_per_minute > self.calls_per_minute_budget:
+            stretch = calls_per_minute / self.calls_per_minute_budget
+            intervals = {location_id: interval * stretch for location_id, interval in intervals.items()}
+        return intervals
+
+# --- Multi-Location Polling ---
+class LocationPoller:
+    # Fans weather refreshes out across every monitored location.
+    # Concurrency is bounded by a semaphore, the OWM quota is enforced by the OpenWeatherMapService token bucket,
+    # and polls are staggered across the update interval instead of all firing at the start of it.
+    def __init__(self, weather_service: WeatherService, location_service: FarmLocationService, policy: Optional[AdaptiveIntervalPolicy] = None):
+        self.weather_service = weather_service
+        self.location_service = location_service
+        self.max_concurrency = settings.POLL_MAX_CONCURRENCY
+        self.spread_fraction = settings.POLL_SPREAD_FRACTION
+        self.policy = policy  # Set when ADAPTIVE_POLLING is enabled
+        self._next_due: Dict[str, float] = {}  # Monotonic time each location is next due (adaptive mode)
+
+    async def _poll_location(self, location: FarmLocation, delay: float, semaphore: asyncio.Semaphore) -> bool:
+        if delay > 0:
+            await asyncio.sleep(delay)
+        async with semaphore:
+            try:
+                result = await self.weather_service.update_weather_data(location)
+            except Exception as e:
+                logger.error(f"Poller: Error updating weather for location {location.id}: {e}")
+                return False
+        if not result:
+            logger.warning(f"Poller: Failed to update weather for location {location.id}.")
+        return bool(result)
+
+    async def poll_all(self, interval_minutes: float, locations: Optional[List[FarmLocation]] = None, spread: bool = True) -> Dict[str, bool]:
+        # Returns a success flag per location id.
+        if locations is None:
+            locations = await self.location_service.list_locations()
+        if not locations:
+            return {}
+
+        step = 0.0
+        if spread and len(locations) > 1:
+            step = interval_minutes * 60 * self.spread_fraction / len(locations)
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        results = await asyncio.gather(*(
+            self._poll_location(location, index * step, semaphore)
+            for index, location in enumerate(locations)
+        ))
+        return {location.id: ok for location, ok in zip(locations, results)}
+
+    async def poll_due(self, base_minutes: float, tick_minutes: float) -> Dict[str, bool]:
+        # Adaptive mode: polls only the locations whose own interval has elapsed, spread across one tick.
+        locations = await self.location_service.list_locations()
+        intervals = self.policy.intervals(locations, base_minutes) if self.policy else {location.id: base_minutes for location in locations}
+        now = time.monotonic()
+        due = [location for location in locations if self._next_due.get(location.id, 0.0) <= now]
+        for location in due:
+            self._next_due[location.id] = now + intervals[location.id] * 60
+        return await self.poll_all(tick_minutes, locations=due)
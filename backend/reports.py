@@ -0,0 +1,299 @@
+import asyncio
+import hashlib
+import json
+import logging
+import math
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from appwrite.query import Query as AppwriteQuery
+
+from .config import settings
+from .models import PRIMARY_LOCATION_ID, DailyReport, WeatherObservation
+from .services import CONDITIONS, FarmSettingsService, call_appwrite, condition_value
+
+logger = logging.getLogger(__name__)
+
+# --- Daily Reports ---
+# One report per (location, UTC day), built from running statistics updated as each observation is stored
+# (Welford's algorithm for the temperature mean/variance, running extremes, time-weighted condition hours and
+# rainfall). Nothing re-reads history: the open day is checkpointed periodically and saved one last time when
+# the first observation of the next day arrives, so closing the day costs one write per location. Days that no
+# observation closes (a restart across midnight, a location that stopped polling, reports switched off) are closed
+# by the checkpoint job once they are over. Each observation's condition is credited until the next observation
+# (at most REPORTS_MAX_GAP_MINUTES); a gap across midnight is split between the two days.
+
+def report_document_id(location_id: str, day: date) -> str:
+    # Deterministic id so a report can be updated without a lookup query (Appwrite ids are limited to 36 chars)
+    doc_id = f"report_{location_id}_{day:%Y%m%d}"
+    if len(doc_id) > 36:
+        doc_id = f"report_{hashlib.sha1(location_id.encode()).hexdigest()[:12]}_{day:%Y%m%d}"
+    return doc_id
+
+def _observation_day(observation: WeatherObservation) -> date:
+    return datetime.fromtimestamp(observation.dt, tz=timezone.utc).date()
+
+def _min(current: Optional[float], value: Optional[float]) -> Optional[float]:
+    return current if value is None else value if current is None else min(current, value)
+
+def _max(current: Optional[float], value: Optional[float]) -> Optional[float]:
+    return current if value is None else value if current is None else max(current, value)
+
+@dataclass
+class DailyAccumulator:
+    # Running statistics for one location and day; also the shape of the persisted report document
+    location_id: str
+    day: date
+    count: int = 0
+    temperature_mean: float = 0.0
+    temperature_m2: float = 0.0  # Sum of squared differences from the mean (Welford)
+    temperature_min: Optional[float] = None
+    temperature_max: Optional[float] = None
+    humidity_min: Optional[float] = None
+    humidity_max: Optional[float] = None
+    peak_gust: Optional[float] = None
+    condition_seconds: Dict[str, float] = field(default_factory=dict)
+    rainfall_mm: Optional[float] = None
+    first_dt: int = 0
+    last_dt: int = 0
+    last_condition: Optional[str] = None  # Condition of the latest observation, credited until the next one
+    last_rain_rate: Optional[float] = None  # mm/h of the latest observation
+    complete: bool = False
+    stored: bool = False  # A document for this report exists in Appwrite
+    dirty: bool = False  # Changed since it was last saved
+
+    @property
+    def start(self) -> int:
+        # Epoch seconds of the midnight that starts this day
+        return int(datetime.combine(self.day, datetime.min.time(), tzinfo=timezone.utc).timestamp())
+
+    @property
+    def end(self) -> int:
+        return self.start + 86400
+
+    def _credit(self, seconds: float, condition: Optional[str], rain_rate: Optional[float]) -> None:
+        if seconds <= 0:
+            return
+        if condition is not None:
+            self.condition_seconds[condition] = self.condition_seconds.get(condition, 0.0) + seconds
+        if rain_rate is not None:
+            self.rainfall_mm = (self.rainfall_mm or 0.0) + rain_rate * seconds / 3600
+        self.dirty = True
+
+    def close(self, max_gap: float) -> None:
+        # The last observation's condition is credited until midnight (up to max_gap)
+        if not self.complete and self.count:
+            self._credit(min(self.end - self.last_dt, max_gap), self.last_condition, self.last_rain_rate)
+        self.complete = True
+        self.dirty = True
+
+    def carry_over(self, previous: "DailyAccumulator", first_dt: int, max_gap: float) -> None:
+        # Credits this day with the part after midnight of the gap between the previous day's last observation and
+        # this day's first one; the previous day was credited up to midnight when it closed
+        if self.count or not previous.count or previous.end != self.start:
+            return
+        gap = min(first_dt - previous.last_dt, max_gap)
+        self._credit(gap - min(previous.end - previous.last_dt, max_gap), previous.last_condition, previous.last_rain_rate)
+
+    def add(self, observation: WeatherObservation, max_gap: float) -> None:
+        # The time since the previous observation is credited to the previous condition and rain rate
+        if self.count and observation.dt > self.last_dt:
+            self._credit(min(observation.dt - self.last_dt, max_gap), self.last_condition, self.last_rain_rate)
+
+        self.count += 1
+        delta = observation.temperature - self.temperature_mean
+        self.temperature_mean += delta / self.count
+        self.temperature_m2 += delta * (observation.temperature - self.temperature_mean)
+        self.temperature_min = _min(self.temperature_min, observation.temperature)
+        self.temperature_max = _max(self.temperature_max, observation.temperature)
+        self.humidity_min = _min(self.humidity_min, observation.humidity)
+        self.humidity_max = _max(self.humidity_max, observation.humidity)
+        self.peak_gust = _max(self.peak_gust, observation.wind_gust if observation.wind_gust is not None else observation.wind_speed)
+
+        if observation.dt >= self.last_dt:
+            self.last_dt = observation.dt
+            self.last_condition = condition_value(observation.temperature, observation.humidity, observation.wind_speed)
+            self.last_rain_rate = observation.rain_1h
+            if observation.rain_1h is not None and self.rainfall_mm is None:
+                self.rainfall_mm = 0.0
+        self.first_dt = min(self.first_dt, observation.dt) if self.first_dt else observation.dt
+        self.dirty = True
+
+    def to_report(self) -> DailyReport:
+        def moment(dt: int) -> Optional[datetime]:
+            return datetime.fromtimestamp(dt, tz=timezone.utc) if dt else None
+
+        return DailyReport(
+            location_id=self.location_id,
+            date=self.day,
+            observations=self.count,
+            temperature_min=self.temperature_min,
+            temperature_max=self.temperature_max,
+            temperature_mean=self.temperature_mean if self.count else None,
+            temperature_stddev=math.sqrt(self.temperature_m2 / (self.count - 1)) if self.count > 1 else None,
+            humidity_min=self.humidity_min,
+            humidity_max=self.humidity_max,
+            peak_gust=self.peak_gust,
+            condition_hours={condition: round(self.condition_seconds.get(condition, 0.0) / 3600, 3) for condition in CONDITIONS},
+            rainfall_mm=round(self.rainfall_mm, 2) if self.rainfall_mm is not None else None,
+            first_observation=moment(self.first_dt),
+            last_observation=moment(self.last_dt),
+            complete=self.complete
+        )
+
+    def to_storage(self) -> Dict[str, Any]:
+        fields = {key: value for key, value in self.__dict__.items() if key not in ("day", "stored", "dirty", "condition_seconds")}
+        fields["date"] = self.day.isoformat()
+        fields["condition_seconds"] = json.dumps(self.condition_seconds)
+        return fields
+
+    @classmethod
+    def from_storage(cls, doc: Dict[str, Any]) -> "DailyAccumulator":
+        fields = {key: doc[key] for key in cls.__dataclass_fields__ if key in doc and key not in ("day", "stored", "dirty", "condition_seconds")}
+        return cls(
+            **fields,
+            day=date.fromisoformat(doc["date"]),
+            condition_seconds=json.loads(doc.get("condition_seconds") or "{}"),
+            stored=True
+        )
+
+class DailyReportService:
+    MEMORY_LIMIT = 1000  # Closed reports kept in memory (the only copy when no reports collection is configured)
+    PAGE_SIZE = 100
+
+    def __init__(self, appwrite_service: Any, settings_service: FarmSettingsService):
+        self.appwrite = appwrite_service
+        self.settings_service = settings_service
+        self.collection_id = settings.APPWRITE_REPORTS_COLLECTION_ID
+        self.max_gap = settings.REPORTS_MAX_GAP_MINUTES * 60
+        self._open: Dict[str, DailyAccumulator] = {}  # Day currently being recorded, per location
+        self._closed: "OrderedDict[Tuple[str, date], DailyAccumulator]" = OrderedDict()
+        self._lock = asyncio.Lock()
+        self._swept = False  # Stored reports left open by a previous process have been closed
+
+    @property
+    def persisted(self) -> bool:
+        return bool(self.collection_id)
+
+    async def _save(self, report: DailyAccumulator) -> bool:
+        if not self.persisted:
+            report.dirty = False
+            return True
+        doc_id = report_document_id(report.location_id, report.day)
+        fields = report.to_storage()
+        saved = None
+        if report.stored:
+            saved = await call_appwrite(self.appwrite.update_document, self.collection_id, doc_id, fields)
+        if not saved:
+            saved = await call_appwrite(self.appwrite.create_document, self.collection_id, doc_id, fields)
+        if not saved:
+            logger.warning(f"Reports: Failed to save {doc_id}.")
+            return False
+        report.stored, report.dirty = True, False
+        return True
+
+    async def _load(self, location_id: str, day: date) -> Optional[DailyAccumulator]:
+        if self.persisted:
+            doc = await call_appwrite(self.appwrite.get_document, self.collection_id, report_document_id(location_id, day))
+            if doc:
+                return DailyAccumulator.from_storage(doc)
+        return None
+
+    async def _resume(self, location_id: str, observation: WeatherObservation) -> DailyAccumulator:
+        # First observation of a location in this process: continue its day from the last checkpoint, and close the
+        # previous day if it is still open (e.g. the process restarted across midnight)
+        day = _observation_day(observation)
+        report = await self._load(location_id, day) or DailyAccumulator(location_id=location_id, day=day)
+        previous_day = day - timedelta(days=1)
+        previous = self._closed.get((location_id, previous_day)) or await self._load(location_id, previous_day)
+        if previous is not None:
+            if not previous.complete:
+                await self._close(previous)
+            report.carry_over(previous, observation.dt, self.max_gap)
+        return report
+
+    async def _close(self, report: DailyAccumulator) -> bool:
+        report.close(self.max_gap)
+        saved = await self._save(report)
+        self._closed[(report.location_id, report.day)] = report
+        while len(self._closed) > self.MEMORY_LIMIT:
+            self._closed.popitem(last=False)
+        logger.info(f"Reports: Daily report for {report.location_id} on {report.day} completed ({report.count} observations).")
+        return saved
+
+    async def add_observation(self, observation: WeatherObservation) -> None:
+        # Observation listener (while the farm's daily_report setting is on)
+        current_settings = await self.settings_service.get_settings()
+        if not current_settings.daily_report:
+            return
+        location_id = observation.location_id or PRIMARY_LOCATION_ID
+        day = _observation_day(observation)
+        async with self._lock:
+            report = self._open.get(location_id)
+            if report is None:
+                report = self._open[location_id] = await self._resume(location_id, observation)
+            elif day < report.day:
+                return  # Late observation for a day that is already closed
+            elif day > report.day:
+                previous = report
+                await self._close(previous)
+                report = self._open[location_id] = DailyAccumulator(location_id=location_id, day=day)
+                report.carry_over(previous, observation.dt, self.max_gap)
+            report.add(observation, self.max_gap)
+
+    async def checkpoint(self, today: Optional[date] = None) -> int:
+        # Closes the reports of days that are over, then saves the open reports that changed since their last save;
+        # returns the number saved. Runs whether or not daily reports are enabled, so no day is left open.
+        today = today or datetime.now(timezone.utc).date()
+        async with self._lock:
+            for location_id, report in list(self._open.items()):
+                if report.day < today:
+                    await self._close(report)
+                    del self._open[location_id]
+            if not self._swept:
+                await self._close_stored(today)
+            dirty = [report for report in self._open.values() if report.dirty]
+            results = await asyncio.gather(*(self._save(report) for report in dirty))
+        return sum(results)
+
+    async def _close_stored(self, today: date) -> None:
+        # Once per process: closes stored reports of past days that no process will close any more
+        # (e.g. a location that stopped polling before a restart)
+        if self.persisted:
+            queries = [
+                AppwriteQuery.equal("complete", False), AppwriteQuery.less_than("date", today.isoformat()), AppwriteQuery.limit(self.PAGE_SIZE)
+            ]
+            while True:
+                page = await call_appwrite(self.appwrite.list_documents, self.collection_id, queries)
+                documents = page.get("documents", []) if page else []
+                closed = [await self._close(DailyAccumulator.from_storage(doc)) for doc in documents]
+                if len(documents) < self.PAGE_SIZE or not all(closed):
+                    break  # Closed reports no longer match, so the next query returns the following page
+        self._swept = True
+
+    async def get_reports(self, day: date, location_id: Optional[str] = None) -> List[DailyReport]:
+        # In-memory reports (including the day still being recorded) take precedence over stored ones
+        in_memory = [*self._open.values(), *(report for (_, report_day), report in self._closed.items() if report_day == day)]
+        reports = {
+            report.location_id: report.to_report()
+            for report in in_memory
+            if report.day == day and (location_id is None or report.location_id == location_id)
+        }
+        if self.persisted:
+            base_queries = [AppwriteQuery.equal("date", day.isoformat()), AppwriteQuery.limit(self.PAGE_SIZE)]
+            if location_id is not None:
+                base_queries.append(AppwriteQuery.equal("location_id", location_id))
+            cursor: Optional[str] = None
+            while True:
+                queries = base_queries + ([AppwriteQuery.cursor_after(cursor)] if cursor else [])
+                page = await call_appwrite(self.appwrite.list_documents, self.collection_id, queries)
+                documents = page.get("documents", []) if page else []
+                for doc in documents:
+                    if doc.get("location_id") not in reports:
+                        reports[doc["location_id"]] = DailyAccumulator.from_storage(doc).to_report()
+                if len(documents) < self.PAGE_SIZE:
+                    break
+                cursor = documents[-1]["$id"]
+        return [reports[key] for key in sorted(reports)]
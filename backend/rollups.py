@@ -0,0 +1,249 @@
+import argparse
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from appwrite.query import Query as AppwriteQuery
+
+from .config import settings
+from .models import PRIMARY_LOCATION_ID, AggregateBucket, MetricSummary, WeatherObservation
+from .services import WeatherService, call_appwrite
+
+logger = logging.getLogger(__name__)
+
+# --- Time-Series Rollups ---
+# One Appwrite document per (bucket size, location, bucket start) holding min/max/sum/count/last per metric.
+# Rollups are updated incrementally as observations are persisted, so reading a chart costs one document per bucket
+# no matter how much raw history exists. `python -m backend.rollups backfill` rebuilds them from raw history.
+
+ROLLUP_METRICS = ("temperature", "humidity", "pressure", "wind_speed", "wind_gust")
+ROLLUP_BUCKETS = {"hour": 3600, "day": 86400, "week": 7 * 86400}
+WEEK_OFFSET = 4 * 86400  # 1970-01-01 was a Thursday; weeks start on Monday 00:00 UTC
+
+def bucket_start(bucket: str, timestamp: int) -> int:
+    size = ROLLUP_BUCKETS[bucket]
+    offset = WEEK_OFFSET if bucket == "week" else 0
+    return (timestamp - offset) // size * size + offset
+
+def _as_utc(moment: datetime) -> datetime:
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+def rollup_document_id(bucket: str, location_id: str, start: int) -> str:
+    # Deterministic id so the rollup can be updated without a lookup query (Appwrite ids are limited to 36 chars)
+    doc_id = f"{bucket}_{location_id}_{start}"
+    if len(doc_id) > 36:
+        doc_id = f"{bucket}_{hashlib.sha1(location_id.encode()).hexdigest()[:12]}_{start}"
+    return doc_id
+
+def _empty_rollup(bucket: str, location_id: str, start: int) -> Dict[str, Any]:
+    rollup: Dict[str, Any] = {"bucket": bucket, "location_id": location_id, "start": start, "count": 0, "last_dt": 0}
+    for metric in ROLLUP_METRICS:
+        rollup.update({f"{metric}_min": None, f"{metric}_max": None, f"{metric}_sum": 0.0, f"{metric}_count": 0, f"{metric}_last": None})
+    return rollup
+
+def _merge_observation(rollup: Dict[str, Any], values: Dict[str, Optional[float]], dt: int) -> Dict[str, Any]:
+    merged = dict(rollup)
+    is_latest = dt >= (merged.get("last_dt") or 0)
+    merged["count"] = (merged.get("count") or 0) + 1
+    for metric, value in values.items():
+        if value is None:
+            continue
+        current_min, current_max = merged.get(f"{metric}_min"), merged.get(f"{metric}_max")
+        merged[f"{metric}_min"] = value if current_min is None else min(current_min, value)
+        merged[f"{metric}_max"] = value if current_max is None else max(current_max, value)
+        merged[f"{metric}_sum"] = (merged.get(f"{metric}_sum") or 0.0) + value
+        merged[f"{metric}_count"] = (merged.get(f"{metric}_count") or 0) + 1
+        if is_latest:
+            merged[f"{metric}_last"] = value
+    if is_latest:
+        merged["last_dt"] = dt
+    return merged
+
+def _rollup_fields(doc: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in doc.items() if not k.startswith("$")}
+
+def rollup_to_bucket(doc: Dict[str, Any]) -> AggregateBucket:
+    metrics = {}
+    for metric in ROLLUP_METRICS:
+        count = doc.get(f"{metric}_count") or 0
+        metrics[metric] = MetricSummary(
+            min=doc.get(f"{metric}_min"),
+            max=doc.get(f"{metric}_max"),
+            mean=doc.get(f"{metric}_sum", 0.0) / count if count else None,
+            last=doc.get(f"{metric}_last")
+        )
+    return AggregateBucket(
+        start=datetime.fromtimestamp(doc["start"], tz=timezone.utc),
+        count=doc.get("count") or 0,
+        metrics=metrics
+    )
+
+class RollupService:
+    PAGE_SIZE = 100
+
+    def __init__(self, appwrite_service: Any):
+        self.appwrite = appwrite_service
+        self.collection_id = settings.APPWRITE_ROLLUPS_COLLECTION_ID
+        # Latest rollup per (bucket, location) as last written, so the common case needs no read before the write
+        self._open: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._lock = asyncio.Lock()  # Serializes read-modify-write cycles
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.collection_id)
+
+    async def _save(self, doc_id: str, fields: Dict[str, Any], exists: bool) -> bool:
+        if exists:
+            saved = await call_appwrite(self.appwrite.update_document, self.collection_id, doc_id, fields)
+            if saved:
+                return True
+        saved = await call_appwrite(self.appwrite.create_document, self.collection_id, doc_id, fields)
+        return bool(saved)
+
+    async def add_observation(self, observation: WeatherObservation) -> None:
+        # Observation listener: folds one persisted observation into its hour, day and week rollups.
+        if not self.enabled:
+            return
+        location_id = observation.location_id or PRIMARY_LOCATION_ID
+        values = {metric: getattr(observation, metric) for metric in ROLLUP_METRICS}
+        async with self._lock:
+            for bucket in ROLLUP_BUCKETS:
+                start = bucket_start(bucket, observation.dt)
+                doc_id = rollup_document_id(bucket, location_id, start)
+                cached = self._open.get((bucket, location_id))
+                if cached is not None and cached["$id"] == doc_id:
+                    current, exists = _rollup_fields(cached), True
+                else:
+                    stored = await call_appwrite(self.appwrite.get_document, self.collection_id, doc_id)
+                    current, exists = (_rollup_fields(stored), True) if stored else (_empty_rollup(bucket, location_id, start), False)
+
+                merged = _merge_observation(current, values, observation.dt)
+                if await self._save(doc_id, merged, exists):
+                    self._open[(bucket, location_id)] = {**merged, "$id": doc_id}
+                else:
+                    self._open.pop((bucket, location_id), None)
+                    logger.warning(f"Rollups: Failed to save {doc_id}.")
+
+    async def aggregate(self, bucket: str, start: datetime, end: datetime, location_id: str = PRIMARY_LOCATION_ID) -> List[AggregateBucket]:
+        # Reads only rollup documents: one per bucket in [start, end].
+        base_queries = [
+            AppwriteQuery.equal("bucket", bucket),
+            AppwriteQuery.equal("location_id", location_id),
+            AppwriteQuery.greater_than_equal("start", bucket_start(bucket, int(start.timestamp()))),
+            AppwriteQuery.less_than_equal("start", int(end.timestamp())),
+            AppwriteQuery.order_asc("start"),
+            AppwriteQuery.limit(self.PAGE_SIZE)
+        ]
+        buckets: List[AggregateBucket] = []
+        cursor: Optional[str] = None
+        while True:
+            queries = base_queries + ([AppwriteQuery.cursor_after(cursor)] if cursor else [])
+            page = await call_appwrite(self.appwrite.list_documents, self.collection_id, queries)
+            documents = page.get("documents", []) if page else []
+            buckets.extend(rollup_to_bucket(doc) for doc in documents)
+            if len(documents) < self.PAGE_SIZE:
+                return buckets
+            cursor = documents[-1]["$id"]
+
+    async def backfill(self, weather_service: WeatherService, start: Optional[datetime] = None, end: Optional[datetime] = None, concurrency: int = 8) -> int:
+        # Recomputes every rollup touched by raw history in [start, end] with vectorized NumPy reductions and
+        # overwrites the stored documents. Returns the number of rollup documents written.
+        import numpy as np  # Only needed for backfills
+
+        # Rollups are rewritten whole, so the range is widened to whole weeks: every hour, day and week bucket it
+        # touches (they nest inside weeks) is then rebuilt from all of its observations, not just those in range
+        week = ROLLUP_BUCKETS["week"]
+        if start is not None:
+            start = datetime.fromtimestamp(bucket_start("week", int(_as_utc(start).timestamp())), tz=timezone.utc)
+        if end is not None:
+            end = datetime.fromtimestamp(bucket_start("week", int(_as_utc(end).timestamp())) + week, tz=timezone.utc) - timedelta(microseconds=1)
+
+        dts: List[int] = []
+        locations: List[str] = []
+        columns: Dict[str, List[float]] = {metric: [] for metric in ROLLUP_METRICS}
+        async for doc in weather_service.iter_weather_history(start=start, end=end):
+            observation = weather_service.decode_observation(doc)
+            dts.append(observation.dt)
+            locations.append(observation.location_id or PRIMARY_LOCATION_ID)
+            for metric in ROLLUP_METRICS:
+                value = getattr(observation, metric)
+                columns[metric].append(np.nan if value is None else value)
+        if not dts:
+            return 0
+
+        dt_array = np.asarray(dts, dtype=np.int64)
+        location_array = np.asarray(locations)
+        value_arrays = {metric: np.asarray(values, dtype=np.float64) for metric, values in columns.items()}
+
+        rollups: List[Tuple[str, Dict[str, Any]]] = []
+        for location_id in np.unique(location_array):
+            in_location = location_array == location_id
+            location_dts = dt_array[in_location]
+            for bucket, size in ROLLUP_BUCKETS.items():
+                offset = WEEK_OFFSET if bucket == "week" else 0
+                starts = (location_dts - offset) // size * size + offset
+                order = np.lexsort((location_dts, starts))  # By bucket, then by observation time
+                sorted_starts = starts[order]
+                sorted_dts = location_dts[order]
+                group_starts = np.flatnonzero(np.r_[True, sorted_starts[1:] != sorted_starts[:-1]])
+                group_ends = np.r_[group_starts[1:], len(sorted_starts)] - 1
+                counts = np.diff(np.r_[group_starts, len(sorted_starts)])
+
+                summaries: Dict[str, Tuple[Any, ...]] = {}
+                for metric, values in value_arrays.items():
+                    sorted_values = values[in_location][order]
+                    valid = ~np.isnan(sorted_values)
+                    metric_counts = np.add.reduceat(valid.astype(np.int64), group_starts)
+                    with np.errstate(invalid="ignore"):
+                        mins = np.fmin.reduceat(sorted_values, group_starts)
+                        maxs = np.fmax.reduceat(sorted_values, group_starts)
+                    sums = np.add.reduceat(np.where(valid, sorted_values, 0.0), group_starts)
+                    summaries[metric] = (mins, maxs, sums, metric_counts, sorted_values[group_ends])
+
+                for i, group_start in enumerate(sorted_starts[group_starts]):
+                    fields = _empty_rollup(bucket, str(location_id), int(group_start))
+                    fields["count"] = int(counts[i])
+                    fields["last_dt"] = int(sorted_dts[group_ends[i]])
+                    for metric, (mins, maxs, sums, metric_counts, lasts) in summaries.items():
+                        if metric_counts[i]:
+                            fields.update({
+                                f"{metric}_min": float(mins[i]),
+                                f"{metric}_max": float(maxs[i]),
+                                f"{metric}_sum": float(sums[i]),
+                                f"{metric}_count": int(metric_counts[i]),
+                                f"{metric}_last": None if np.isnan(lasts[i]) else float(lasts[i])
+                            })
+                    rollups.append((rollup_document_id(bucket, str(location_id), int(group_start)), fields))
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def write(doc_id: str, fields: Dict[str, Any]) -> bool:
+            async with semaphore:
+                return await self._save(doc_id, fields, exists=True)
+
+        async with self._lock:
+            results = await asyncio.gather(*(write(doc_id, fields) for doc_id, fields in rollups))
+            self._open.clear()
+        return sum(results)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rebuild weather rollups from raw observation history.")
+    parser.add_argument("command", choices=["backfill"])
+    parser.add_argument("--from", dest="start", type=datetime.fromisoformat, default=None, help="ISO start of the range")
+    parser.add_argument("--to", dest="end", type=datetime.fromisoformat, default=None, help="ISO end of the range")
+    args = parser.parse_args()
+
+    from .services import FarmSettingsService, OpenWeatherMapService, create_appwrite_service, create_http_client
+
+    async def run() -> int:
+        async with create_http_client() as http_client:
+            appwrite_service = create_appwrite_service(http_client)
+            weather_service = WeatherService(appwrite_service, OpenWeatherMapService(http_client), FarmSettingsService(appwrite_service))
+            return await RollupService(appwrite_service).backfill(weather_service, args.start, args.end)
+
+    print(f"Wrote {asyncio.run(run())} rollup document(s).")
+
+if __name__ == "__main__":
+    main()
@@ -1,39 +1,92 @@
-from fastapi import APIRouter, Depends, HTTPException, Query as FastAPIQuery
-from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, WebSocket, WebSocketDisconnect, Query as FastAPIQuery
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, AsyncIterator, List, Optional
+import csv
+import io
+import logging
+import math
+import time
 
-from .services import AppwriteService, OpenWeatherMapService, FarmSettingsService, WeatherService
-from .models import FarmSettingsData, FarmSettingsResponse, WeatherResponse, WeatherHistoryResponse, WeatherHistoryRecord
+from .services import AppwriteService, OpenWeatherMapService, FarmSettingsService, WeatherService, WeatherSnapshot
+from .models import FarmSettingsData, FarmSettingsResponse, WeatherResponse, WeatherHistoryResponse, WeatherHistoryRecord, AggregateResponse, ArchiveScanResponse, AlertsResponse, DailyReportsResponse, PRIMARY_LOCATION_ID
+from .rollups import RollupService, ROLLUP_BUCKETS
+from .archive import ARCHIVE_COLUMNS, ObservationArchive, output_value
+from .broadcast import Broadcaster, event_id_for
+from .alerts import AlertEngine
+from .reports import DailyReportService
+from .instrumentation import CACHE_REQUESTS
 from .config import settings  # Importing settings, if needed directly for specific configurations
 
+logger = logging.getLogger(__name__)
+
 # --- Dependency Injection Setup ---
-# Dependency injection allows us to manage the lifecycle and dependencies of our services.
-# Each service is instantiated once per request. For stateless services or those that are inexpensive to instantiate,
-# this approach works fine. However, for expensive resources (e.g., DB pools), consider initializing them at app startup
-# and making them available globally via app state or a more advanced DI pattern.
-
-def get_appwrite_service():
-    # Returns an instance of the AppwriteService.
-    return AppwriteService()
-
-def get_owm_service():
-    # Returns an instance of the OpenWeatherMapService.
-    return OpenWeatherMapService()
-
-def get_farm_settings_service(appwrite_service: AppwriteService = Depends(get_appwrite_service)):
-    # Returns an instance of the FarmSettingsService, with the AppwriteService injected as a dependency.
-    return FarmSettingsService(appwrite_service)
-
-def get_weather_service(
-    appwrite_service: AppwriteService = Depends(get_appwrite_service),
-    owm_service: OpenWeatherMapService = Depends(get_owm_service),
-    settings_service: FarmSettingsService = Depends(get_farm_settings_service)
-):
-    # Returns an instance of the WeatherService with dependencies on AppwriteService, OpenWeatherMapService, and FarmSettingsService.
-    return WeatherService(appwrite_service, owm_service, settings_service)
+# Services are built once at application startup (see `build_services` in main.py) and stored on `app.state`.
+# These providers only look them up, so no Appwrite client or service object is constructed per request.
+# Tests can swap any service by assigning it to `app.state` before startup or via `app.dependency_overrides`.
+
+def get_appwrite_service(request: Request) -> AppwriteService:
+    # Returns the application-wide AppwriteService.
+    return request.app.state.appwrite_service
+
+def get_owm_service(request: Request) -> OpenWeatherMapService:
+    # Returns the application-wide OpenWeatherMapService (bound to the pooled HTTP client).
+    return request.app.state.owm_service
+
+def get_farm_settings_service(request: Request) -> FarmSettingsService:
+    # Returns the application-wide FarmSettingsService.
+    return request.app.state.settings_service
+
+def get_weather_service(request: Request) -> WeatherService:
+    # Returns the application-wide WeatherService, already wired to the services above.
+    return request.app.state.weather_service
+
+def get_rollup_service(request: Request) -> RollupService:
+    # Returns the application-wide RollupService.
+    return request.app.state.rollup_service
+
+def get_archive(request: Request) -> ObservationArchive:
+    # Returns the application-wide ObservationArchive.
+    return request.app.state.archive
+
+def get_write_buffer(request: Request):
+    # Returns the application-wide ObservationBuffer.
+    return request.app.state.write_buffer
+
+def get_broadcaster(request: Request) -> Broadcaster:
+    # Returns the application-wide Broadcaster.
+    return request.app.state.broadcaster
+
+def get_alert_engine(request: Request) -> AlertEngine:
+    # Returns the application-wide AlertEngine.
+    return request.app.state.alert_engine
+
+def get_report_service(request: Request) -> DailyReportService:
+    # Returns the application-wide DailyReportService.
+    return request.app.state.report_service
+
+# Coordination mode: alerts, daily reports and streams of the extra locations are built from observations in the
+# leader's memory only, so a load balancer has to route these requests to the leader (sticky routing, see README).
+# Followers answer them with an explicit 503 instead of empty results.
+LEADER_ONLY_DETAIL = "Served by the leader worker only; route this request to the leader."
+
+def _is_follower(app: Any) -> bool:
+    return getattr(app.state.weather_service, "follower", False)
+
+def require_leader(request: Request) -> None:
+    # Dependency of the leader-only endpoints
+    if _is_follower(request.app):
+        raise HTTPException(
+            status_code=503,
+            detail=LEADER_ONLY_DETAIL,
+            headers={"Retry-After": str(math.ceil(max(settings.COORDINATION_INTERVAL_SECONDS, 1.0)))}
+        )
 
 # --- Routers ---
 settings_router = APIRouter(prefix="/api/settings", tags=["Settings"])  # Router for settings-related endpoints
 weather_router = APIRouter(prefix="/api/weather", tags=["Weather"])  # Router for weather-related endpoints
+reports_router = APIRouter(prefix="/api/reports", tags=["Reports"])  # Router for report endpoints
 
 # --- Settings Endpoints ---
 @settings_router.get("", response_model=FarmSettingsResponse)
@@ -67,34 +120,325 @@ async def update_farm_settings(
 
 
 # --- Weather Endpoints ---
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # Compares an If-None-Match header (possibly a list, possibly weak validators) with the snapshot ETag.
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+def _snapshot_is_stale(snapshot: WeatherSnapshot, update_frequency: int) -> bool:
+    return time.time() - snapshot.observed_at > update_frequency * 60 * settings.STALE_AFTER_INTERVALS
+
+def _snapshot_response(request: Request, snapshot: WeatherSnapshot, update_frequency: int) -> Response:
+    # Clients may cache the snapshot until the next scheduled update is due.
+    # X-Weather-Age / X-Weather-Stale tell clients how old the observation is when upstream refreshes are failing.
+    age = max(0, int(time.time() - snapshot.observed_at))
+    max_age = max(0, int(snapshot.observed_at + update_frequency * 60 - time.time()))
+    headers = {"ETag": snapshot.etag, "Cache-Control": f"max-age={max_age}", "X-Weather-Age": str(age)}
+    if _snapshot_is_stale(snapshot, update_frequency):
+        headers.update({"X-Weather-Stale": "true", "Warning": '110 - "Response is Stale"'})
+    if _etag_matches(request.headers.get("if-none-match"), snapshot.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
+
 @weather_router.get("/current", response_model=WeatherResponse)
-async def get_current_weather_data(service: WeatherService = Depends(get_weather_service)):
+async def get_current_weather_data(
+    request: Request,
+    service: WeatherService = Depends(get_weather_service),
+    settings_service: FarmSettingsService = Depends(get_farm_settings_service)
+):
     # Endpoint to fetch current weather data.
-    data = await service.get_latest_weather()
-    
-    # If no weather data is found in the database, attempt to fetch and update the data from the external service
-    if not data:  
-        print("No current weather in DB, attempting to update...")
-        data = await service.update_weather_data()
-    
-    # If weather data is still unavailable, raise a 404 HTTP exception
-    if not data:
-        raise HTTPException(status_code=404, detail="Weather data not available.")
-    
-    return data
+    # Fast path: serve the pre-serialized snapshot published by the last update.
+    # A stale snapshot is still served right away (stale-while-revalidate) while a refresh runs in the background.
+    snapshot = await service.get_current_snapshot()
+    current_settings = await settings_service.get_settings()
+    if snapshot and _snapshot_is_stale(snapshot, current_settings.update_frequency):
+        CACHE_REQUESTS.inc("snapshot", "stale")
+        service.refresh_in_background()
+    elif snapshot:
+        CACHE_REQUESTS.inc("snapshot", "hit")
+    if not snapshot and service.follower:
+        # Coordination mode: only the leader fetches; wait briefly for the snapshot it shares
+        CACHE_REQUESTS.inc("snapshot", "miss")
+        snapshot = await service.wait_for_shared_snapshot(settings.FOLLOWER_SNAPSHOT_WAIT_SECONDS)
+        if not snapshot:
+            raise HTTPException(
+                status_code=503,
+                detail="Weather data not yet available from the leader worker.",
+                headers={"Retry-After": str(math.ceil(max(settings.COORDINATION_INTERVAL_SECONDS, 1.0)))}
+            )
+    elif not snapshot:
+        CACHE_REQUESTS.inc("snapshot", "miss")
+        data = await service.get_latest_weather()
+        
+        # If no weather data is found in the database, attempt to fetch and update the data from the external service
+        if not data:  
+            logger.info("No current weather in DB, attempting to update...")
+            data = await service.update_weather_data()
+        
+        # If weather data is still unavailable: 503 while a dependency's circuit is open, 404 otherwise
+        if not data:
+            retry_after = service.degraded_retry_after()
+            if retry_after > 0:
+                raise HTTPException(
+                    status_code=503,
+                    detail="Weather data temporarily unavailable.",
+                    headers={"Retry-After": str(math.ceil(retry_after))}
+                )
+            raise HTTPException(status_code=404, detail="Weather data not available.")
+
+        snapshot = await service.get_current_snapshot()
+        if not snapshot:
+            return data
+
+    return _snapshot_response(request, snapshot, current_settings.update_frequency)
 
 
 @weather_router.get("/history", response_model=WeatherHistoryResponse)
 async def get_weather_data_history(
     limit: int = FastAPIQuery(10, ge=1, le=100),  # Limit for number of records to return (between 1 and 100)
-    offset: int = FastAPIQuery(0, ge=0),  # Offset for pagination, defaults to 0
+    offset: int = FastAPIQuery(0, ge=0),  # Offset for pagination, defaults to 0 (ignored when a cursor is given)
+    cursor: Optional[str] = FastAPIQuery(None),  # Opaque cursor from a previous page's next_cursor
     service: WeatherService = Depends(get_weather_service)
 ):
     # Endpoint to fetch historical weather data.
-    history_result = await service.get_weather_history(limit=limit, offset=offset)
+    try:
+        history_result = await service.get_weather_history(limit=limit, offset=offset, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     # Validate the documents returned and convert them into WeatherHistoryRecord models
-    validated_documents = [WeatherHistoryRecord.model_validate(doc) for doc in history_result.get('documents', [])]
+    validated_documents = [service.decode_document(doc, WeatherHistoryRecord) for doc in history_result.get('documents', [])]
     
-    # Return the total number of records and the list of validated weather history documents
-    return WeatherHistoryResponse(total=history_result.get('total', 0), documents=validated_documents)
+    # Return the total number of records, the validated weather history documents and the cursor for the next page
+    return WeatherHistoryResponse(
+        total=history_result.get('total', 0),
+        documents=validated_documents,
+        next_cursor=history_result.get('next_cursor')
+    )
+
+
+EXPORT_CSV_FIELDS = [field.alias or name for name, field in WeatherHistoryRecord.model_fields.items()]
+
+async def _export_ndjson(service: WeatherService, documents: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    async for doc in documents:
+        yield service.decode_document(doc, WeatherHistoryRecord).model_dump_json(by_alias=True).encode() + b"\n"
+
+async def _export_csv(service: WeatherService, documents: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_CSV_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    async for doc in documents:
+        writer.writerow(service.decode_document(doc, WeatherHistoryRecord).model_dump(mode="json", by_alias=True))
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+@weather_router.get("/history/export")
+async def export_weather_data_history(
+    format: str = FastAPIQuery("ndjson", pattern="^(ndjson|csv)$"),  # Output format
+    start: Optional[datetime] = FastAPIQuery(None, alias="from"),  # Inclusive lower bound on the ordering attribute ($createdAt in v1, OWM dt in v2)
+    end: Optional[datetime] = FastAPIQuery(None, alias="to"),  # Inclusive upper bound on the ordering attribute ($createdAt in v1, OWM dt in v2)
+    service: WeatherService = Depends(get_weather_service)
+):
+    # Streams the whole requested range page by page; memory use does not depend on the size of the range.
+    documents = service.iter_weather_history(start=start, end=end)
+    if format == "csv":
+        return StreamingResponse(
+            _export_csv(service, documents),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="weather_history.csv"'}
+        )
+    return StreamingResponse(_export_ndjson(service, documents), media_type="application/x-ndjson")
+
+
+AGGREGATE_DEFAULT_BUCKETS = 48  # Buckets returned when no explicit range is requested
+
+def _as_utc(moment: datetime) -> datetime:
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+@weather_router.get("/aggregate", response_model=AggregateResponse)
+async def get_weather_aggregate(
+    bucket: str = FastAPIQuery("hour", pattern="^(hour|day|week)$"),  # Bucket size
+    start: Optional[datetime] = FastAPIQuery(None, alias="from"),  # Range start (defaults to 48 buckets before `to`)
+    end: Optional[datetime] = FastAPIQuery(None, alias="to"),  # Range end (defaults to now)
+    location_id: str = FastAPIQuery(PRIMARY_LOCATION_ID),  # Location to aggregate
+    service: RollupService = Depends(get_rollup_service)
+):
+    # Endpoint returning min/max/mean/last per metric and bucket, read from precomputed rollups.
+    if not service.enabled:
+        raise HTTPException(status_code=503, detail="Aggregation is not configured (APPWRITE_ROLLUPS_COLLECTION_ID).")
+    end = _as_utc(end) if end else datetime.now(timezone.utc)
+    start = _as_utc(start) if start else end - timedelta(seconds=ROLLUP_BUCKETS[bucket] * AGGREGATE_DEFAULT_BUCKETS)
+    if start > end:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'.")
+    buckets = await service.aggregate(bucket, start, end, location_id)
+    return AggregateResponse(bucket=bucket, location_id=location_id, buckets=buckets)
+
+
+def _archive_columns(columns: Optional[str]) -> List[str]:
+    names = [name for name in (columns or "").split(",") if name] or list(ARCHIVE_COLUMNS)
+    unknown = [name for name in names if name not in ARCHIVE_COLUMNS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown archive column(s): {', '.join(unknown)}.")
+    return names
+
+@weather_router.get("/archive", response_model=ArchiveScanResponse)
+async def scan_weather_archive(
+    start: Optional[datetime] = FastAPIQuery(None, alias="from"),  # Inclusive lower bound on the observation time
+    end: Optional[datetime] = FastAPIQuery(None, alias="to"),  # Inclusive upper bound on the observation time
+    location_id: str = FastAPIQuery(PRIMARY_LOCATION_ID),  # Location to read
+    columns: Optional[str] = FastAPIQuery(None),  # Comma-separated columns (default: all metrics)
+    archive: ObservationArchive = Depends(get_archive)
+):
+    # Endpoint returning raw observations column by column from the local archive; only the requested columns
+    # of the days in range are read.
+    if not archive.enabled:
+        raise HTTPException(status_code=503, detail="The local archive is not configured (ARCHIVE_PATH).")
+    names = _archive_columns(columns)
+    data = await run_in_threadpool(archive.scan, location_id, start, end, names)
+    body = {"dt": data["dt"].tolist()}
+    for name in names:
+        body[name] = [output_value(value) for value in data[name].tolist()]
+    return ArchiveScanResponse(location_id=location_id, rows=len(body["dt"]), columns=body)
+
+@weather_router.get("/archive/aggregate", response_model=AggregateResponse)
+async def aggregate_weather_archive(
+    bucket: str = FastAPIQuery("hour", pattern="^(hour|day|week)$"),  # Bucket size
+    start: Optional[datetime] = FastAPIQuery(None, alias="from"),  # Range start (defaults to 48 buckets before `to`)
+    end: Optional[datetime] = FastAPIQuery(None, alias="to"),  # Range end (defaults to now)
+    location_id: str = FastAPIQuery(PRIMARY_LOCATION_ID),  # Location to aggregate
+    archive: ObservationArchive = Depends(get_archive)
+):
+    # Same response as /aggregate, computed from the local archive instead of the Appwrite rollups.
+    if not archive.enabled:
+        raise HTTPException(status_code=503, detail="The local archive is not configured (ARCHIVE_PATH).")
+    end = _as_utc(end) if end else datetime.now(timezone.utc)
+    start = _as_utc(start) if start else end - timedelta(seconds=ROLLUP_BUCKETS[bucket] * AGGREGATE_DEFAULT_BUCKETS)
+    if start > end:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'.")
+    buckets = await run_in_threadpool(archive.aggregate, bucket, start, end, location_id)
+    return AggregateResponse(bucket=bucket, location_id=location_id, buckets=buckets)
+
+
+@weather_router.get("/buffer")
+async def get_write_buffer_status(buffer = Depends(get_write_buffer)):
+    # Endpoint exposing the depth of the local write-behind buffer.
+    if not buffer.enabled:
+        return {"enabled": False, "pending": 0, "oldest_age_seconds": 0.0}
+    return {"enabled": True, **buffer.depth()}
+
+
+@weather_router.get("/alerts", response_model=AlertsResponse, dependencies=[Depends(require_leader)])
+async def get_weather_alerts(
+    location_id: Optional[str] = FastAPIQuery(None),  # Only alerts for this location (default: all locations)
+    engine: AlertEngine = Depends(get_alert_engine)
+):
+    # Endpoint listing the extreme-weather alerts currently firing and the most recent alert events.
+    active = engine.active_alerts()
+    recent = list(engine.history.events)
+    if location_id is not None:
+        active = [alert for alert in active if alert.location_id == location_id]
+        recent = [alert for alert in recent if alert.location_id == location_id]
+    return AlertsResponse(active=active, recent=recent)
+
+
+def _sse_event(event_id: Optional[int], payload: bytes) -> bytes:
+    # The payload is compact single-line JSON, so it fits in one data field
+    prefix = f"id: {event_id}\n".encode() if event_id is not None else b""
+    return prefix + b"event: weather\ndata: " + payload + b"\n\n"
+
+async def _initial_payload(broadcaster: Broadcaster, service: WeatherService, location_id: str):
+    # Latest event of the channel, or the current snapshot, so a new client does not wait for the next update
+    latest = broadcaster.latest(location_id)
+    if latest:
+        return latest
+    if location_id == PRIMARY_LOCATION_ID:
+        snapshot = await service.get_current_snapshot()
+        if snapshot:
+            return event_id_for(snapshot.observed_at), snapshot.body
+    return None
+
+@weather_router.get("/stream")
+async def stream_weather_updates(
+    request: Request,
+    location_id: str = FastAPIQuery(PRIMARY_LOCATION_ID),  # Location whose updates are streamed
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),  # Sent by EventSource when reconnecting
+    broadcaster: Broadcaster = Depends(get_broadcaster),
+    service: WeatherService = Depends(get_weather_service)
+):
+    # Server-Sent Events stream of new observations; replaces polling /current.
+    if location_id != PRIMARY_LOCATION_ID:
+        require_leader(request)  # Followers only receive the primary farm's updates (through the shared snapshot)
+    try:
+        resume_from = int(last_event_id) if last_event_id else None
+    except ValueError:
+        resume_from = None
+    subscription = broadcaster.subscribe(location_id, resume_from)
+
+    async def events():
+        try:
+            if not subscription.resumed:
+                initial = await _initial_payload(broadcaster, service, location_id)
+                if initial:
+                    yield _sse_event(*initial)
+            while True:
+                event = await subscription.next_event(settings.STREAM_HEARTBEAT_SECONDS)
+                if subscription.dropped:
+                    break
+                if event is None:
+                    if await request.is_disconnected():
+                        break
+                    yield b": heartbeat\n\n"
+                    continue
+                yield _sse_event(*event)
+        finally:
+            broadcaster.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@weather_router.websocket("/ws")
+async def websocket_weather_updates(websocket: WebSocket, location_id: str = PRIMARY_LOCATION_ID):
+    # WebSocket variant of /stream: one JSON WeatherResponse per message, {"event": "heartbeat"} when idle.
+    broadcaster: Broadcaster = websocket.app.state.broadcaster
+    await websocket.accept()
+    if location_id != PRIMARY_LOCATION_ID and _is_follower(websocket.app):
+        await websocket.close(code=1013, reason=LEADER_ONLY_DETAIL)
+        return
+    subscription = broadcaster.subscribe(location_id)
+    try:
+        initial = await _initial_payload(broadcaster, websocket.app.state.weather_service, location_id)
+        if initial:
+            await websocket.send_text(initial[1].decode())
+        while True:
+            event = await subscription.next_event(settings.STREAM_HEARTBEAT_SECONDS)
+            if subscription.dropped:
+                await websocket.close(code=1013)  # Try again later: the client could not keep up
+                break
+            if event is None:
+                await websocket.send_text('{"event": "heartbeat"}')
+                continue
+            await websocket.send_text(event[1].decode())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        broadcaster.unsubscribe(subscription)
+
+
+@reports_router.get("/daily", response_model=DailyReportsResponse, dependencies=[Depends(require_leader)])
+async def get_daily_reports(
+    day: Optional[date] = FastAPIQuery(None, alias="date"),  # UTC day (YYYY-MM-DD), defaults to today
+    location_id: Optional[str] = FastAPIQuery(None),  # Only the report for this location (default: all locations)
+    service: DailyReportService = Depends(get_report_service)
+):
+    # Endpoint serving the daily reports; today's reports are partial until the day is over.
+    day = day or datetime.now(timezone.utc).date()
+    reports = await service.get_reports(day, location_id)
+    return DailyReportsResponse(date=day, reports=reports)
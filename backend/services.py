@@ -1,81 +1,373 @@
 import httpx
-from appwrite.client import Client as AppwriteClientSDK
-from appwrite.services.databases import Databases
 from appwrite.id import ID as AppwriteID
 from appwrite.query import Query as AppwriteQuery
-from datetime import datetime
-from typing import Optional, Dict, Any, List
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List, AsyncIterator, Awaitable, Callable, Tuple, Type, TypeVar
+import asyncio
+import base64
+import binascii
+import hashlib
+import inspect
 import json
+import logging
 import math
+import os
+import random
+import threading
+import time
 
 from .config import settings
-from .models import FarmSettingsData, WeatherData, WeatherLocation, SunData
+from .geo import CellCache, cell_center
+from .instrumentation import CACHE_REQUESTS, LATEST_WEATHER_REFRESHES, THREADPOOL_WAIT, instrumented, upstream_call
+from .models import FarmSettingsData, FarmLocation, PRIMARY_LOCATION_ID, WeatherData, WeatherLocation, SunData, WeatherObservation, WeatherResponse
+
+logger = logging.getLogger(__name__)
 
 # --- Appwrite Client ---
+def sdk_result_to_dict(result: Any) -> Any:
+    # Recent SDK versions return models (document attributes under `.data`); callers work with the REST JSON shape
+    if hasattr(result, "documents") and hasattr(result, "total"):
+        return {"total": int(result.total), "documents": [sdk_result_to_dict(doc) for doc in result.documents]}
+    if hasattr(result, "to_dict"):
+        doc = result.to_dict()
+        data = doc.pop("data", None)
+        return {**doc, **data} if isinstance(data, dict) else doc
+    return result
+
 class AppwriteService:
     def __init__(self):
+        # The SDK client pulls in most of the Appwrite package (~0.5s); import it only when this client is used
+        from appwrite.client import Client as AppwriteClientSDK
+        from appwrite.services.databases import Databases
+
         client = AppwriteClientSDK()
         client.set_endpoint(settings.APPWRITE_ENDPOINT)
         client.set_project(settings.APPWRITE_PROJECT_ID)
         client.set_key(settings.APPWRITE_API_KEY)
         self.databases = Databases(client)
         self.db_id = settings.APPWRITE_DATABASE_ID
+        self.breaker = CircuitBreaker("appwrite")
 
-    def get_document(self, collection_id: str, document_id: str) -> Optional[Dict[str, Any]]:
-        try:
-            return self.databases.get_document(self.db_id, collection_id, document_id)
-        except Exception as e:
-            print(f"Appwrite: Error getting document {document_id} from {collection_id}: {e}")
-            return None
+    def _call(self, action: str, default: Any, method: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        # Runs one SDK call behind the circuit breaker; errors are logged and turned into `default`
+        with upstream_call("appwrite", method.__name__) as call:
+            if not self.breaker.allow():
+                call["outcome"] = "short_circuit"
+                logger.debug(f"Appwrite: Circuit open, skipped {action}.")
+                return default
+            try:
+                result = method(*args, **kwargs)
+            except Exception as e:
+                call["outcome"] = "error"
+                self.breaker.record(e)
+                logger.error(f"Appwrite: Error {action}: {e}")
+                return default
+            self.breaker.record_success()
+            return sdk_result_to_dict(result)
+
+    def get_document(self, collection_id: str, document_id: str, queries: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        return self._call(
+            f"getting document {document_id} from {collection_id}", None,
+            self.databases.get_document, self.db_id, collection_id, document_id, queries=queries
+        )
 
     def update_document(self, collection_id: str, document_id: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        try:
-            return self.databases.update_document(self.db_id, collection_id, document_id, data)
-        except Exception as e:
-            print(f"Appwrite: Error updating document {document_id} in {collection_id}: {e}")
-            return None
+        return self._call(
+            f"updating document {document_id} in {collection_id}", None,
+            self.databases.update_document, self.db_id, collection_id, document_id, data
+        )
     
     def create_document(self, collection_id: str, document_id:str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        try:
-            doc_id = document_id if document_id != AppwriteID.unique() else AppwriteID.unique()
-            return self.databases.create_document(self.db_id, collection_id, doc_id, data)
-        except Exception as e:
-            print(f"Appwrite: Error creating document in {collection_id}: {e}")
-            return None
+        doc_id = document_id if document_id != AppwriteID.unique() else AppwriteID.unique()
+        return self._call(
+            f"creating document in {collection_id}", None,
+            self.databases.create_document, self.db_id, collection_id, doc_id, data
+        )
 
     def list_documents(self, collection_id: str, queries: Optional[List[str]] = None) -> Dict[str, Any]:
+        return self._call(
+            f"listing documents from {collection_id}", {'total': 0, 'documents': []},
+            self.databases.list_documents, self.db_id, collection_id, queries=queries
+        )
+
+class AsyncAppwriteService:
+    # Native async Appwrite client speaking the REST API over the pooled HTTP client.
+    # Exposes the same methods (and error handling) as AppwriteService, as coroutines.
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None):
+        self.http_client = http_client
+        self.base_url = settings.APPWRITE_ENDPOINT.rstrip("/")
+        self.db_id = settings.APPWRITE_DATABASE_ID
+        self.headers = {
+            "X-Appwrite-Project": settings.APPWRITE_PROJECT_ID,
+            "X-Appwrite-Key": settings.APPWRITE_API_KEY,
+            "Content-Type": "application/json",
+        }
+        self.breaker = CircuitBreaker("appwrite")
+
+    def _documents_url(self, collection_id: str, document_id: Optional[str] = None) -> str:
+        url = f"{self.base_url}/databases/{self.db_id}/collections/{collection_id}/documents"
+        return f"{url}/{document_id}" if document_id else url
+
+    async def _request(self, method: str, url: str, queries: Optional[List[str]] = None, payload: Optional[Dict[str, Any]] = None) -> Any:
+        params = [("queries[]", query) for query in queries or []]
+        if self.http_client is None:
+            async with create_http_client() as client:
+                response = await client.request(method, url, params=params, json=payload, headers=self.headers)
+        else:
+            response = await self.http_client.request(method, url, params=params, json=payload, headers=self.headers)
+        response.raise_for_status()
+        return response.json()
+
+    async def _call(self, operation: str, action: str, default: Any, method: str, url: str, **kwargs: Any) -> Any:
+        # Runs one REST call behind the circuit breaker; errors are logged and turned into `default`
+        with upstream_call("appwrite", operation) as call:
+            if not self.breaker.allow():
+                call["outcome"] = "short_circuit"
+                logger.debug(f"Appwrite: Circuit open, skipped {action}.")
+                return default
+            try:
+                result = await self._request(method, url, **kwargs)
+            except Exception as e:
+                call["outcome"] = "error"
+                self.breaker.record(e)
+                logger.error(f"Appwrite: Error {action}: {e}")
+                return default
+            self.breaker.record_success()
+            return result
+
+    async def get_document(self, collection_id: str, document_id: str, queries: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        return await self._call(
+            "get_document", f"getting document {document_id} from {collection_id}", None,
+            "GET", self._documents_url(collection_id, document_id), queries=queries
+        )
+
+    async def update_document(self, collection_id: str, document_id: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return await self._call(
+            "update_document", f"updating document {document_id} in {collection_id}", None,
+            "PATCH", self._documents_url(collection_id, document_id), payload={"data": data}
+        )
+
+    async def create_document(self, collection_id: str, document_id: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return await self._call(
+            "create_document", f"creating document in {collection_id}", None,
+            "POST", self._documents_url(collection_id), payload={"documentId": document_id, "data": data}
+        )
+
+    async def list_documents(self, collection_id: str, queries: Optional[List[str]] = None) -> Dict[str, Any]:
+        return await self._call(
+            "list_documents", f"listing documents from {collection_id}", {'total': 0, 'documents': []},
+            "GET", self._documents_url(collection_id), queries=queries
+        )
+
+def create_appwrite_service(http_client: Optional[httpx.AsyncClient] = None):
+    # Selects the storage client configured by APPWRITE_CLIENT.
+    if settings.APPWRITE_CLIENT == "http":
+        return AsyncAppwriteService(http_client=http_client)
+    return AppwriteService()
+
+# --- Shared HTTP Client ---
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+def create_http_client() -> httpx.AsyncClient:
+    # Builds the pooled HTTP client shared by every outbound call for the application's lifetime.
+    # Reusing one client keeps connections (DNS, TCP and TLS setup) alive between weather refreshes.
+    http2 = settings.HTTP2_ENABLED
+    if http2:
         try:
-            return self.databases.list_documents(self.db_id, collection_id, queries=queries)
-        except Exception as e:
-            print(f"Appwrite: Error listing documents from {collection_id}: {e}")
-            return {'total': 0, 'documents': []}
+            import h2  # noqa: F401 - only needed to confirm HTTP/2 support is installed
+        except ImportError:
+            logger.info("HTTP client: 'h2' package not installed, falling back to HTTP/1.1.")
+            http2 = False
+
+    limits = httpx.Limits(
+        max_connections=settings.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY
+    )
+    timeout = httpx.Timeout(settings.HTTP_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT)
+    return httpx.AsyncClient(limits=limits, timeout=timeout, http2=http2)
+
+# --- Rate Limiting ---
+class TokenBucket:
+    # Async token bucket: `rate_per_minute` tokens are added per minute, up to `capacity` stored tokens.
+    # A rate of 0 (or less) means unlimited: acquire() never waits.
+    def __init__(self, rate_per_minute: float, capacity: int):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self) -> None:
+        # Waiters are served in arrival order: the lock is held while sleeping for the next token
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+# --- Circuit Breaker ---
+def is_dependency_failure(error: Exception) -> bool:
+    # Client errors (missing document, invalid query, ...) mean the dependency answered; everything else counts
+    status = error.response.status_code if isinstance(error, httpx.HTTPStatusError) else getattr(error, "code", None)
+    return not (isinstance(status, int) and 400 <= status < 500 and status != 429)
+
+class CircuitBreaker:
+    # Per-dependency breaker. Closed: calls go through. After `failure_threshold` consecutive failures it opens and
+    # calls fail fast for `reset_timeout` seconds. Then it is half-open: a few trial calls go through, and the first
+    # outcome closes it again or re-opens it. Thread-safe, since SDK calls run in the thread pool.
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, failure_threshold: Optional[int] = None, reset_timeout: Optional[float] = None, half_open_max_calls: Optional[int] = None):
+        self.name = name
+        self.failure_threshold = failure_threshold or settings.BREAKER_FAILURE_THRESHOLD
+        self.reset_timeout = reset_timeout if reset_timeout is not None else settings.BREAKER_RESET_TIMEOUT_SECONDS
+        self.half_open_max_calls = half_open_max_calls or settings.BREAKER_HALF_OPEN_MAX_CALLS
+        self.state = self.CLOSED
+        self.failures = 0  # Consecutive failures
+        self.rejected = 0  # Calls short-circuited since startup
+        self._opened_at = 0.0
+        self._trials = 0
+        self._trial_started_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            if self.state == self.OPEN:
+                if now - self._opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    return False
+                self.state, self._trials = self.HALF_OPEN, 0
+                logger.info(f"Circuit {self.name}: half-open, trying the dependency again.")
+            if self.state == self.HALF_OPEN:
+                # Trials whose caller never reported back (e.g. cancelled) are forgotten after reset_timeout
+                if self._trials >= self.half_open_max_calls and now - self._trial_started_at < self.reset_timeout:
+                    self.rejected += 1
+                    return False
+                if self._trials >= self.half_open_max_calls:
+                    self._trials = 0
+                self._trials += 1
+                self._trial_started_at = now
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"Circuit {self.name}: closed.")
+            self.state, self.failures = self.CLOSED, 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"Circuit {self.name}: open after {self.failures} failure(s), failing fast for {self.reset_timeout:g}s.")
+                self.state, self._opened_at = self.OPEN, time.monotonic()
+
+    def record(self, error: Exception) -> None:
+        # Records the outcome of a call that raised `error`
+        if is_dependency_failure(error):
+            self.record_failure()
+        else:
+            self.record_success()
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == self.OPEN and time.monotonic() - self._opened_at < self.reset_timeout
+
+    def retry_after(self) -> float:
+        # Seconds until the next trial call is allowed (0 when not open)
+        return max(0.0, self._opened_at + self.reset_timeout - time.monotonic()) if self.is_open else 0.0
 
 # --- OpenWeatherMap Client ---
 class OpenWeatherMapService:
-    def __init__(self):
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None, rate_limiter: Optional[TokenBucket] = None):
         self.api_key = settings.OPENWEATHERMAP_API_KEY
         self.base_url = settings.OPENWEATHERMAP_BASE_URL
+        self.http_client = http_client
+        # Shared quota for every OWM call (scheduled polls, on-demand refreshes and retries)
+        self.rate_limiter = rate_limiter or TokenBucket(
+            settings.OPENWEATHERMAP_CALLS_PER_MINUTE,
+            settings.OPENWEATHERMAP_RATE_LIMIT_BURST
+        )
+        self.max_retries = settings.OPENWEATHERMAP_MAX_RETRIES
+        self.backoff_base = settings.OPENWEATHERMAP_RETRY_BACKOFF_BASE
+        self.backoff_max = settings.OPENWEATHERMAP_RETRY_BACKOFF_MAX
+        self.breaker = CircuitBreaker("openweathermap")
+
+    def _retry_delay(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        # Exponential backoff with full jitter; a Retry-After header from OWM (429) takes precedence if longer.
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, min(float(retry_after), self.backoff_max))
+        return delay
 
     async def get_current_weather(self, lat: float, lon: float, units: str = "metric") -> Optional[Dict[str, Any]]:
+        with upstream_call("openweathermap", "current_weather") as call:
+            if not self.breaker.allow():
+                call["outcome"] = "short_circuit"
+                logger.debug("OpenWeatherMap: Circuit open, skipped current weather request.")
+                return None
+            if self.http_client is None:
+                # Fallback for standalone use (scripts, shell); the application always injects the shared client.
+                async with create_http_client() as client:
+                    data = await self._get_current_weather(client, lat, lon, units)
+            else:
+                data = await self._get_current_weather(self.http_client, lat, lon, units)
+            if data is None:
+                call["outcome"] = "error"
+            return data
+
+    async def _get_current_weather(self, client: httpx.AsyncClient, lat: float, lon: float, units: str) -> Optional[Dict[str, Any]]:
         url = f"{self.base_url}/weather"
         params = {'lat': lat, 'lon': lon, 'appid': self.api_key, 'units': units}
-        async with httpx.AsyncClient() as client:
+        for attempt in range(self.max_retries + 1):
             try:
+                await self.rate_limiter.acquire()
                 response = await client.get(url, params=params)
+                if response.status_code in RETRYABLE_STATUS_CODES and attempt < self.max_retries:
+                    delay = self._retry_delay(attempt, response)
+                    logger.warning(f"OpenWeatherMap: HTTP {response.status_code}, retrying in {delay:.2f}s (attempt {attempt + 1}/{self.max_retries})")
+                    await asyncio.sleep(delay)
+                    continue
                 response.raise_for_status()
-                return response.json()
+                data = response.json()
+                self.breaker.record_success()
+                return data
             except httpx.RequestError as e:
-                print(f"OpenWeatherMap: Error fetching current weather: {e}")
+                if attempt < self.max_retries:
+                    delay = self._retry_delay(attempt)
+                    logger.warning(f"OpenWeatherMap: Error fetching current weather ({e}), retrying in {delay:.2f}s (attempt {attempt + 1}/{self.max_retries})")
+                    await asyncio.sleep(delay)
+                    continue
+                logger.error(f"OpenWeatherMap: Error fetching current weather: {e}")
+                self.breaker.record(e)
                 return None
             except httpx.HTTPStatusError as e:
-                print(f"OpenWeatherMap: HTTP error fetching current weather: {e.response.status_code} - {e.response.text}")
+                logger.error(f"OpenWeatherMap: HTTP error fetching current weather: {e.response.status_code} - {e.response.text}")
+                self.breaker.record(e)
                 return None
+        return None
 
 
 
 # --- Settings Service ---
+APPWRITE_META_KEYS = ['$id', '$sequence', '$collectionId', '$databaseId', '$createdAt', '$updatedAt', '$permissions']
+
 class FarmSettingsService:
-    def __init__(self, appwrite_service: AppwriteService):
+    def __init__(self, appwrite_service: AppwriteService, shared_state: Optional[Any] = None):
         self.appwrite = appwrite_service
         self.collection_id = settings.APPWRITE_COLLECTION_SETTINGS_ID
         self.document_id = settings.APPWRITE_SETTINGS_DOCUMENT_ID
@@ -88,55 +380,376 @@ class FarmSettingsService:
             daily_report=settings.DEFAULT_DAILY_REPORT
         )
 
+        # Write-through cache: filled on read, invalidated and refilled by update_settings
+        self.cache_ttl = settings.SETTINGS_CACHE_TTL_SECONDS
+        self.version_check = settings.SETTINGS_CACHE_VERSION_CHECK
+        self._cached_settings: Optional[FarmSettingsData] = None
+        self._cached_version: Optional[str] = None  # $updatedAt of the cached document
+        self._cache_expires_at = 0.0
+        self._cache_lock = asyncio.Lock()
+        self._change_listeners: List[Callable[[FarmSettingsData], Awaitable[None]]] = []
+        # Optional SharedState (coordination.py): settings loaded or updated by any worker are seen by all of them
+        self.shared_state = shared_state
+        self._shared_generation = 0
+
+    def add_change_listener(self, listener: Callable[[FarmSettingsData], Awaitable[None]]) -> None:
+        # Registers a coroutine called with the new settings after every successful update (e.g. to reschedule polling)
+        self._change_listeners.append(listener)
+
+    def _settings_from_document(self, doc: Dict[str, Any]) -> FarmSettingsData:
+        filtered_doc_data = {k: v for k, v in doc.items() if k not in APPWRITE_META_KEYS}
+        return FarmSettingsData(**filtered_doc_data)
+
+    def _store_in_cache(self, settings_data: FarmSettingsData, version: Optional[str]) -> None:
+        if self.cache_ttl <= 0:
+            return
+        self._cached_settings = settings_data
+        self._cached_version = version
+        self._cache_expires_at = time.monotonic() + self.cache_ttl
+
+    def invalidate_cache(self) -> None:
+        self._cached_settings = None
+        self._cached_version = None
+        self._cache_expires_at = 0.0
+
+    async def _cached_version_is_current(self) -> bool:
+        # Cheap revalidation: fetch only the document version and compare it with the cached one.
+        if not self._cached_version:
+            return False
+        doc = await call_appwrite(
+            self.appwrite.get_document,
+            self.collection_id,
+            self.document_id,
+            [AppwriteQuery.select(["$updatedAt"])]
+        )
+        return bool(doc) and doc.get('$updatedAt') == self._cached_version
+
+    def _share(self, settings_data: FarmSettingsData, version: Optional[str]) -> None:
+        if self.shared_state is not None:
+            self._shared_generation = self.shared_state.publish_settings(settings_data, version) or self._shared_generation
+
+    async def _adopt_shared_settings(self, shared: Any) -> None:
+        # Settings loaded or updated by another worker replace the cached copy without an Appwrite round trip;
+        # a changed document also reaches this worker's change listeners (e.g. the leader's polling schedule)
+        self._shared_generation = shared.generation
+        previous, previous_version = self._cached_settings, self._cached_version
+        self._store_in_cache(shared.settings, shared.version)
+        if previous is not None and shared.version != previous_version and shared.settings != previous:
+            await self._notify_change(shared.settings)
+
+    async def _notify_change(self, updated_settings: FarmSettingsData) -> None:
+        for listener in self._change_listeners:
+            try:
+                await listener(updated_settings)
+            except Exception as e:
+                logger.error(f"Error in settings change listener {getattr(listener, '__qualname__', listener)}: {e}")
+
+    @instrumented("settings_service")
     async def get_settings(self) -> FarmSettingsData:
-        doc = await run_in_threadpool(self.appwrite.get_document, self.collection_id, self.document_id)
+        if self.shared_state is not None:
+            shared = self.shared_state.read_settings()
+            if shared is not None and shared.generation != self._shared_generation:
+                await self._adopt_shared_settings(shared)
+        if self._cached_settings is not None and time.monotonic() < self._cache_expires_at:
+            CACHE_REQUESTS.inc("settings", "hit")
+            return self._cached_settings
+        CACHE_REQUESTS.inc("settings", "miss")
+
+        # Only one caller reloads an expired entry; the others wait and reuse its result.
+        async with self._cache_lock:
+            if self._cached_settings is not None and time.monotonic() < self._cache_expires_at:
+                return self._cached_settings
+
+            if self._cached_settings is not None and self.version_check and await self._cached_version_is_current():
+                self._store_in_cache(self._cached_settings, self._cached_version)
+                return self._cached_settings
+
+            return await self._load_settings()
+
+    async def _load_settings(self) -> FarmSettingsData:
+        doc = await call_appwrite(self.appwrite.get_document, self.collection_id, self.document_id)
         if doc:
-            appwrite_meta_keys = ['$id', '$collectionId', '$databaseId', '$createdAt', '$updatedAt', '$permissions']
-            filtered_doc_data = {k: v for k, v in doc.items() if k not in appwrite_meta_keys}
-            return FarmSettingsData(**filtered_doc_data)
+            settings_data = self._settings_from_document(doc)
+            self._store_in_cache(settings_data, doc.get('$updatedAt'))
+            self._share(settings_data, doc.get('$updatedAt'))
+            return settings_data
 
-        print(f"Settings document {self.document_id} not found, attempting to create with defaults.")
+        logger.info(f"Settings document {self.document_id} not found, attempting to create with defaults.")
         try:
-            created_doc = await run_in_threadpool(
+            created_doc = await call_appwrite(
                 self.appwrite.create_document,
                 self.collection_id,
                 self.document_id,
                 self.default_settings.model_dump()
             )
             if created_doc:
-                print("Created default settings document.")
+                logger.info("Created default settings document.")
+                self._store_in_cache(self.default_settings, created_doc.get('$updatedAt'))
+                self._share(self.default_settings, created_doc.get('$updatedAt'))
                 return self.default_settings
             else:
-                print("Failed to create default settings document. Returning in-memory defaults.")
-                return self.default_settings
+                return self._stale_or_defaults("Failed to create default settings document.")
         except Exception as e:
-            print(f"Error creating default settings: {e}. Returning in-memory defaults.")
-            return self.default_settings
+            return self._stale_or_defaults(f"Error creating default settings: {e}.")
+
+    def _stale_or_defaults(self, reason: str) -> FarmSettingsData:
+        # Stale-if-error: while Appwrite is failing, keep serving the last settings read for another TTL.
+        # In-memory defaults are not cached so the next call retries Appwrite.
+        if self._cached_settings is not None:
+            logger.info(f"{reason} Serving cached settings.")
+            self._store_in_cache(self._cached_settings, self._cached_version)
+            return self._cached_settings
+        logger.info(f"{reason} Returning in-memory defaults.")
+        return self.default_settings
 
 
+    @instrumented("settings_service")
     async def update_settings(self, settings_data: FarmSettingsData) -> Optional[FarmSettingsData]:
-        updated_doc = await run_in_threadpool(
+        # Drop the cached copy first so no reader sees the old settings once the write has gone out
+        self.invalidate_cache()
+        updated_doc = await call_appwrite(
             self.appwrite.update_document,
             self.collection_id,
             self.document_id,
             settings_data.model_dump()
         )
         if updated_doc:
-            appwrite_meta_keys = ['$id', '$collectionId', '$databaseId', '$createdAt', '$updatedAt', '$permissions']
-            filtered_doc_data = {k: v for k, v in updated_doc.items() if k not in appwrite_meta_keys}
-            return FarmSettingsData(**filtered_doc_data)
+            updated_settings = self._settings_from_document(updated_doc)
+            self._store_in_cache(updated_settings, updated_doc.get('$updatedAt'))
+            self._share(updated_settings, updated_doc.get('$updatedAt'))
+            await self._notify_change(updated_settings)
+            return updated_settings
         return None
 
+# --- Locations Service ---
+class FarmLocationService:
+    # Lists every location to poll: the primary farm from the settings document plus the optional locations collection.
+    PAGE_SIZE = 100
+
+    def __init__(self, appwrite_service: AppwriteService, settings_service: FarmSettingsService):
+        self.appwrite = appwrite_service
+        self.settings_service = settings_service
+        self.collection_id = settings.APPWRITE_LOCATIONS_COLLECTION_ID
+
+    async def get_primary_location(self) -> FarmLocation:
+        current_settings = await self.settings_service.get_settings()
+        return FarmLocation(
+            id=PRIMARY_LOCATION_ID,
+            name="Primary farm",
+            latitude=current_settings.farm_latitude,
+            longitude=current_settings.farm_longitude
+        )
+
+    async def list_locations(self) -> List[FarmLocation]:
+        locations = [await self.get_primary_location()]
+        if not self.collection_id:
+            return locations
+
+        cursor: Optional[str] = None
+        while True:
+            queries = [AppwriteQuery.order_asc("$id"), AppwriteQuery.limit(self.PAGE_SIZE)]
+            if cursor:
+                queries.append(AppwriteQuery.cursor_after(cursor))
+            page = await call_appwrite(self.appwrite.list_documents, self.collection_id, queries)
+            page_docs = page.get('documents', []) if page else []
+            for doc in page_docs:
+                try:
+                    locations.append(FarmLocation.model_validate(doc))
+                except ValueError as e:
+                    logger.warning(f"Skipping invalid location document {doc.get('$id')}: {e}")
+            if len(page_docs) < self.PAGE_SIZE:
+                return locations
+            cursor = page_docs[-1]['$id']
+
+# --- Recommendation Index ---
+HARDCODED_RECOMMENDATIONS: Dict[str, List[str]] = {
+    "cold": ["Cold weather: Consider protecting sensitive plants."],
+    "hot": ["Hot weather: Increase watering frequency."],
+    "dry": ["Low humidity: Monitor soil moisture."],
+    "humid": ["High humidity: Watch for fungal diseases."],
+    "windy": ["Strong winds: Check plant support systems."],
+    "normal": ["Weather conditions are optimal."]
+}
+
+class RecommendationIndex:
+    # Keeps the whole recommendations collection in memory, keyed by condition value.
+    # Lookups never touch Appwrite; refresh() rebuilds the index and swaps it in with a single assignment.
+    PAGE_SIZE = 100
+
+    def __init__(self, appwrite_service: AppwriteService):
+        self.appwrite = appwrite_service
+        self.collection_id = settings.APPWRITE_RECOMMENDATIONS_COLLECTION_ID
+        self.per_condition = settings.RECOMMENDATIONS_PER_CONDITION
+        self._index: Dict[str, List[str]] = dict(HARDCODED_RECOMMENDATIONS)
+        self._refresh_lock = asyncio.Lock()
+
+    def get(self, condition: str) -> List[str]:
+        return list(self._index.get(condition, []))
+
+    async def _load_documents(self) -> List[Dict[str, Any]]:
+        documents: List[Dict[str, Any]] = []
+        cursor: Optional[str] = None
+        while True:
+            queries = [AppwriteQuery.order_asc("$id"), AppwriteQuery.limit(self.PAGE_SIZE)]
+            if cursor:
+                queries.append(AppwriteQuery.cursor_after(cursor))
+            page = await call_appwrite(self.appwrite.list_documents, self.collection_id, queries)
+            page_docs = page.get('documents', []) if page else []
+            documents.extend(page_docs)
+            if len(page_docs) < self.PAGE_SIZE:
+                return documents
+            cursor = page_docs[-1]['$id']
+
+    async def refresh(self) -> None:
+        # Conditions without Appwrite entries (or an unreachable/empty collection) fall back to the built-in texts.
+        if not self.collection_id:
+            return
+        async with self._refresh_lock:
+            try:
+                documents = await self._load_documents()
+            except Exception as e:
+                logger.info(f"Could not load recommendations from Appwrite, keeping current index: {e}")
+                return
+
+            from_appwrite: Dict[str, List[str]] = {}
+            for doc in documents:
+                condition = doc.get('condition_value')
+                text = doc.get('recommendation_text')
+                if condition and text and len(from_appwrite.setdefault(condition, [])) < self.per_condition:
+                    from_appwrite[condition].append(text)
+
+            self._index = {**HARDCODED_RECOMMENDATIONS, **from_appwrite}
+            logger.info(f"Recommendation index refreshed: {len(documents)} documents, {len(from_appwrite)} conditions from Appwrite.")
+
+# --- Single-Flight Coalescing ---
+T = TypeVar("T")
+
+class SingleFlight:
+    # Coalesces concurrent calls sharing a key into one in-flight task; every caller awaits the same result.
+    def __init__(self):
+        self._inflight: Dict[str, "asyncio.Task[Any]"] = {}
+
+    def _forget(self, key: str, task: "asyncio.Task[Any]") -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    async def do(self, key: str, func: Callable[[], Awaitable[T]]) -> T:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done, key=key: self._forget(key, done))
+        # Shield so a cancelled waiter (e.g. a disconnected client) does not cancel the refresh for the others
+        return await asyncio.shield(task)
+
+# --- Weather Conditions ---
+CONDITIONS = ("cold", "hot", "dry", "humid", "windy", "normal")
+
+def condition_value(temp: float, humidity: float, wind_speed: float) -> str:
+    # Condition category used for recommendations and daily reports
+    if temp < 10: return "cold"
+    if temp > 30: return "hot"
+    if humidity < 30: return "dry"
+    if humidity > 80: return "humid"
+    if wind_speed > 10: return "windy"
+    return "normal"
+
+# --- Weather Snapshot ---
+def observed_epoch(response: WeatherResponse) -> float:
+    # Epoch seconds when the observation was recorded (now, if the record carries no time)
+    recorded = response.weather.created_at or response.weather.timestamp
+    if recorded is None:
+        return time.time()
+    return (recorded if recorded.tzinfo else recorded.replace(tzinfo=timezone.utc)).timestamp()
+
+@dataclass(frozen=True)
+class WeatherSnapshot:
+    # Immutable, pre-serialized WeatherResponse for the current farm location.
+    # Published after every successful update so /api/weather/current can be served without touching Appwrite.
+    body: bytes  # JSON body exactly as the endpoint returns it
+    etag: str  # Strong ETag derived from the body
+    lat: float
+    lon: float
+    observed_at: float  # Epoch seconds when the observation was recorded
+
+    @classmethod
+    def from_response(cls, result: Dict[str, Any], lat: float, lon: float) -> "WeatherSnapshot":
+        response = WeatherResponse.model_validate(result)
+        body = response.model_dump_json(by_alias=True).encode()
+        observed_at = observed_epoch(response)
+        etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        return cls(body=body, etag=etag, lat=lat, lon=lon, observed_at=observed_at)
+
+    def save(self, path: str) -> None:
+        # Written to a temporary file and renamed, so a crash never leaves a truncated snapshot behind
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"lat": self.lat, "lon": self.lon, "observed_at": self.observed_at, "body": self.body.decode()}, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["WeatherSnapshot"]:
+        try:
+            with open(path, encoding="utf-8") as f:
+                stored = json.load(f)
+            body = stored["body"].encode()
+            WeatherResponse.model_validate_json(body)  # Refuse snapshots written by an incompatible version
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable weather snapshot {path}: {e}")
+            return None
+        etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        return cls(body=body, etag=etag, lat=stored["lat"], lon=stored["lon"], observed_at=stored["observed_at"])
+
 # --- Weather Service ---
 class WeatherService:
-    def __init__(self, appwrite_service: AppwriteService, owm_service: OpenWeatherMapService, settings_service: FarmSettingsService):
+    def __init__(
+        self,
+        appwrite_service: AppwriteService,
+        owm_service: OpenWeatherMapService,
+        settings_service: FarmSettingsService,
+        recommendation_index: Optional[RecommendationIndex] = None,
+        write_buffer: Optional[Any] = None,
+        broadcaster: Optional[Any] = None,
+        shared_state: Optional[Any] = None
+    ):
         self.appwrite = appwrite_service
         self.owm = owm_service
         self.settings_service = settings_service
-        self.weather_collection_id = settings.APPWRITE_COLLECTION_ID
-        self.reco_collection_id = settings.APPWRITE_RECOMMENDATIONS_COLLECTION_ID
+        # v2 stores typed observations in their own collection, ordered by the indexed OWM observation time
+        self.schema_version = settings.WEATHER_SCHEMA_VERSION
+        if self.schema_version == 2:
+            self.weather_collection_id = settings.APPWRITE_OBSERVATIONS_COLLECTION_ID
+            self.order_attribute = "dt"
+        else:
+            self.weather_collection_id = settings.APPWRITE_COLLECTION_ID
+            self.order_attribute = "$createdAt"
+        # Without a preloaded index, recommendations come from the built-in texts until refresh() is called
+        self.recommendations = recommendation_index or RecommendationIndex(appwrite_service)
+        self.snapshot: Optional[WeatherSnapshot] = None  # Latest published WeatherResponse, replaced atomically
+        self.snapshot_path = settings.SNAPSHOT_PATH  # Optional local copy of the snapshot, reloaded on startup
+        # Optional ObservationBuffer (write_buffer.py): observations are acknowledged locally and flushed in the background
+        self.write_buffer = write_buffer if write_buffer is not None and write_buffer.enabled else None
+        self.broadcaster = broadcaster  # Optional Broadcaster (broadcast.py) fanning new observations out to stream clients
+        # Optional SharedState (coordination.py): the newest snapshot of any worker is served by all of them
+        self.shared_state = shared_state
+        self.follower = False  # Coordination mode: another worker holds the leader lease and polls OWM
+        self._refresh_flight = SingleFlight()  # One OWM fetch + Appwrite write per location at a time
+        # Optional geohash cells (GEO_CELL_PRECISION): locations in one cell share OWM calls and cached responses
+        self.cells = CellCache() if settings.GEO_CELL_PRECISION > 0 else None
+        self._cell_flight = SingleFlight()  # One OWM fetch per cell at a time
+        self._background_refresh: Optional[asyncio.Task] = None  # Stale-while-revalidate refresh of the primary location
+        # Last stored observation per location, used to skip duplicates (DEDUPE_OBSERVATIONS). Seeded lazily from the
+        # newest stored document of each location (None when there is none), so a restart does not store a copy of it.
+        self.dedupe = settings.DEDUPE_OBSERVATIONS
+        self.dedupe_tolerances = settings.DEDUPE_TOLERANCES
+        self._last_stored: Dict[str, Optional[Tuple[WeatherObservation, Dict[str, Any]]]] = {}
+        self._observation_listeners: List[Callable[[WeatherObservation], Awaitable[None]]] = []
+        self._listener_tasks: set = set()  # Keeps references to running listener tasks
 
-    def _transform_weather_data(self, raw_data: Dict[str, Any], lat: float, lon: float) -> Optional[WeatherData]:
+    def _transform_weather_data(self, raw_data: Dict[str, Any], lat: float, lon: float, location_id: Optional[str] = None) -> Optional[WeatherData]:
         if not raw_data: return None
         try:
             main = raw_data.get('main', {})
@@ -160,19 +773,144 @@ class WeatherService:
                 visibility=str(raw_data.get('visibility', '0')),
                 location=location.model_dump_json(),
                 sun=sun_data.model_dump_json(),
-                timestamp=datetime.utcnow()
+                location_id=location_id,
+                timestamp=datetime.now(timezone.utc)
+            )
+        except Exception as e:
+            logger.error(f"Error transforming weather data: {e}")
+            return None
+
+    def _build_observation(self, raw_data: Dict[str, Any], lat: float, lon: float, location_id: Optional[str] = None) -> Optional[WeatherObservation]:
+        # v2 counterpart of _transform_weather_data: keeps OWM numbers as numbers
+        if not raw_data: return None
+        try:
+            main = raw_data.get('main', {})
+            wind = raw_data.get('wind', {})
+            weather_info = raw_data.get('weather', [{}])[0]
+            sys_info = raw_data.get('sys', {})
+            fetched_at = datetime.now(timezone.utc)
+
+            return WeatherObservation(
+                temperature=main.get('temp', 0),
+                feels_like=main.get('feels_like', 0),
+                humidity=main.get('humidity', 0),
+                pressure=main.get('pressure', 0),
+                wind_speed=wind.get('speed', 0),
+                wind_gust=wind.get('gust'),
+                wind_direction=wind.get('deg'),
+                visibility=raw_data.get('visibility'),
+                description=weather_info.get('description', ''),
+                icon=weather_info.get('icon', ''),
+                lat=lat,
+                lon=lon,
+                location_name=raw_data.get('name', 'Unknown'),
+                location_id=location_id,
+                dt=raw_data.get('dt') or int(fetched_at.timestamp()),
+                sunrise=sys_info.get('sunrise'),
+                sunset=sys_info.get('sunset'),
+                timestamp=fetched_at,
+                rain_1h=raw_data.get('rain', {}).get('1h')
             )
         except Exception as e:
-            print(f"Error transforming weather data: {e}")
+            logger.error(f"Error transforming weather data: {e}")
             return None
 
+    def _encode_for_storage(self, observation: WeatherObservation, raw_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        # Builds the Appwrite document for the configured schema version
+        if self.schema_version == 2:
+            return observation.to_storage()
+        transformed_weather = self._transform_weather_data(raw_data, observation.lat, observation.lon, observation.location_id)
+        return transformed_weather.model_dump(mode='json', exclude_none=True) if transformed_weather else None
+
+    def decode_observation(self, doc: Dict[str, Any]) -> WeatherObservation:
+        # Typed view of a stored document, whichever schema it was stored with
+        if self.schema_version == 2:
+            return WeatherObservation.model_validate(doc)
+        return WeatherObservation.from_legacy_document(doc)
+
+    def decode_document(self, doc: Dict[str, Any], model: Type[WeatherData] = WeatherData) -> WeatherData:
+        # Converts a stored document into the v1 response shape, whichever schema it was stored with
+        if self.schema_version == 2:
+            return model.model_validate(WeatherObservation.model_validate(doc).to_legacy_fields())
+        return model.model_validate(doc)
+
+    def _document_coordinates(self, doc: Dict[str, Any]) -> Tuple[float, float]:
+        if self.schema_version == 2:
+            return float(doc['lat']), float(doc['lon'])
+        location = json.loads(doc.get('location', '{}'))
+        return float(location.get('lat', 0.0)), float(location.get('lon', 0.0))
+
+    def _range_value(self, moment: datetime) -> Any:
+        # Bound for range queries on the ordering attribute ($createdAt ISO string or dt epoch seconds)
+        if self.schema_version == 2:
+            return int((moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)).timestamp())
+        return moment.isoformat()
+
+    DEDUPE_FIELDS = ("temperature", "feels_like", "humidity", "pressure", "wind_speed", "wind_gust", "wind_direction", "visibility")
+
+    def _is_duplicate(self, previous: WeatherObservation, current: WeatherObservation) -> bool:
+        # Same OWM observation time means OWM has not refreshed the station yet. With tolerances configured,
+        # a newer observation whose values all stay within tolerance is treated as unchanged as well.
+        if not (math.isclose(previous.lat, current.lat) and math.isclose(previous.lon, current.lon)):
+            return False
+        if previous.dt == current.dt:
+            return True
+        if not self.dedupe_tolerances or previous.description != current.description:
+            return False
+        for field in self.DEDUPE_FIELDS:
+            old, new = getattr(previous, field), getattr(current, field)
+            if old is None or new is None:
+                if old is not new:
+                    return False
+            elif abs(new - old) > self.dedupe_tolerances.get(field, 0.0):
+                return False
+        return True
+
+    def _latest_document_queries(self, location_id: Optional[str] = None) -> List[str]:
+        queries = [AppwriteQuery.order_desc(self.order_attribute), AppwriteQuery.limit(1)]
+        if location_id is not None:
+            queries.append(AppwriteQuery.equal("location_id", location_id))
+        elif settings.APPWRITE_LOCATIONS_COLLECTION_ID:
+            # With several monitored locations, only untagged documents belong to the primary farm
+            queries.append(AppwriteQuery.is_null("location_id"))
+        return queries
+
+    async def _get_last_stored(self, location_key: str, location_id: Optional[str]) -> Optional[Tuple[WeatherObservation, Dict[str, Any]]]:
+        if location_key not in self._last_stored:
+            result = await call_appwrite(
+                self.appwrite.list_documents, self.weather_collection_id, self._latest_document_queries(location_id)
+            )
+            documents = (result or {}).get('documents') or []
+            try:
+                self._last_stored[location_key] = (self.decode_observation(documents[0]), documents[0]) if documents else None
+            except (json.JSONDecodeError, AttributeError, KeyError, TypeError, ValueError) as e:
+                logger.warning(f"Could not read the latest stored observation of {location_key} ({e}); not deduplicating against it.")
+                self._last_stored[location_key] = None
+        return self._last_stored[location_key]
+
+    async def _extend_last_seen(self, location_key: str, previous_doc: Dict[str, Any]) -> Dict[str, Any]:
+        # Records that the stored observation is still current instead of inserting a copy of it
+        last_seen = datetime.now(timezone.utc).isoformat()
+        updated = None
+        if self.write_buffer is not None:
+            # The document may still be waiting in the buffer, so the update is queued behind its create
+            await self.write_buffer.enqueue_update(self.weather_collection_id, previous_doc['$id'], {'last_seen': last_seen})
+        else:
+            updated = await call_appwrite(
+                self.appwrite.update_document,
+                self.weather_collection_id,
+                previous_doc['$id'],
+                {'last_seen': last_seen}
+            )
+            if not updated:
+                logger.warning(f"Could not update last_seen of weather document {previous_doc['$id']}.")
+        doc = updated or {**previous_doc, 'last_seen': last_seen}
+        observation, _ = self._last_stored[location_key]
+        self._last_stored[location_key] = (observation, doc)
+        return doc
+
     def _get_condition_value(self, temp: float, humidity: float, wind_speed: float) -> str:
-        if temp < 10: return "cold"
-        if temp > 30: return "hot"
-        if humidity < 30: return "dry"
-        if humidity > 80: return "humid"
-        if wind_speed > 10: return "windy"
-        return "normal"
+        return condition_value(temp, humidity, wind_speed)
 
     async def _get_recommendations(self, weather_for_reco: Dict[str, Any]) -> List[str]:
         temp = float(weather_for_reco.get('main', {}).get('temp', 0))
@@ -180,87 +918,227 @@ class WeatherService:
         wind_speed = float(weather_for_reco.get('wind', {}).get('speed', 0))
         
         condition = self._get_condition_value(temp, humidity, wind_speed)
-        
-        if settings.APPWRITE_RECOMMENDATIONS_COLLECTION_ID:
-            try:
-                queries = [AppwriteQuery.equal("condition_value", condition), AppwriteQuery.limit(5)]
-                reco_docs_result = await run_in_threadpool(
-                    self.appwrite.list_documents,
-                    self.reco_collection_id,
-                    queries
-                )
-                if reco_docs_result and reco_docs_result['total'] > 0:
-                    return [doc['recommendation_text'] for doc in reco_docs_result['documents'] if 'recommendation_text' in doc]
-            except Exception as e:
-                print(f"Could not fetch recommendations from Appwrite for condition '{condition}': {e}")
-
-        hardcoded_recommendations = {
-            "cold": ["Cold weather: Consider protecting sensitive plants."],
-            "hot": ["Hot weather: Increase watering frequency."],
-            "dry": ["Low humidity: Monitor soil moisture."],
-            "humid": ["High humidity: Watch for fungal diseases."],
-            "windy": ["Strong winds: Check plant support systems."],
-            "normal": ["Weather conditions are optimal."]
-        }
-        return hardcoded_recommendations.get(condition, [])
+        return self.recommendations.get(condition)
+
+    def add_observation_listener(self, listener: Callable[[WeatherObservation], Awaitable[None]]) -> None:
+        # Registers a coroutine called with every newly persisted observation (rollups, alerts, reports, ...)
+        self._observation_listeners.append(listener)
+
+    def _notify_observation(self, observation: WeatherObservation) -> None:
+        # Listeners run in the background so they never delay the response of the refresh that produced the data
+        for listener in self._observation_listeners:
+            task = asyncio.ensure_future(self._run_listener(listener, observation))
+            self._listener_tasks.add(task)
+            task.add_done_callback(self._listener_tasks.discard)
+
+    async def _run_listener(self, listener: Callable[[WeatherObservation], Awaitable[None]], observation: WeatherObservation) -> None:
+        try:
+            await listener(observation)
+        except Exception as e:
+            logger.error(f"Error in observation listener {getattr(listener, '__qualname__', listener)}: {e}")
+
+    def _broadcast(self, channel: str, result: Dict[str, Any]) -> None:
+        # Serializes the response once for all stream subscribers (the primary farm reuses the snapshot bytes)
+        if self.broadcaster is None:
+            return
+        try:
+            if channel == PRIMARY_LOCATION_ID and self.snapshot is not None:
+                payload, observed_at = self.snapshot.body, self.snapshot.observed_at
+            else:
+                response = WeatherResponse.model_validate(result)
+                payload, observed_at = response.model_dump_json(by_alias=True).encode(), observed_epoch(response)
+            self.broadcaster.publish(channel, payload, observed_at)
+        except Exception as e:
+            logger.error(f"Error broadcasting weather update: {e}")
+
+    def _publish_snapshot(self, result: Dict[str, Any], lat: float, lon: float) -> None:
+        try:
+            self.snapshot = WeatherSnapshot.from_response(result, lat, lon)
+            if self.snapshot_path:
+                self.snapshot.save(self.snapshot_path)
+            if self.shared_state is not None:
+                self.shared_state.publish_snapshot(self.snapshot)
+        except Exception as e:
+            logger.error(f"Error publishing weather snapshot: {e}")
+
+    def restore_snapshot(self) -> bool:
+        # Startup: serves the snapshot left by the previous process until fresh data arrives (local disk only)
+        if not self.snapshot_path or self.snapshot is not None:
+            return False
+        self.snapshot = WeatherSnapshot.load(self.snapshot_path)
+        return self.snapshot is not None
+
+    def adopt_shared_snapshot(self) -> bool:
+        # Coordination mode: takes over a newer snapshot published by another worker and pushes it to this worker's
+        # stream clients (primary farm channel only; other locations are streamed by the leader's clients)
+        shared = self.shared_state.read_snapshot() if self.shared_state is not None else None
+        if shared is None or shared is self.snapshot or (self.snapshot is not None and shared.observed_at <= self.snapshot.observed_at):
+            return False
+        self.snapshot = shared
+        if self.broadcaster is not None:
+            self.broadcaster.publish(PRIMARY_LOCATION_ID, shared.body, shared.observed_at)
+        return True
 
-    async def update_weather_data(self) -> Optional[Dict[str, Any]]:
+    async def warm_cache(self) -> bool:
+        # Publishes the last persisted observation when nothing was restored locally; returns whether a snapshot exists
+        if self.snapshot is None:
+            await self.get_latest_weather()
+        return self.snapshot is not None
+
+    @instrumented("weather_service")
+    async def get_current_snapshot(self) -> Optional[WeatherSnapshot]:
+        # Returns the published snapshot if it still belongs to the configured farm location.
+        self.adopt_shared_snapshot()
+        snapshot = self.snapshot
+        if snapshot is None:
+            return None
         current_settings = await self.settings_service.get_settings()
-        lat = current_settings.farm_latitude
-        lon = current_settings.farm_longitude
-        
-        raw_weather = await self.owm.get_current_weather(lat, lon, current_settings.units)
-        if not raw_weather:
-            print("Failed to fetch raw weather from OWM.")
+        if not self._same_place(snapshot.lat, snapshot.lon, current_settings.farm_latitude, current_settings.farm_longitude):
             return None
+        return snapshot
+
+    async def wait_for_shared_snapshot(self, timeout: float) -> Optional[WeatherSnapshot]:
+        # Followers: polls the shared state for the leader's snapshot for up to `timeout` seconds
+        deadline = time.monotonic() + timeout
+        while True:
+            snapshot = await self.get_current_snapshot()
+            remaining = deadline - time.monotonic()
+            if snapshot is not None or remaining <= 0:
+                return snapshot
+            await asyncio.sleep(min(0.1, remaining))
+
+    @property
+    def breakers(self) -> Dict[str, "CircuitBreaker"]:
+        # Circuit breakers of the upstream dependencies (services without one, e.g. test fakes, are left out)
+        dependencies = {"openweathermap": self.owm, "appwrite": self.appwrite}
+        return {name: service.breaker for name, service in dependencies.items() if isinstance(getattr(service, "breaker", None), CircuitBreaker)}
 
-        transformed_weather = self._transform_weather_data(raw_weather, lat, lon)
-        if not transformed_weather:
-            print("Failed to transform weather data.")
+    def degraded_retry_after(self) -> float:
+        # Seconds until every open breaker allows a trial call again (0 when all are closed)
+        return max((breaker.retry_after() for breaker in self.breakers.values()), default=0.0)
+
+    def refresh_in_background(self) -> None:
+        # Stale-while-revalidate: the caller is answered with the stale snapshot, at most one refresh runs at a time.
+        # Nothing is started while a circuit is open; the next request after it half-opens triggers the trial.
+        # Followers leave refreshes to the leader, whose new snapshot reaches them through the shared state.
+        if self.follower or self.degraded_retry_after() > 0:
+            return
+        if self._background_refresh is None or self._background_refresh.done():
+            self._background_refresh = asyncio.create_task(self._refresh_quietly())
+
+    async def _refresh_quietly(self) -> None:
+        try:
+            await self.update_weather_data()
+        except Exception as e:
+            logger.error(f"Error refreshing weather in the background: {e}")
+
+    def _same_place(self, lat1: float, lon1: float, lat2: float, lon2: float) -> bool:
+        # With geohash cells, any coordinates in the same cell get the same weather; otherwise they must match exactly
+        if self.cells is not None:
+            return self.cells.same_cell(lat1, lon1, lat2, lon2)
+        return math.isclose(lat1, lat2) and math.isclose(lon1, lon2)
+
+    async def _get_raw_weather(self, lat: float, lon: float, units: str) -> Optional[Dict[str, Any]]:
+        if self.cells is None:
+            return await self.owm.get_current_weather(lat, lon, units)
+        cached = self.cells.lookup(lat, lon, units)
+        if cached is not None:
+            return cached.data
+        cell = self.cells.cell_for(lat, lon)
+        return await self._cell_flight.do(f"{cell}:{units}", lambda: self._fetch_cell(cell, units))
+
+    async def _fetch_cell(self, cell: str, units: str) -> Optional[Dict[str, Any]]:
+        # Fetched for the cell centre, so every location in the cell gets the same response
+        entry_lat, entry_lon = cell_center(cell)
+        raw_weather = await self.owm.get_current_weather(entry_lat, entry_lon, units)
+        if raw_weather:
+            self.cells.put(cell, units, raw_weather)
+        return raw_weather
+
+    @instrumented("weather_service")
+    async def update_weather_data(self, location: Optional[FarmLocation] = None) -> Optional[Dict[str, Any]]:
+        # Shared by the scheduler and on-demand refreshes: concurrent calls for the same location are coalesced,
+        # so a burst of requests results in a single OWM call and a single stored document.
+        # Without a location (or with the primary one) the farm location from the settings is used.
+        current_settings = await self.settings_service.get_settings()
+        units = current_settings.units
+        if location is None or location.id == PRIMARY_LOCATION_ID:
+            lat, lon, location_id = current_settings.farm_latitude, current_settings.farm_longitude, None
+        else:
+            lat, lon, location_id = location.latitude, location.longitude, location.id
+        key = f"{location_id or PRIMARY_LOCATION_ID}:{lat:.6f},{lon:.6f},{units}"
+        return await self._refresh_flight.do(key, lambda: self._fetch_and_store_weather(lat, lon, units, location_id))
+
+    @instrumented("weather_service")
+    async def _fetch_and_store_weather(self, lat: float, lon: float, units: str, location_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        raw_weather = await self._get_raw_weather(lat, lon, units)
+        if not raw_weather:
+            logger.warning("Failed to fetch raw weather from OWM.")
             return None
 
-        data_for_appwrite = transformed_weather.model_dump(mode='json', exclude_none=True)
+        observation = self._build_observation(raw_weather, lat, lon, location_id)
+        data_for_appwrite = self._encode_for_storage(observation, raw_weather) if observation else None
+        if not data_for_appwrite:
+            logger.warning("Failed to transform weather data.")
+            return None
 
-        saved_doc = await run_in_threadpool(
-            self.appwrite.create_document,
-            self.weather_collection_id,
-            AppwriteID.unique(),
-            data_for_appwrite
-        )
+        location_key = location_id or PRIMARY_LOCATION_ID
+        previous = await self._get_last_stored(location_key, location_id) if self.dedupe else None
+        if previous is not None and self._is_duplicate(previous[0], observation):
+            saved_doc = await self._extend_last_seen(location_key, previous[1])
+            is_new = False
+        elif self.write_buffer is not None:
+            saved_doc = await self.write_buffer.enqueue(self.weather_collection_id, data_for_appwrite)
+            is_new = True
+        else:
+            saved_doc = await call_appwrite(
+                self.appwrite.create_document,
+                self.weather_collection_id,
+                AppwriteID.unique(),
+                data_for_appwrite
+            )
+            is_new = True
 
         if not saved_doc:
-            print("Failed to save weather data to Appwrite.")
+            logger.warning("Failed to save weather data to Appwrite.")
             return None
         
         recommendations = await self._get_recommendations(raw_weather)
-        weather_data_for_response = WeatherData.model_validate(saved_doc)
+        weather_data_for_response = self.decode_document(saved_doc)
+        result = {"weather": weather_data_for_response, "recommendations": recommendations}
+        if location_id is None:
+            # Only the primary farm location is served by /api/weather/current
+            self._publish_snapshot(result, lat, lon)
 
-        return {"weather": weather_data_for_response, "recommendations": recommendations}
+        if is_new:
+            if self.dedupe:
+                self._last_stored[location_key] = (observation, saved_doc)
+            self._notify_observation(observation.model_copy(update={'id': saved_doc.get('$id')}))
+            self._broadcast(location_key, result)
+        return result
 
 
+    @instrumented("weather_service")
     async def get_latest_weather(self) -> Optional[Dict[str, Any]]:
         current_settings = await self.settings_service.get_settings()
-        queries = [AppwriteQuery.order_desc("$createdAt"), AppwriteQuery.limit(1)]
-        latest_docs_result = await run_in_threadpool(self.appwrite.list_documents, self.weather_collection_id, queries)
+        latest_docs_result = await call_appwrite(self.appwrite.list_documents, self.weather_collection_id, self._latest_document_queries())
         
         if latest_docs_result and latest_docs_result['total'] > 0:
             latest_weather_doc = latest_docs_result['documents'][0]
 
             # Verifica se a localização no registro mais recente corresponde às configurações atuais.
             try:
-                location_from_db_str = latest_weather_doc.get('location', '{}')
-                location_from_db = json.loads(location_from_db_str)
-                db_lat = float(location_from_db.get('lat', 0.0))
-                db_lon = float(location_from_db.get('lon', 0.0))
+                db_lat, db_lon = self._document_coordinates(latest_weather_doc)
 
                 # Se a localização não corresponder, retorna None para forçar o roteador a buscar dados novos.
-                if not math.isclose(db_lat, current_settings.farm_latitude) or \
-                   not math.isclose(db_lon, current_settings.farm_longitude):
-                    print("Location in DB is stale. Settings have been updated. Forcing refresh.")
+                if not self._same_place(db_lat, db_lon, current_settings.farm_latitude, current_settings.farm_longitude):
+                    logger.warning("Location in DB is stale. Settings have been updated. Forcing refresh.")
+                    LATEST_WEATHER_REFRESHES.inc("location_changed")
                     return None
-            except (json.JSONDecodeError, AttributeError, TypeError, ValueError) as e:
+            except (json.JSONDecodeError, AttributeError, KeyError, TypeError, ValueError) as e:
                 # Se não for possível analisar ou comparar, é mais seguro forçar a atualização.
-                print(f"Error comparing locations ({e}), forcing refresh.")
+                logger.error(f"Error comparing locations ({e}), forcing refresh.")
+                LATEST_WEATHER_REFRESHES.inc("unreadable")
                 return None
             
             # Se as localizações corresponderem, prossiga para construir a resposta com os dados em cache.
@@ -275,21 +1153,79 @@ class WeatherService:
             }
             recommendations = await self._get_recommendations(raw_data_for_reco)
             
-            weather_data_model = WeatherData.model_validate(latest_weather_doc)
-            return {"weather": weather_data_model, "recommendations": recommendations}
+            weather_data_model = self.decode_document(latest_weather_doc)
+            result = {"weather": weather_data_model, "recommendations": recommendations}
+            self._publish_snapshot(result, current_settings.farm_latitude, current_settings.farm_longitude)
+            return result
 
-        print("No latest weather found in Appwrite.")
+        logger.info("No latest weather found in Appwrite.")
         return None
 
-    async def get_weather_history(self, limit: int = 10, offset: int = 0) -> Dict[str, Any]:
+    @instrumented("weather_service")
+    async def get_weather_history(self, limit: int = 10, offset: int = 0, cursor: Optional[str] = None) -> Dict[str, Any]:
+        # Keyset pagination: with a cursor the page starts right after the referenced document (offset is ignored),
+        # so deep pages cost the same as the first one. Offset paging is kept for existing clients.
         queries = [
-            AppwriteQuery.order_desc("$createdAt"),
-            AppwriteQuery.limit(limit),
-            AppwriteQuery.offset(offset)
+            AppwriteQuery.order_desc(self.order_attribute),
+            AppwriteQuery.limit(limit)
         ]
-        history_docs_result = await run_in_threadpool(self.appwrite.list_documents, self.weather_collection_id, queries)
-        
-        return history_docs_result
+        if cursor:
+            queries.append(AppwriteQuery.cursor_after(decode_history_cursor(cursor)))
+        else:
+            queries.append(AppwriteQuery.offset(offset))
+        history_docs_result = await call_appwrite(self.appwrite.list_documents, self.weather_collection_id, queries)
+
+        documents = history_docs_result.get('documents', []) if history_docs_result else []
+        next_cursor = encode_history_cursor(documents[-1]['$id']) if len(documents) == limit else None
+        return {**(history_docs_result or {'total': 0, 'documents': []}), 'next_cursor': next_cursor}
+
+    async def iter_weather_history(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        page_size: int = 100
+    ) -> AsyncIterator[Dict[str, Any]]:
+        # Yields every stored observation in [start, end] in chronological order, one page in memory at a time.
+        base_queries = [AppwriteQuery.order_asc(self.order_attribute), AppwriteQuery.limit(page_size)]
+        if start:
+            base_queries.append(AppwriteQuery.greater_than_equal(self.order_attribute, self._range_value(start)))
+        if end:
+            base_queries.append(AppwriteQuery.less_than_equal(self.order_attribute, self._range_value(end)))
+
+        last_id: Optional[str] = None
+        while True:
+            queries = base_queries + ([AppwriteQuery.cursor_after(last_id)] if last_id else [])
+            page = await call_appwrite(self.appwrite.list_documents, self.weather_collection_id, queries)
+            documents = page.get('documents', []) if page else []
+            for doc in documents:
+                yield doc
+            if len(documents) < page_size:
+                return
+            last_id = documents[-1]['$id']
+
+# --- History Cursors ---
+def encode_history_cursor(document_id: str) -> str:
+    # Opaque cursor handed to clients; currently the urlsafe-base64 encoded Appwrite document id.
+    return base64.urlsafe_b64encode(document_id.encode()).decode().rstrip("=")
+
+def decode_history_cursor(cursor: str) -> str:
+    try:
+        return base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    except (binascii.Error, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid history cursor: {cursor}") from e
 
 # Helper to run sync Appwrite calls in a thread pool
 from fastapi.concurrency import run_in_threadpool
+
+async def call_appwrite(method: Callable[..., Any], *args: Any) -> Any:
+    # Awaits native async storage methods directly; synchronous SDK calls are moved off the event loop.
+    if inspect.iscoroutinefunction(method):
+        return await method(*args)
+    submitted = time.perf_counter()
+
+    def run() -> Any:
+        # Time spent queued for a worker thread (the pool is shared with FastAPI's sync endpoints)
+        THREADPOOL_WAIT.observe(time.perf_counter() - submitted)
+        return method(*args)
+
+    return await run_in_threadpool(run)
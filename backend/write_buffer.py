@@ -0,0 +1,277 @@
+import asyncio
+import json
+import logging
+import random
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .config import settings
+from .instrumentation import WRITE_BUFFER_DEAD_LETTERS
+from .services import call_appwrite
+
+logger = logging.getLogger(__name__)
+
+# --- Durable Write-Behind Buffer ---
+# Observations are appended to a local SQLite database (WAL mode) and acknowledged immediately.
+# A background task flushes them to Appwrite in batches and retries failed writes with backoff, so a dropped
+# uplink delays persistence instead of losing data. Rows left over from a crash are replayed on startup.
+# All SQLite work runs on one dedicated thread (the connection is bound to it), never on the event loop. Writes that
+# still fail after WRITE_BUFFER_MAX_ATTEMPTS are moved to a dead_writes table, kept for inspection or manual replay.
+# Besides creates, the buffer queues updates of documents it may not have created yet (e.g. last_seen). Each batch
+# writes its creates before its updates; pending updates of the same document are merged into one row.
+
+class ObservationBuffer:
+    def __init__(self, appwrite_service: Any, path: Optional[str] = None):
+        self.appwrite = appwrite_service
+        self.path = path if path is not None else settings.WRITE_BUFFER_PATH
+        self.batch_size = settings.WRITE_BUFFER_BATCH_SIZE
+        self.flush_interval = settings.WRITE_BUFFER_FLUSH_INTERVAL_SECONDS
+        self.backoff_base = settings.WRITE_BUFFER_RETRY_BACKOFF_BASE
+        self.backoff_max = settings.WRITE_BUFFER_RETRY_BACKOFF_MAX
+        self.max_attempts = settings.WRITE_BUFFER_MAX_ATTEMPTS
+        self._db: Optional[sqlite3.Connection] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Row id -> enqueue time of every pending write, in id order, so depth() never has to query the database.
+        # Only touched from the event loop.
+        self._pending: Dict[int, float] = {}
+        self._wakeup = asyncio.Event()
+        self._flusher: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    async def _run_db(self, function: Callable[..., Any], *args: Any) -> Any:
+        # Runs a blocking database call on the buffer's own thread
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="write-buffer")
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    # --- Database (buffer thread only) ---
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(self.path, isolation_level=None)  # Autocommit; each statement is its own transaction
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")  # Durable across application crashes, cheap commits in WAL mode
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS pending_writes ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " collection_id TEXT NOT NULL,"
+                " document_id TEXT NOT NULL,"
+                " operation TEXT NOT NULL DEFAULT 'create',"
+                " data TEXT NOT NULL,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " next_attempt_at REAL NOT NULL,"
+                " enqueued_at REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS pending_writes_due ON pending_writes (next_attempt_at)")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS dead_writes ("
+                " id INTEGER PRIMARY KEY,"
+                " collection_id TEXT NOT NULL,"
+                " document_id TEXT NOT NULL,"
+                " operation TEXT NOT NULL DEFAULT 'create',"
+                " data TEXT NOT NULL,"
+                " attempts INTEGER NOT NULL,"
+                " enqueued_at REAL NOT NULL,"
+                " failed_at REAL NOT NULL)"
+            )
+            for table in ("pending_writes", "dead_writes"):
+                # Buffers created before updates were queued only hold creates
+                if "operation" not in {column[1] for column in db.execute(f"PRAGMA table_info({table})")}:
+                    db.execute(f"ALTER TABLE {table} ADD COLUMN operation TEXT NOT NULL DEFAULT 'create'")
+            self._db = db
+        return self._db
+
+    def _load_pending(self) -> List[Tuple[int, float]]:
+        return self._connect().execute("SELECT id, enqueued_at FROM pending_writes ORDER BY id").fetchall()
+
+    def _insert(self, collection_id: str, document_id: str, data: str, now: float) -> int:
+        return self._connect().execute(
+            "INSERT INTO pending_writes (collection_id, document_id, data, next_attempt_at, enqueued_at) VALUES (?, ?, ?, ?, ?)",
+            (collection_id, document_id, data, now, now)
+        ).lastrowid
+
+    def _insert_update(self, collection_id: str, document_id: str, data: str, now: float) -> Tuple[int, bool]:
+        # Merges into a pending update of the same document if there is one; returns (row id, inserted)
+        db = self._connect()
+        db.execute("BEGIN")
+        try:
+            row = db.execute(
+                "SELECT id, data FROM pending_writes WHERE collection_id = ? AND document_id = ? AND operation = 'update'"
+                " ORDER BY id DESC LIMIT 1",
+                (collection_id, document_id)
+            ).fetchone()
+            if row:
+                merged = json.dumps({**json.loads(row[1]), **json.loads(data)})
+                db.execute("UPDATE pending_writes SET data = ? WHERE id = ?", (merged, row[0]))
+                result = (row[0], False)
+            else:
+                row_id = db.execute(
+                    "INSERT INTO pending_writes (collection_id, document_id, operation, data, next_attempt_at, enqueued_at)"
+                    " VALUES (?, ?, 'update', ?, ?, ?)",
+                    (collection_id, document_id, data, now, now)
+                ).lastrowid
+                result = (row_id, True)
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        return result
+
+    def _due_rows(self, now: float) -> List[Tuple[int, str, str, str, str, int]]:
+        return self._connect().execute(
+            "SELECT id, collection_id, document_id, operation, data, attempts FROM pending_writes"
+            " WHERE next_attempt_at <= ? ORDER BY id LIMIT ?",
+            (now, self.batch_size)
+        ).fetchall()
+
+    def _settle(self, flushed: List[int], retries: List[Tuple[int, float, int]], dead: List[int]) -> None:
+        # Records the outcome of one batch in a single transaction
+        db = self._connect()
+        db.execute("BEGIN")
+        try:
+            if retries:
+                db.executemany("UPDATE pending_writes SET attempts = ?, next_attempt_at = ? WHERE id = ?", retries)
+            if dead:
+                placeholders = ','.join('?' * len(dead))
+                db.execute(
+                    "INSERT OR REPLACE INTO dead_writes (id, collection_id, document_id, operation, data, attempts, enqueued_at, failed_at)"
+                    f" SELECT id, collection_id, document_id, operation, data, attempts + 1, enqueued_at, ? FROM pending_writes WHERE id IN ({placeholders})",
+                    [time.time(), *dead]
+                )
+            done = flushed + dead
+            if done:
+                db.execute(f"DELETE FROM pending_writes WHERE id IN ({','.join('?' * len(done))})", done)
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def _close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    # --- Event loop API ---
+    async def enqueue(self, collection_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        # Stores the write locally and returns the document as it will look once created in Appwrite.
+        # The document id is fixed now so replays after a crash cannot create duplicates.
+        document_id = uuid.uuid4().hex[:20]
+        now = time.time()
+        row_id = await self._run_db(self._insert, collection_id, document_id, json.dumps(data), now)
+        self._pending[row_id] = now
+        self._wakeup.set()
+        created_at = datetime.fromtimestamp(now, tz=timezone.utc).isoformat()
+        return {**data, "$id": document_id, "$collectionId": collection_id, "$createdAt": created_at, "$updatedAt": created_at}
+
+    async def enqueue_update(self, collection_id: str, document_id: str, data: Dict[str, Any]) -> None:
+        # Queues a partial update; the document may still be waiting in the buffer itself
+        now = time.time()
+        row_id, inserted = await self._run_db(self._insert_update, collection_id, document_id, json.dumps(data), now)
+        if inserted:
+            self._pending[row_id] = now
+        self._wakeup.set()
+
+    def depth(self) -> Dict[str, Any]:
+        # Queue depth and age of the oldest pending write (seconds), from memory; cheap enough for every scrape
+        oldest = next(iter(self._pending.values()), None)
+        return {"pending": len(self._pending), "oldest_age_seconds": round(time.time() - oldest, 3) if oldest else 0.0}
+
+    def _retry_delay(self, attempts: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempts)))
+
+    async def _write(self, collection_id: str, document_id: str, operation: str, data: Dict[str, Any]) -> bool:
+        if operation == "update":
+            # Fails (and is retried) while the document has not been created yet
+            return bool(await call_appwrite(self.appwrite.update_document, collection_id, document_id, data))
+        created = await call_appwrite(self.appwrite.create_document, collection_id, document_id, data)
+        if created:
+            return True
+        # The create may have succeeded before a crash or a lost response; an existing document counts as written
+        existing = await call_appwrite(self.appwrite.get_document, collection_id, document_id)
+        return bool(existing)
+
+    async def flush_once(self) -> int:
+        # Writes one batch of due rows concurrently; returns the number of rows flushed.
+        rows = await self._run_db(self._due_rows, time.time())
+        if not rows:
+            return 0
+
+        # Creates first, so an update queued behind the create of its document finds it
+        creates = [row for row in rows if row[3] != "update"]
+        updates = [row for row in rows if row[3] == "update"]
+        results: List[bool] = []
+        for group in (creates, updates):
+            results += await asyncio.gather(*(
+                self._write(collection_id, document_id, operation, json.loads(data))
+                for _, collection_id, document_id, operation, data, _ in group
+            ))
+        flushed: List[int] = []
+        retries: List[Tuple[int, float, int]] = []
+        dead: List[int] = []
+        for (row_id, _, _, _, _, attempts), ok in zip(creates + updates, results):
+            if ok:
+                flushed.append(row_id)
+            elif self.max_attempts and attempts + 1 >= self.max_attempts:
+                dead.append(row_id)
+            else:
+                retries.append((attempts + 1, time.time() + self._retry_delay(attempts), row_id))
+        await self._run_db(self._settle, flushed, retries, dead)
+        for row_id in flushed + dead:
+            self._pending.pop(row_id, None)
+        if retries:
+            logger.warning(f"Write buffer: {len(retries)} write(s) failed, will retry.")
+        if dead:
+            WRITE_BUFFER_DEAD_LETTERS.inc(amount=len(dead))
+            logger.error(f"Write buffer: Giving up on {len(dead)} write(s) after {self.max_attempts} attempts; moved to dead_writes in {self.path}.")
+        return len(flushed)
+
+    async def _run(self) -> None:
+        # Replays whatever a previous process left behind, then keeps flushing
+        try:
+            self._pending = dict(await self._run_db(self._load_pending))
+        except Exception as e:
+            logger.error(f"Write buffer: Could not open {self.path}: {e}")
+        if self._pending:
+            logger.info(f"Write buffer: Replaying {len(self._pending)} pending write(s) from {self.path}.")
+        while True:
+            try:
+                # Keep flushing while full batches go through, then wait for new writes or the next retry window
+                while await self.flush_once() == self.batch_size:
+                    pass
+            except Exception as e:
+                logger.error(f"Write buffer: Error while flushing: {e}")
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        # Starts flushing in the background
+        if not self.enabled or self._flusher is not None:
+            return
+        self._flusher = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        if self._executor is not None:
+            try:
+                await self.flush_once()  # Best effort; anything left is replayed on the next start
+            finally:
+                await self._run_db(self._close)
+                self._executor.shutdown(wait=False)
+                self._executor = None
@@ -0,0 +1,37 @@
+import os
+import sys
+
+# Tests run against the benchmark settings (local stand-ins, no real endpoints or keys); they are applied before
+# anything imports backend.config, so values from backend/.env are never picked up.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.benchmarks import configure_environment  # noqa: E402
+
+configure_environment(LOG_FORMAT="text")
+
+import pytest  # noqa: E402
+
+from backend.benchmarks.fakes import BackgroundServer, DocumentStore, create_appwrite_app  # noqa: E402
+from backend.config import settings  # noqa: E402
+from backend.models import WeatherObservation  # noqa: E402
+
+@pytest.fixture
+def observation():
+    # Factory for minimal observations where only the location, the OWM time and the temperature vary
+    def make(location_id, dt, temperature):
+        return WeatherObservation(
+            temperature=temperature, feels_like=temperature, humidity=50, pressure=1013, wind_speed=1,
+            description="", icon="", lat=0, lon=0, dt=dt, location_id=location_id
+        )
+    return make
+
+@pytest.fixture
+def appwrite_stand_in(monkeypatch):
+    # The Appwrite stand-in from the benchmarks on a local port; services built inside the test talk to it
+    store = DocumentStore()
+    server = BackgroundServer(create_appwrite_app(store)).start()
+    monkeypatch.setattr(settings, "APPWRITE_ENDPOINT", f"{server.url}/v1")
+    try:
+        yield store
+    finally:
+        server.stop()
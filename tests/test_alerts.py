@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from backend.alerts import AlertEngine
+from backend.models import AlertRule
+
+HEAT = AlertRule(name="heat", metric="temperature", threshold=35.0, debounce=2)
+
+def test_repeated_observations_of_a_location_are_applied_in_order(observation):
+    engine = AlertEngine(settings_service=None, rules=[HEAT])
+    batch = [observation("a", 200, 36), observation("b", 100, 36), observation("a", 100, 36), observation("b", 200, 30)]
+    alerts = engine.evaluate(batch)
+    # "a" matched twice in a row (debounce 2); "b" matched once, then dropped below the threshold
+    assert [(alert.location_id, alert.state, alert.observed_at.timestamp()) for alert in alerts] == [("a", "fired", 200)]
+
+def test_rounds_for_many_locations(observation):
+    engine = AlertEngine(settings_service=None, rules=[HEAT])
+    batch = [observation(f"loc-{i}", dt, 40) for dt in (100, 200, 300) for i in range(1000)]
+    alerts = engine.evaluate(batch)
+    assert len(alerts) == 1000 and {alert.observed_at.timestamp() for alert in alerts} == {200}
+
+def test_invalid_rules_fail_when_the_engine_is_built():
+    with pytest.raises(ValueError, match="unique"):
+        AlertEngine(settings_service=None, rules=[HEAT, HEAT])
+    with pytest.raises(ValueError, match="Unknown alert metric"):
+        AlertEngine(settings_service=None, rules=[AlertRule(name="x", metric="rain", threshold=1.0)])
+
+class StubSettings:
+    def __init__(self, extreme_weather_alerts):
+        self.extreme_weather_alerts = extreme_weather_alerts
+
+    async def get_settings(self):
+        return self
+
+def test_conditions_met_while_alerts_are_off_fire_once_they_are_turned_on(observation):
+    settings_service = StubSettings(extreme_weather_alerts=False)
+    engine = AlertEngine(settings_service=settings_service, rules=[HEAT])
+
+    async def run():
+        events = []
+        events += await engine.process([observation("a", 100, 40)])
+        events += await engine.process([observation("a", 200, 40)])
+        assert engine.active_alerts() == []  # Nothing is reported as firing while alerts are off
+        settings_service.extreme_weather_alerts = True
+        for dt, temperature in ((300, 40), (400, 40), (500, 20)):
+            events += await engine.process([observation("a", dt, temperature)])
+        return events
+
+    events = asyncio.run(run())
+    assert [(alert.state, alert.observed_at.timestamp()) for alert in events] == [("fired", 400), ("cleared", 500)]
+
+def test_rate_rules_use_the_oldest_sample_inside_each_window(observation):
+    drop = AlertRule(name="drop", metric="temperature", kind="rate", direction="below", threshold=-5.0, window_minutes=60)
+    slow_drop = AlertRule(name="slow_drop", metric="temperature", kind="rate", direction="below", threshold=-8.0, window_minutes=180)
+    engine = AlertEngine(settings_service=None, rules=[drop, slow_drop])
+    alerts = []
+    for minute, temperature in ((0, 20), (30, 19), (60, 17), (90, 15), (120, 14), (150, 12), (180, 11), (210, 5)):
+        alerts += engine.evaluate([observation("a", minute * 60, temperature)])
+    # 3 h window: 20 -> 12 by minute 150; the 1 h window never spans more than -3 until 12 -> 5 at minute 210
+    assert [(alert.rule, alert.observed_at.timestamp() / 60, alert.value) for alert in alerts] == [
+        ("slow_drop", 150, -8.0), ("drop", 210, -7.0)
+    ]
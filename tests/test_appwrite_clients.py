@@ -0,0 +1,60 @@
+import asyncio
+
+from appwrite.query import Query
+
+from backend.services import AppwriteService, AsyncAppwriteService, call_appwrite, create_http_client
+
+# The SDK-backed and REST-backed storage clients run the same operations against the Appwrite stand-in; each
+# client gets its own collection so the results can be compared side by side.
+
+SYSTEM_FIELDS = ("$createdAt", "$updatedAt", "$collectionId", "$sequence")
+
+def _strip(result):
+    # Drops the values that legitimately differ between the two runs (timestamps, generated ids, collection)
+    if isinstance(result, list):
+        return [_strip(item) for item in result]
+    if isinstance(result, dict):
+        return {
+            key: _strip(value) for key, value in result.items()
+            if key not in SYSTEM_FIELDS and not (key == "$id" and len(str(value)) == 20)
+        }
+    return result
+
+async def _exercise(service, collection):
+    results = {}
+    results["create"] = await call_appwrite(service.create_document, collection, "farm", {"name": "Farm", "acres": 12})
+    results["create_duplicate"] = await call_appwrite(service.create_document, collection, "farm", {"name": "Again"})
+    for i in range(5):
+        await call_appwrite(service.create_document, collection, f"doc{i}", {"n": i, "tag": None if i % 2 else "even"})
+    results["create_unique"] = await call_appwrite(service.create_document, collection, "unique()", {"n": 99})
+    results["get"] = await call_appwrite(service.get_document, collection, "farm")
+    results["get_missing"] = await call_appwrite(service.get_document, collection, "missing")
+    results["update"] = await call_appwrite(service.update_document, collection, "farm", {"acres": 15})
+    results["update_missing"] = await call_appwrite(service.update_document, collection, "missing", {"acres": 1})
+    results["list_range"] = await call_appwrite(service.list_documents, collection, [
+        Query.greater_than_equal("n", 1), Query.less_than("n", 4), Query.order_desc("n"), Query.limit(2)
+    ])
+    results["list_cursor"] = await call_appwrite(service.list_documents, collection, [
+        Query.order_asc("n"), Query.is_null("name"), Query.cursor_after("doc1"), Query.limit(10)
+    ])
+    results["list_is_null"] = await call_appwrite(service.list_documents, collection, [Query.is_null("tag"), Query.order_asc("n")])
+    results["list_equal"] = await call_appwrite(service.list_documents, collection, [Query.equal("tag", ["even"]), Query.offset(1)])
+    results["list_bad_cursor"] = await call_appwrite(service.list_documents, collection, [Query.cursor_after("missing")])
+    return results
+
+def test_sdk_and_rest_clients_return_the_same_results(appwrite_stand_in):
+    async def run():
+        async with create_http_client() as http_client:
+            return await _exercise(AppwriteService(), "sdk"), await _exercise(AsyncAppwriteService(http_client), "rest")
+
+    sdk, rest = asyncio.run(run())
+    assert _strip(sdk) == _strip(rest)
+    # Spot checks that the operations did what they should (not just fail the same way)
+    assert rest["get"]["acres"] == 12 and rest["update"]["acres"] == 15
+    assert [doc["n"] for doc in rest["list_range"]["documents"]] == [3, 2]
+    assert [doc["n"] for doc in rest["list_cursor"]["documents"]] == [2, 3, 4, 99]
+    assert [doc.get("n") for doc in rest["list_is_null"]["documents"]] == [None, 1, 3, 99]  # "farm" has neither
+    assert rest["create_unique"]["$id"] not in ("unique()", "")
+    for key in ("create_duplicate", "get_missing", "update_missing"):
+        assert rest[key] is None and sdk[key] is None
+    assert rest["list_bad_cursor"] == sdk["list_bad_cursor"] == {"total": 0, "documents": []}
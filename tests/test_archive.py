@@ -0,0 +1,66 @@
+import os
+
+from backend.archive import DAY_SECONDS, ObservationArchive, partition_day
+
+DAY = 19_800 * DAY_SECONDS  # A UTC midnight
+
+
+def column_files(archive, location_id="default"):
+    location_dir = archive._location_dir(location_id)
+    return sorted(
+        os.path.join(day, name)
+        for day in os.listdir(location_dir) if day != "staging" and os.path.isdir(os.path.join(location_dir, day))
+        for name in os.listdir(os.path.join(location_dir, day))
+    )
+
+
+def test_live_appends_are_staged_and_compacted_when_the_day_closes(tmp_path, observation):
+    archive = ObservationArchive(str(tmp_path))
+    for hour in range(24):
+        archive.append_live([observation("default", DAY + hour * 3600, float(hour))])
+    # No partition has been written yet, but scans already see every row
+    assert archive.partitions() == {} and column_files(archive) == []
+    scanned = archive.scan(columns=["temperature"])
+    assert list(scanned["dt"]) == [DAY + hour * 3600 for hour in range(24)]
+    assert list(scanned["temperature"]) == [float(hour) for hour in range(24)]
+
+    # A restated observation replaces the staged one with the same dt
+    archive.append_live([observation("default", DAY + 3600, 99.0)])
+    assert archive.scan(columns=["temperature"])["temperature"][1] == 99.0
+
+    # The first observation of the next day closes the previous one: written once, as version 1
+    archive.append_live([observation("default", DAY + DAY_SECONDS, 5.0)])
+    partition = archive.partitions()[partition_day(DAY)]
+    assert partition["version"] == 1 and partition["rows"] == 24
+    assert os.listdir(os.path.join(archive._location_dir("default"), "staging")) == [f"{partition_day(DAY + DAY_SECONDS)}.bin"]
+    assert len(archive.scan()["dt"]) == 25
+
+    # The periodic job folds the open day too; the result is unchanged
+    before = archive.aggregate("day")
+    assert archive.compact() == 1
+    assert archive.aggregate("day") == before
+    assert sorted(archive.partitions()) == [partition_day(DAY), partition_day(DAY + DAY_SECONDS)]
+
+
+def test_backfills_still_rewrite_partitions_and_staged_rows_win(tmp_path, observation):
+    archive = ObservationArchive(str(tmp_path))
+    archive.append([observation("default", DAY + hour * 3600, 1.0) for hour in range(3)])
+    archive.append_live([observation("default", DAY + 3600, 2.0)])
+    assert list(archive.scan(columns=["temperature"])["temperature"]) == [1.0, 2.0, 1.0]
+    assert archive.partitions()[partition_day(DAY)]["version"] == 1
+
+    # Live data is newer than a backfill of the same day
+    archive.append([observation("default", DAY + 3600, 3.0)])
+    assert archive.partitions()[partition_day(DAY)]["version"] == 2
+    archive.compact()
+    assert list(archive.scan(columns=["temperature"])["temperature"]) == [1.0, 2.0, 1.0]
+
+
+def test_a_torn_staged_record_is_dropped(tmp_path, observation):
+    archive = ObservationArchive(str(tmp_path))
+    archive.append_live([observation("default", DAY, 1.0)])
+    with open(os.path.join(archive._location_dir("default"), "staging", f"{partition_day(DAY)}.bin"), "ab") as f:
+        f.write(b"\x00" * 7)  # Crash in the middle of an append
+    assert list(archive.scan()["dt"]) == [DAY]
+    archive.append_live([observation("default", DAY + 60, 2.0)])
+    assert list(archive.scan(columns=["temperature"])["temperature"]) == [1.0, 2.0]
@@ -0,0 +1,14 @@
+from backend.benchmarks.load import run_load
+
+
+def test_load_harness_runs_a_short_scenario():
+    # Stand-ins on background servers, the API in a uvicorn subprocess, one brief closed-loop run
+    results = run_load(
+        ["current"], [2], duration=0.5, warmup=0.2, history_size=10,
+        owm_latency_ms=0.0, owm_jitter_ms=0.0, appwrite_latency_ms=0.0, env_overrides={"LOG_FORMAT": "text"}
+    )
+    result = results["current@2"]
+    assert result["concurrency"] == 2
+    assert result["requests"] > 0 and result["errors"] == 0
+    assert 0 < result["latency_ms"]["p50"] <= result["latency_ms"]["max"]
+    assert set(result["upstream_calls"]) == {"openweathermap", "appwrite"}
@@ -0,0 +1,43 @@
+import asyncio
+
+from backend.broadcast import Broadcaster, event_id_for
+
+
+def test_event_ids_come_from_observation_time():
+    async def run():
+        broadcaster = Broadcaster()
+        first = broadcaster.publish("farm", b"{}", 1_700_000_000.25)
+        # A second broadcaster (another worker, or this one after a restart) assigns the same id
+        again = Broadcaster().publish("farm", b"{}", 1_700_000_000.25)
+        repeated = broadcaster.publish("farm", b"{}", 1_700_000_000.25)
+        return first, again, repeated
+
+    first, again, repeated = asyncio.run(run())
+    assert first == again == event_id_for(1_700_000_000.25) == 1_700_000_000_250
+    assert repeated == first + 1
+
+
+def test_known_last_event_id_replays_missed_events():
+    async def run():
+        broadcaster = Broadcaster()
+        ids = [broadcaster.publish("farm", f'{{"n": {n}}}'.encode(), 1_700_000_000 + n * 600) for n in range(3)]
+        subscription = broadcaster.subscribe("farm", ids[0])
+        return ids, subscription.resumed, [subscription.queue.get_nowait() for _ in range(subscription.queue.qsize())]
+
+    ids, resumed, replayed = asyncio.run(run())
+    assert resumed
+    assert replayed == [(ids[1], b'{"n": 1}'), (ids[2], b'{"n": 2}')]
+
+
+def test_unknown_or_future_last_event_id_is_a_cold_subscribe():
+    async def run():
+        broadcaster = Broadcaster()
+        latest = broadcaster.publish("farm", b"{}", 1_700_000_000)
+        results = []
+        for last_event_id in (latest + 10_000, 7, None):  # Future, unknown (e.g. an id from before the ids changed), none
+            subscription = broadcaster.subscribe("farm", last_event_id)
+            results.append((subscription.resumed, subscription.queue.qsize()))
+        return results
+
+    # Nothing is replayed; the stream starts with the current state instead
+    assert asyncio.run(run()) == [(False, 0)] * 3
@@ -0,0 +1,59 @@
+import threading
+import time
+
+import httpx
+
+from backend.benchmarks import BENCHMARK_ENV
+from backend.benchmarks.fakes import BackgroundServer, DocumentStore, create_appwrite_app, create_owm_app
+from backend.benchmarks.load import backend_process
+from backend.config import settings
+from backend.coordination import LeaderLease, SharedState
+from backend.models import FarmSettingsData
+from backend.services import WeatherSnapshot
+
+
+def test_follower_waits_for_the_leaders_snapshot_instead_of_fetching(tmp_path):
+    # This process holds the leader lease, so the API worker started below is a follower with nothing to serve yet
+    lease = LeaderLease(str(tmp_path / "leader.lock"))
+    assert lease.try_acquire()
+    store = DocumentStore()
+    store.create(settings.APPWRITE_COLLECTION_SETTINGS_ID, settings.APPWRITE_SETTINGS_DOCUMENT_ID, FarmSettingsData().model_dump())
+    owm_app = create_owm_app()
+    owm_server = BackgroundServer(owm_app).start()
+    appwrite_server = BackgroundServer(create_appwrite_app(store)).start()
+    env = {
+        **BENCHMARK_ENV,
+        "OPENWEATHERMAP_BASE_URL": owm_server.url,
+        "APPWRITE_ENDPOINT": f"{appwrite_server.url}/v1",
+        "WORKER_COORDINATION": "true",
+        "LEADER_LOCK_PATH": lease.path,
+        "SHARED_STATE_PATH": str(tmp_path / "shared_state.bin"),
+        "FOLLOWER_SNAPSHOT_WAIT_SECONDS": "1.0",
+        "LOG_FORMAT": "text",
+    }
+    try:
+        # A follower is not ready until it has a snapshot to serve
+        with backend_process(env, ready_path="/health/live") as url:
+            assert httpx.get(f"{url}/health/ready").json()["role"] == "follower"
+            response = httpx.get(f"{url}/api/weather/current", timeout=10.0)
+            assert response.status_code == 503 and response.headers["Retry-After"] == "1"
+
+            # The leader publishes while a request is waiting
+            snapshot = WeatherSnapshot(
+                body=b'{"published": "by the leader"}', etag='"leader"',
+                lat=settings.DEFAULT_FARM_LATITUDE, lon=settings.DEFAULT_FARM_LONGITUDE, observed_at=time.time()
+            )
+            shared = SharedState(env["SHARED_STATE_PATH"])
+            threading.Timer(0.2, shared.publish_snapshot, (snapshot,)).start()
+            response = httpx.get(f"{url}/api/weather/current", timeout=10.0)
+            assert response.status_code == 200 and response.content == snapshot.body
+
+            # Alerts, reports and extra-location streams live in the leader's memory: explicit errors, not empty results
+            for path in ("/api/weather/alerts", "/api/reports/daily", "/api/weather/stream?location_id=north-field"):
+                response = httpx.get(f"{url}{path}")
+                assert response.status_code == 503 and "leader" in response.json()["detail"]
+        assert owm_app.state.calls == 0
+    finally:
+        owm_server.stop()
+        appwrite_server.stop()
+        lease.release()
@@ -0,0 +1,71 @@
+import asyncio
+import random
+
+from backend.benchmarks.fakes import owm_payload
+from backend.config import settings
+from backend.models import FarmSettingsData
+from backend.services import AsyncAppwriteService, WeatherService, create_http_client
+from backend.write_buffer import ObservationBuffer
+
+DT = 1_760_000_000
+
+
+class StaticOWM:
+    # Keeps returning the same observation, as OWM does until the station reports again
+    def __init__(self):
+        self.payload = None
+
+    async def get_current_weather(self, lat, lon, units):
+        self.payload = self.payload or owm_payload(lat, lon, DT, random.Random(0))
+        return self.payload
+
+
+class StaticSettings:
+    async def get_settings(self):
+        return FarmSettingsData()
+
+
+def stored_observations(store):
+    return list(store.collections.get(settings.APPWRITE_OBSERVATIONS_COLLECTION_ID, {}).values())
+
+
+def test_an_unchanged_observation_extends_last_seen_across_restarts(appwrite_stand_in, monkeypatch):
+    monkeypatch.setattr(settings, "WEATHER_SCHEMA_VERSION", 2)
+    monkeypatch.setattr(settings, "DEDUPE_OBSERVATIONS", True)
+    owm = StaticOWM()
+
+    async def poll():
+        # A new service each time: the last stored observation is only known from Appwrite
+        async with create_http_client() as http_client:
+            service = WeatherService(AsyncAppwriteService(http_client), owm, StaticSettings())
+            return await service.update_weather_data()
+
+    asyncio.run(poll())
+    [stored] = stored_observations(appwrite_stand_in)
+    assert stored["dt"] == DT and "last_seen" not in stored
+
+    result = asyncio.run(poll())
+    [extended] = stored_observations(appwrite_stand_in)
+    assert extended["$id"] == stored["$id"] and extended["last_seen"]
+    assert result["weather"].last_seen is not None
+
+
+def test_last_seen_of_a_buffered_observation_is_queued_behind_its_create(appwrite_stand_in, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "WEATHER_SCHEMA_VERSION", 2)
+    monkeypatch.setattr(settings, "DEDUPE_OBSERVATIONS", True)
+
+    async def run():
+        async with create_http_client() as http_client:
+            appwrite = AsyncAppwriteService(http_client)
+            buffer = ObservationBuffer(appwrite, str(tmp_path / "buffer.sqlite3"))
+            service = WeatherService(appwrite, StaticOWM(), StaticSettings(), write_buffer=buffer)
+            for _ in range(3):
+                await service.update_weather_data()  # Nothing has reached Appwrite yet
+            depth = buffer.depth()
+            await buffer.flush_once()
+            await buffer.stop()
+            return depth
+
+    assert asyncio.run(run())["pending"] == 2  # The create and one merged last_seen update
+    [stored] = stored_observations(appwrite_stand_in)
+    assert stored["dt"] == DT and stored["last_seen"]
@@ -0,0 +1,32 @@
+import asyncio
+
+import pytest
+
+from backend.instrumentation import OPERATION_ERRORS, instrumented
+
+def _errors(operation: str) -> float:
+    return OPERATION_ERRORS.value("tests", operation)
+
+def test_cancelled_operation_is_not_an_error():
+    @instrumented("tests")
+    async def slow():
+        await asyncio.sleep(10)
+
+    async def run():
+        task = asyncio.ensure_future(slow())
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert _errors("slow") == 0
+
+def test_failed_operation_is_counted():
+    @instrumented("tests")
+    async def broken():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(broken())
+    assert _errors("broken") == 1
@@ -0,0 +1,89 @@
+import asyncio
+import statistics
+from datetime import date, datetime, timezone
+
+from backend.config import settings
+from backend.models import WeatherObservation
+from backend.reports import DailyReportService, report_document_id
+from backend.services import AsyncAppwriteService, create_http_client
+
+DAY = date(2026, 3, 4)
+MIDNIGHT = int(datetime(2026, 3, 4, tzinfo=timezone.utc).timestamp())
+
+
+class ReportSettings:
+    daily_report = True
+
+    async def get_settings(self):
+        return self
+
+
+def reading(dt, temperature=20.0, rain_1h=None, location_id=None):
+    # Temperatures in 10-30 with humidity 50 and no wind are all "normal"
+    return WeatherObservation(
+        temperature=temperature, feels_like=temperature, humidity=50, pressure=1013, wind_speed=1, rain_1h=rain_1h,
+        description="", icon="", lat=0, lon=0, dt=dt, location_id=location_id
+    )
+
+
+def total_hours(report):
+    return sum(report.condition_hours.values())
+
+
+def test_half_hourly_polling_credits_the_whole_day():
+    service = DailyReportService(None, ReportSettings())
+    temperatures = [10 + (i * 7) % 13 for i in range(48)]
+
+    async def run():
+        for i, temperature in enumerate(temperatures):
+            await service.add_observation(reading(MIDNIGHT + i * 1800, temperature, rain_1h=2.0))
+        await service.add_observation(reading(MIDNIGHT + 86400, rain_1h=0.0))  # First observation of the next day
+        return await service.get_reports(DAY)
+
+    [report] = asyncio.run(run())
+    assert report.complete and report.observations == 48
+    assert total_hours(report) == 24.0 and report.rainfall_mm == 48.0
+    assert report.temperature_mean == statistics.fmean(temperatures)
+    assert abs(report.temperature_stddev - statistics.stdev(temperatures)) < 1e-9
+
+
+def test_a_gap_across_midnight_is_split_between_the_days():
+    service = DailyReportService(None, ReportSettings())
+
+    async def run():
+        await service.add_observation(reading(MIDNIGHT + 86400 - 2 * 3600))  # 22:00
+        await service.add_observation(reading(MIDNIGHT + 86400 - 3600))  # 23:00
+        await service.add_observation(reading(MIDNIGHT + 86400 + 3600 // 2))  # 00:30 on the next day
+        await service.add_observation(reading(MIDNIGHT + 86400 + 3600))
+        return await service.get_reports(DAY), await service.get_reports(date(2026, 3, 5))
+
+    [first], [second] = asyncio.run(run())
+    assert total_hours(first) == 2.0  # 22:00-23:00 plus 23:00-midnight
+    assert total_hours(second) == 1.0  # midnight-00:30 (the rest of the gap) plus 00:30-01:00
+
+
+def test_days_nobody_closes_are_closed_by_the_checkpoint(appwrite_stand_in, monkeypatch):
+    monkeypatch.setattr(settings, "APPWRITE_REPORTS_COLLECTION_ID", "reports")
+
+    async def run():
+        async with create_http_client() as http_client:
+            appwrite = AsyncAppwriteService(http_client)
+            service = DailyReportService(appwrite, ReportSettings())
+            for location_id in ("field", "barn"):
+                await service.add_observation(reading(MIDNIGHT + 79200, location_id=location_id))  # 22:00
+            await service.checkpoint(today=DAY)  # Both saved as partial reports
+            assert not appwrite_stand_in.get("reports", report_document_id("field", DAY))["complete"]
+
+            # A restart: "field" polls again the next day, "barn" never does
+            restarted = DailyReportService(appwrite, ReportSettings())
+            await restarted.add_observation(reading(MIDNIGHT + 86400 + 1800, location_id="field"))
+            field = appwrite_stand_in.get("reports", report_document_id("field", DAY))
+            field_next = await restarted.get_reports(date(2026, 3, 5), "field")
+            await restarted.checkpoint(today=date(2026, 3, 5))
+            barn = appwrite_stand_in.get("reports", report_document_id("barn", DAY))
+            return field, field_next, barn
+
+    field, [field_next], barn = asyncio.run(run())
+    assert field["complete"] and barn["complete"]
+    assert field_next.condition_hours["normal"] == 0.0  # The 2 h gap was used up before midnight
+    assert '"normal": 7200.0' in field["condition_seconds"] and '"normal": 7200.0' in barn["condition_seconds"]
@@ -0,0 +1,41 @@
+import asyncio
+from datetime import datetime, timezone
+
+from backend.config import settings
+from backend.rollups import RollupService
+from backend.services import AsyncAppwriteService, WeatherService, create_http_client
+
+START = int(datetime(2026, 3, 4, tzinfo=timezone.utc).timestamp())  # A Wednesday
+
+def _rollups(store):
+    return {
+        doc_id: {key: value for key, value in doc.items() if not key.startswith("$")}
+        for doc_id, doc in store.collections.get("rollups", {}).items()
+    }
+
+def test_partial_backfill_keeps_boundary_buckets_complete(appwrite_stand_in, monkeypatch, observation):
+    monkeypatch.setattr(settings, "WEATHER_SCHEMA_VERSION", 2)
+
+    async def run():
+        async with create_http_client() as http_client:
+            appwrite = AsyncAppwriteService(http_client)
+            weather_service = WeatherService(appwrite, None, None)
+            for i in range(24 * 21):  # Three weeks, hourly, with a bit of variation
+                stored = observation(None, START + i * 3600 + 600, 10 + (i * 7) % 13).to_storage()
+                appwrite_stand_in.create(weather_service.weather_collection_id, None, stored)
+            rollups = RollupService(appwrite)
+            rollups.collection_id = "rollups"
+
+            await rollups.backfill(weather_service)
+            complete = _rollups(appwrite_stand_in)
+            # A range starting and ending mid-hour, mid-day and mid-week
+            await rollups.backfill(
+                weather_service,
+                datetime.fromtimestamp(START + 5 * 86400 + 5400, tz=timezone.utc),
+                datetime.fromtimestamp(START + 12 * 86400 + 9000, tz=timezone.utc),
+            )
+            return complete, _rollups(appwrite_stand_in)
+
+    complete, after_partial = asyncio.run(run())
+    assert len(complete) == 21 * 24 + 21 + 4  # hours, days and the four weeks the range touches
+    assert after_partial == complete
@@ -0,0 +1,84 @@
+import asyncio
+import sqlite3
+
+from backend.instrumentation import WRITE_BUFFER_DEAD_LETTERS
+from backend.write_buffer import ObservationBuffer
+
+
+class FlakyStore:
+    # Appwrite stand-in whose writes fail while `down` is set
+    def __init__(self):
+        self.down = False
+        self.documents = {}
+
+    async def create_document(self, collection_id, document_id, data):
+        if self.down:
+            return None
+        self.documents[document_id] = data
+        return {**data, "$id": document_id}
+
+    async def get_document(self, collection_id, document_id):
+        return None if self.down else self.documents.get(document_id)
+
+
+def test_depth_is_tracked_in_memory_and_survives_restart(tmp_path):
+    path = str(tmp_path / "buffer.sqlite3")
+    store = FlakyStore()
+    store.down = True
+
+    async def first_run():
+        buffer = ObservationBuffer(store, path)
+        for n in range(3):
+            await buffer.enqueue("weather", {"n": n})
+        depth = buffer.depth()
+        buffer.backoff_base = 0.0  # Failed rows are due again immediately
+        await buffer.flush_once()
+        await buffer.stop()
+        return depth
+
+    depth = asyncio.run(first_run())
+    assert depth["pending"] == 3 and depth["oldest_age_seconds"] >= 0.0
+
+    async def second_run():
+        store.down = False
+        buffer = ObservationBuffer(store, path)
+        buffer.start()
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if not store.documents:
+                continue
+            if buffer.depth()["pending"] == 0:
+                break
+        depth = buffer.depth()
+        await buffer.stop()
+        return depth
+
+    assert asyncio.run(second_run()) == {"pending": 0, "oldest_age_seconds": 0.0}
+    assert sorted(doc["n"] for doc in store.documents.values()) == [0, 1, 2]
+
+
+def test_writes_past_max_attempts_move_to_dead_letter_table(tmp_path):
+    path = str(tmp_path / "buffer.sqlite3")
+    store = FlakyStore()
+    store.down = True
+    before = WRITE_BUFFER_DEAD_LETTERS.value()
+
+    async def run():
+        buffer = ObservationBuffer(store, path)
+        buffer.backoff_base = 0.0
+        buffer.max_attempts = 3
+        await buffer.enqueue("weather", {"n": 1})
+        for _ in range(3):
+            await buffer.flush_once()
+        depth = buffer.depth()
+        await buffer.stop()
+        return depth
+
+    assert asyncio.run(run())["pending"] == 0
+    assert WRITE_BUFFER_DEAD_LETTERS.value() == before + 1
+    db = sqlite3.connect(path)
+    try:
+        assert db.execute("SELECT COUNT(*) FROM pending_writes").fetchone() == (0,)
+        assert db.execute("SELECT attempts, data FROM dead_writes").fetchall() == [(3, '{"n": 1}')]
+    finally:
+        db.close()